@@ -0,0 +1,144 @@
+"""
+Micro-benchmark for validate_code
+
+Times the validator over a corpus of realistic and adversarial ~10KB inputs
+and compares it with the previous multi-pass regex implementation, which is
+kept here as a reference. Also prints every input where the two disagree.
+
+Usage:
+    cd api
+    python3 bench/bench_validate.py [--repeat 200] [--json]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.environ.setdefault('GOCACHE_PREPARE', '0')  # importing app must not warm the build cache
+
+import app  # noqa: E402
+
+TARGET_SIZE = 9500  # just under MAX_CODE_SIZE, so every input reaches the scanner
+
+_LEGACY_PATTERNS = [
+    r'for\s*{\s*}',
+    r'for\s*;\s*;\s*{',
+    r'goto\s+\w+',
+    r'//\s*go:linkname',
+    r'crypto/rand',
+]
+
+
+def legacy_validate(code: str):
+    """validate_code before the single-pass scanner (reference only)"""
+    if not code or not code.strip():
+        return False, "empty"
+    if len(code) > app.MAX_CODE_SIZE:
+        return False, "size"
+    if code.count('\n') > app.MAX_LINES:
+        return False, "lines"
+    for forbidden in app.FORBIDDEN_IMPORTS:
+        if f'"{forbidden}"' in code or f'"{forbidden}/' in code:
+            return False, f"import {forbidden}"
+    for pattern in _LEGACY_PATTERNS:
+        if re.search(pattern, code, re.IGNORECASE):
+            return False, "suspicious"
+    for func_name in re.findall(r'func\s+(\w+)\s*\(', code):
+        if code.count(f'{func_name}(') > 20:
+            return False, f"recursion {func_name}"
+    if 'package main' not in code:
+        return False, "package main"
+    if 'func main()' not in code:
+        return False, "func main()"
+    return True, ""
+
+
+def _pad(head: str, filler: str, tail: str = '') -> str:
+    """Repeat `filler` between head and tail up to TARGET_SIZE bytes"""
+    room = TARGET_SIZE - len(head) - len(tail)
+    return head + filler * max(0, room // len(filler)) + tail
+
+
+def build_corpus():
+    """name -> source"""
+    main_head = 'package main\n\nimport (\n\t"fmt"\n\t"strings"\n)\n\n'
+    realistic_func = (
+        'func process{n}(items []string) map[string]int {{\n'
+        '\tcounts := make(map[string]int)\n'
+        '\tfor _, item := range items {{\n'
+        '\t\tcounts[strings.ToLower(item)]++\n'
+        '\t}}\n'
+        '\treturn counts\n'
+        '}}\n\n'
+    )
+    funcs = ''.join(realistic_func.format(n=i) for i in range(40))
+    realistic = main_head + funcs[:TARGET_SIZE - 200] + '\nfunc main() {\n\tfmt.Println(process0([]string{"a"}))\n}\n'
+
+    many_funcs = ''.join(f'func f{i}() int {{ return {i} }}\n' for i in range(400))
+    corpus = {
+        'realistic': realistic,
+        'hello_world': 'package main\n\nimport "fmt"\n\nfunc main() {\n\tfmt.Println("Hola")\n}\n',
+        # One function declaration per line: the old heuristic scanned the whole code per function
+        'many_functions': main_head + many_funcs[:TARGET_SIZE - 100] + '\nfunc main() {}\n',
+        'long_string': _pad(main_head + 'func main() {\n\ts := "', 'for {} goto x os/exec ', '"\n\tfmt.Println(s)\n}\n'),
+        'long_comment': _pad(main_head + '/*\n', '"syscall" for {} // go:linkname\n', '*/\nfunc main() {}\n'),
+        'many_calls': _pad(main_head + 'func g(x int) int { return x }\nfunc main() {\n', '\tg(g(g(1)))\n', '}\n'),
+        'punctuation': _pad(main_head + 'func main() {\n\t_ = ', '((((((((((', '\n}\n'),
+        'unterminated_comment': _pad(main_head + 'func main() {}\n/*', 'x'),
+        'unterminated_string': _pad(main_head + 'func main() {\n\ts := "', 'a\\"'),
+        'forbidden_import_late': main_head.replace('"strings"', '"strings"\n\t"os/exec"') + funcs[:TARGET_SIZE - 200],
+        'goto_late': main_head + funcs[:TARGET_SIZE - 200] + '\nfunc main() {\nL:\n\tgoto L\n}\n',
+    }
+    return corpus
+
+
+def time_function(func, code: str, repeat: int) -> float:
+    """Median seconds per call"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(code)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = []
+    for name, code in build_corpus().items():
+        current = app.validate_code(code)
+        legacy = legacy_validate(code)
+        results.append({
+            'input': name,
+            'bytes': len(code),
+            'currentUs': round(time_function(app.validate_code, code, args.repeat) * 1e6, 1),
+            'legacyUs': round(time_function(legacy_validate, code, args.repeat) * 1e6, 1),
+            'valid': current[0],
+            'legacyValid': legacy[0],
+            'message': current[1],
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return 0
+
+    print(f"{'input':<24}{'bytes':>7}{'current µs':>12}{'legacy µs':>11}  verdict")
+    for r in results:
+        verdict = 'ok' if r['valid'] else 'reject'
+        if r['valid'] != r['legacyValid']:
+            verdict += f" (legacy: {'ok' if r['legacyValid'] else 'reject'})"
+        print(f"{r['input']:<24}{r['bytes']:>7}{r['currentUs']:>12}{r['legacyUs']:>11}  {verdict}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
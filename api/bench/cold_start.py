@@ -0,0 +1,147 @@
+"""
+Cold-start budget for the generator Lambda
+
+Each sample runs in a fresh interpreter, like a new Lambda container, with
+the generator's environment from template.yaml (CHALLENGE_POOL_KEYS
+included) and AWS_LAMBDA_FUNCTION_NAME set: it times `import generator` and
+the first handler call (stub backend, empty pool, so no API is called), and
+checks that agno and groq were not imported and no pool refill started
+during the import. Exits with status 1 when the median of either phase is
+over budget, so it can gate CI.
+
+Usage:
+    cd api
+    python3 bench/cold_start.py [--samples 5] [--import-budget-ms 150] [--first-request-budget-ms 50] [--json]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'template.yaml')
+GENERATOR_FUNCTION = 'GenerateChallengeFunction'
+
+IMPORT_BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', '150'))
+FIRST_REQUEST_BUDGET_MS = float(os.environ.get('FIRST_REQUEST_BUDGET_MS', '50'))
+# Modules that must only load on the first live generation
+DEFERRED_MODULES = ('agno', 'groq', 'httpx', 'urllib.request')
+
+_PROBE = f"""
+import json, sys, threading, time
+started = time.perf_counter()
+import generator
+imported = time.perf_counter()
+loaded = sorted(m for m in {DEFERRED_MODULES!r} if m in sys.modules)
+refills = sorted(t.name for t in threading.enumerate() if t.name.startswith('challenge-pool'))
+response = generator.handler({{'body': '{{"difficulty": "beginner", "language": "es"}}'}}, None)
+answered = time.perf_counter()
+print(json.dumps({{
+    'importMs': (imported - started) * 1000,
+    'firstRequestMs': (answered - imported) * 1000,
+    'statusCode': response['statusCode'],
+    'eagerModules': loaded,
+    'importRefills': refills,
+}}))
+"""
+
+
+def template_environment(path: str = TEMPLATE, function: str = GENERATOR_FUNCTION) -> Dict[str, str]:
+    """Plain Environment.Variables of a function in template.yaml (values using !Ref/!Sub are skipped)"""
+    with open(path) as f:
+        lines = f.read().splitlines()
+    env: Dict[str, str] = {}
+    in_function = in_variables = False
+    function_indent = variables_indent = 0
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        indent = len(line) - len(line.lstrip())
+        if in_function and indent <= function_indent:
+            break
+        if line.strip() == f'{function}:':
+            in_function, function_indent = True, indent
+        elif in_function and line.strip() == 'Variables:':
+            in_variables, variables_indent = True, indent
+        elif in_variables:
+            if indent <= variables_indent:
+                in_variables = False
+                continue
+            match = re.match(r'\s*(\w+):\s*(.*)$', line)
+            if match and not match.group(2).startswith('!'):
+                env[match.group(1)] = match.group(2).strip().strip('"\'')
+    if not in_function:
+        raise SystemExit(f"{function} not found in {path}")
+    return env
+
+
+def sample() -> dict:
+    env = {
+        **os.environ,
+        **template_environment(),
+        'AWS_LAMBDA_FUNCTION_NAME': 'cold-start-bench',
+        'CHALLENGE_BACKEND': 'stub',
+        # Validation runs in-process (the deployed URL is a !Sub); not reached by the probe
+        'CHALLENGE_EXECUTOR_URL': '',
+    }
+    out = subprocess.run(
+        [sys.executable, '-c', _PROBE], cwd=SRC_DIR, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    # The handler logs to stdout too; the measurement is the last line
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=5)
+    parser.add_argument('--import-budget-ms', type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument('--first-request-budget-ms', type=float, default=FIRST_REQUEST_BUDGET_MS)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    sample()  # the first run writes .pyc files; a deployed package ships them
+    samples = [sample() for _ in range(args.samples)]
+
+    result = {
+        'samples': args.samples,
+        'importMs': round(statistics.median(s['importMs'] for s in samples), 1),
+        'firstRequestMs': round(statistics.median(s['firstRequestMs'] for s in samples), 1),
+        'importBudgetMs': args.import_budget_ms,
+        'firstRequestBudgetMs': args.first_request_budget_ms,
+        'eagerModules': sorted({m for s in samples for m in s['eagerModules']}),
+        'statusCodes': sorted({s['statusCode'] for s in samples}),
+        'importRefills': sorted({t for s in samples for t in s['importRefills']}),
+    }
+    failures = []
+    if result['importMs'] > args.import_budget_ms:
+        failures.append(f"import {result['importMs']}ms > {args.import_budget_ms}ms")
+    if result['firstRequestMs'] > args.first_request_budget_ms:
+        failures.append(f"first request {result['firstRequestMs']}ms > {args.first_request_budget_ms}ms")
+    if result['eagerModules']:
+        failures.append(f"imported at cold start: {', '.join(result['eagerModules'])}")
+    if result['importRefills']:
+        failures.append(f"pool refills started at import: {', '.join(result['importRefills'])}")
+    if result['statusCodes'] != [200]:
+        failures.append(f"status codes {result['statusCodes']}")
+    result['failures'] = failures
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"import        {result['importMs']:>8} ms  (budget {args.import_budget_ms} ms)")
+        print(f"first request {result['firstRequestMs']:>8} ms  (budget {args.first_request_budget_ms} ms)")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        if not failures:
+            print('OK')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
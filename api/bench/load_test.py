@@ -0,0 +1,409 @@
+"""
+Load test for the execution API
+
+Sends a corpus of realistic programs (hello world, loops, goroutines, compile
+errors, panics, timeouts, output floods, test cases, /check) at a fixed
+concurrency, either to app.handler in this process or to a running
+local_server.py over HTTP, and reports throughput plus p50/p95/p99 latency
+per outcome, per program and per server phase (from the `timings` field).
+
+Results can be saved as JSON and compared with an earlier run:
+
+Usage:
+    cd api
+    python3 bench/load_test.py --mode inprocess --concurrency 4 --requests 200 --out before.json
+    python3 bench/load_test.py --mode http --url http://localhost:3000 --concurrency 16 \\
+        --duration 60 --compare before.json
+
+Identical programs are served from the result/binary caches after the first
+run; --unique appends a distinct comment to every submission so each one is
+compiled and run (cold path). In-process mode lowers MAX_EXECUTION_TIME to
+--run-timeout so the timeout program does not stall the run; in HTTP mode
+the server's own settings apply.
+"""
+
+import argparse
+import collections
+import gzip
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+PERCENTILES = (50, 95, 99)
+
+_HELLO = 'package main\n\nimport "fmt"\n\nfunc main() {\n\tfmt.Println("Hola, Go Guru")\n}\n'
+
+CORPUS = {
+    'hello_world': ('/execute', {'code': _HELLO, 'expectedOutput': 'Hola, Go Guru'}),
+    'loops': ('/execute', {
+        'code': (
+            'package main\n\nimport "fmt"\n\nfunc main() {\n'
+            '\tsum := 0\n\tfor i := 0; i < 5000000; i++ {\n\t\tif i%3 == 0 || i%5 == 0 {\n\t\t\tsum += i\n\t\t}\n\t}\n'
+            '\tfmt.Println(sum)\n}\n'
+        ),
+        'expectedOutput': '/^\\d+$/',
+    }),
+    'goroutines': ('/execute', {
+        'code': (
+            'package main\n\nimport (\n\t"fmt"\n\t"sync"\n)\n\n'
+            'func main() {\n\tvar wg sync.WaitGroup\n\tresults := make(chan int, 8)\n'
+            '\tfor w := 1; w <= 8; w++ {\n\t\twg.Add(1)\n\t\tgo func(n int) {\n\t\t\tdefer wg.Done()\n'
+            '\t\t\tsum := 0\n\t\t\tfor i := 0; i < 100000*n; i++ {\n\t\t\t\tsum += i % n\n\t\t\t}\n'
+            '\t\t\tresults <- sum\n\t\t}(w)\n\t}\n\twg.Wait()\n\tclose(results)\n'
+            '\ttotal := 0\n\tfor r := range results {\n\t\ttotal += r\n\t}\n\tfmt.Println(total)\n}\n'
+        ),
+    }),
+    'compile_error': ('/execute', {
+        'code': 'package main\n\nimport "fmt"\n\nfunc main() {\n\tx := 1\n\tfmt.Println(y)\n}\n',
+    }),
+    'runtime_panic': ('/execute', {
+        'code': 'package main\n\nfunc main() {\n\tvar items []int\n\t_ = items[3]\n}\n',
+    }),
+    'timeout': ('/execute', {
+        'code': 'package main\n\nfunc main() {\n\tfor x := 0; x >= 0; x = (x + 1) % 1000 {\n\t}\n}\n',
+    }),
+    'output_flood': ('/execute', {
+        'code': 'package main\n\nimport "fmt"\n\nfunc main() {\n\tfor i := 0; i < 1000000; i++ {\n\t\tfmt.Println("spam", i)\n\t}\n}\n',
+    }),
+    'test_cases': ('/execute/tests', {
+        'code': (
+            'package main\n\nimport "fmt"\n\nfunc Solution(n int) int {\n\tsum := 0\n'
+            '\tfor n > 0 {\n\t\tsum += n % 10\n\t\tn /= 10\n\t}\n\treturn sum\n}\n\n'
+            'func main() {\n\tfmt.Println(Solution(123))\n}\n'
+        ),
+        'testCases': [{'input': 123, 'output': 6}, {'input': 0, 'output': 0}, {'input': 9999, 'output': 36}],
+    }),
+    'check': ('/check', {'code': _HELLO.replace('fmt.Println("Hola, Go Guru")', 'fmt.Printf("%d\\n", "Hola")')}),
+}
+
+_COMPILE_ERROR_RE = re.compile(r'^(?:# command-line-arguments|\./main\.go:\d+)', re.M)
+
+
+def classify(path: str, status: int, body: dict) -> str:
+    """Outcome of one request, from its response (same names as the server metrics)"""
+    if status == 503:
+        return 'busy'
+    if status == 400:
+        return 'validation_reject'
+    if status >= 500 or not isinstance(body, dict):
+        return 'server_error'
+    if path == '/check':
+        if body.get('ok'):
+            return 'ok'
+        errors = [d for d in body.get('diagnostics', []) if d.get('severity') == 'error']
+        return 'compile_error' if errors else ('vet_warning' if body.get('success') else 'timeout')
+    if path == '/execute/tests':
+        if not body.get('success'):
+            return 'timeout' if 'tiempo límite' in body.get('error', '') else 'compile_error'
+        return 'correct' if body.get('allPassed') else 'wrong_output'
+    if path == '/compile/wasm':
+        if body.get('success'):
+            return 'ok'
+        stderr = body.get('stderr', '')
+        if body.get('runOnServer'):
+            return 'timeout' if 'tiempo límite' in stderr else 'binary_too_large'
+        return 'compile_error'
+    if body.get('success'):
+        if 'correct' in body:
+            return 'correct' if body['correct'] else 'wrong_output'
+        return 'ok'
+    stderr = body.get('stderr', '')
+    if 'tiempo límite' in stderr:
+        return 'timeout'
+    if 'output excedió el límite' in stderr:
+        return 'output_limit'
+    if _COMPILE_ERROR_RE.search(stderr):
+        return 'compile_error'
+    return 'runtime_error'
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))  # ceil
+    return sorted_values[int(rank) - 1]
+
+
+def distribution(values: list) -> dict:
+    values = sorted(values)
+    summary = {'count': len(values)}
+    for p in PERCENTILES:
+        summary[f'p{p}'] = round(percentile(values, p), 1)
+    summary['max'] = round(values[-1], 1) if values else 0.0
+    return summary
+
+
+class InProcessClient:
+    """Calls app.handler directly, as the Lambda runtime would"""
+
+    def __init__(self):
+        sys.path.insert(0, SRC_DIR)
+        import app
+        self.app = app
+
+    def send(self, path: str, body: dict):
+        event = {'rawPath': path, 'body': json.dumps(body)}
+        response = self.app.handler(event, None)
+        return response['statusCode'], json.loads(response['body'])
+
+
+class HttpClient:
+    """
+    POSTs to a running local_server.py
+
+    With keep_alive, each thread reuses one HTTP/1.1 connection and accepts
+    gzip, as a browser does; otherwise every request opens a new connection.
+    """
+
+    def __init__(self, url: str, timeout: float, keep_alive: bool = False):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.connections = 0  # opened in keep-alive mode
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def send(self, path: str, body: dict):
+        if self.keep_alive:
+            return self._send_persistent(path, body)
+        request = urllib.request.Request(
+            self.url + path, data=json.dumps(body).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            raw = e.read().decode('utf-8', errors='replace')
+            try:
+                return e.code, json.loads(raw)
+            except json.JSONDecodeError:
+                return e.code, {'error': raw[:200]}
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            parsed = urllib.parse.urlsplit(self.url)
+            conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=self.timeout)
+            self._local.conn = conn
+            with self._lock:
+                self.connections += 1
+        return conn
+
+    def _send_persistent(self, path: str, body: dict):
+        data = json.dumps(body).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'}
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request('POST', path, body=data, headers=headers)
+                response = conn.getresponse()
+                raw = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed an idle connection: reopen once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+                continue
+            if response.will_close:
+                conn.close()
+                self._local.conn = None
+            if response.getheader('Content-Encoding') == 'gzip':
+                raw = gzip.decompress(raw)
+            text = raw.decode('utf-8', errors='replace')
+            try:
+                return response.status, json.loads(text)
+            except json.JSONDecodeError:
+                return response.status, {'error': text[:200]}
+
+
+def run_load(client, programs: list, concurrency: int, requests: int, duration: float,
+             unique: bool, seed: int) -> tuple:
+    """
+    Returns:
+        Tuple of (records, wall_seconds)
+    """
+    order = list(programs)
+    random.Random(seed).shuffle(order)
+    schedule = itertools.cycle(order)
+    counter = itertools.count()
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration if duration else None
+    records = []
+
+    def next_request():
+        with lock:
+            n = next(counter)
+            if (deadline is None and n >= requests) or (deadline is not None and time.monotonic() >= deadline):
+                return None
+            return n, next(schedule)
+
+    def worker():
+        while True:
+            item = next_request()
+            if item is None:
+                return
+            n, name = item
+            path, body = CORPUS[name]
+            if unique:
+                body = {**body, 'code': body['code'] + f'\n// bench {seed}-{n}\n'}
+            started = time.perf_counter()
+            try:
+                status, response = client.send(path, body)
+            except Exception as e:
+                status, response = 0, {'error': str(e)}
+            latency = (time.perf_counter() - started) * 1000
+            outcome = classify(path, status, response) if status else 'client_error'
+            record = {
+                'program': name,
+                'status': status,
+                'outcome': outcome,
+                'cache': response.get('cache') if isinstance(response, dict) else None,
+                'latencyMs': round(latency, 3),
+                'timings': response.get('timings', {}) if isinstance(response, dict) else {},
+            }
+            with lock:
+                records.append(record)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return records, time.monotonic() - started
+
+
+def summarize(records: list, wall: float) -> dict:
+    by_outcome = collections.defaultdict(list)
+    by_program = collections.defaultdict(list)
+    by_phase = collections.defaultdict(list)
+    caches = collections.Counter()
+    for r in records:
+        by_outcome[r['outcome']].append(r['latencyMs'])
+        by_program[r['program']].append(r['latencyMs'])
+        caches[r['cache'] or 'none'] += 1
+        for key, value in r['timings'].items():
+            if key != 'totalMs':
+                by_phase[key].append(value)
+    return {
+        'requests': len(records),
+        'wallSeconds': round(wall, 3),
+        'throughput': round(len(records) / wall, 2) if wall else 0.0,
+        'latency': distribution([r['latencyMs'] for r in records]),
+        'outcomes': {k: distribution(v) for k, v in sorted(by_outcome.items())},
+        'programs': {k: distribution(v) for k, v in sorted(by_program.items())},
+        'phases': {k: distribution(v) for k, v in sorted(by_phase.items())},
+        'cache': dict(sorted(caches.items())),
+    }
+
+
+def environment(args) -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SRC_DIR,
+                                capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'mode': args.mode,
+        'url': args.url if args.mode == 'http' else None,
+        'concurrency': args.concurrency,
+        'unique': args.unique,
+        'keepAlive': args.keep_alive,
+        'programs': args.programs,
+        'seed': args.seed,
+    }
+
+
+def print_table(title: str, rows: dict, baseline: dict = None):
+    print(f"\n{title:<20}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, d in rows.items():
+        line = f"{name:<20}{d['count']:>7}{d['p50']:>10}{d['p95']:>10}{d['p99']:>10}{d['max']:>10}"
+        old = (baseline or {}).get(name)
+        if old and old.get('p50'):
+            line += f"   p50 {(d['p50'] - old['p50']) / old['p50']:+.0%}"
+            if old.get('p95'):
+                line += f" p95 {(d['p95'] - old['p95']) / old['p95']:+.0%}"
+        print(line)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=('inprocess', 'http'), default='inprocess')
+    parser.add_argument('--url', default='http://localhost:3000', help='local_server base URL (http mode)')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=100, help='total requests (ignored with --duration)')
+    parser.add_argument('--duration', type=float, default=0, help='seconds to keep sending instead of --requests')
+    parser.add_argument('--programs', default=','.join(CORPUS), help='comma-separated corpus entries')
+    parser.add_argument('--unique', action='store_true', help='defeat the result/binary caches')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--run-timeout', type=int, default=5, help='MAX_EXECUTION_TIME in-process (seconds)')
+    parser.add_argument('--http-timeout', type=float, default=120)
+    parser.add_argument('--keep-alive', action='store_true', help='reuse one connection per worker (http mode)')
+    parser.add_argument('--out', help='save summary and raw records as JSON')
+    parser.add_argument('--compare', help='earlier --out file to diff against')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args()
+
+    programs = [p.strip() for p in args.programs.split(',') if p.strip()]
+    unknown = [p for p in programs if p not in CORPUS]
+    if unknown:
+        parser.error(f"unknown programs: {', '.join(unknown)} (available: {', '.join(CORPUS)})")
+
+    if args.mode == 'inprocess':
+        os.environ.setdefault('MAX_EXECUTION_TIME', str(args.run_timeout))
+        client = InProcessClient()
+    else:
+        client = HttpClient(args.url, args.http_timeout, args.keep_alive)
+
+    records, wall = run_load(client, programs, args.concurrency, args.requests, args.duration,
+                             args.unique, args.seed)
+    summary = summarize(records, wall)
+    result = {'environment': environment(args), 'summary': summary}
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({**result, 'records': records}, f, indent=2, ensure_ascii=False)
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return 0
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['summary']
+
+    print(f"{summary['requests']} requests in {summary['wallSeconds']}s "
+          f"({summary['throughput']} req/s, concurrency {args.concurrency}, {args.mode})")
+    if baseline:
+        print(f"baseline: {baseline['throughput']} req/s")
+    print(f"cache: {summary['cache']}")
+    if args.mode == 'http' and args.keep_alive:
+        print(f"connections: {client.connections}")
+    print_table('all', {'all': summary['latency']}, {'all': baseline.get('latency')} if baseline else None)
+    print_table('outcome', summary['outcomes'], baseline.get('outcomes'))
+    print_table('program', summary['programs'], baseline.get('programs'))
+    print_table('phase (server)', summary['phases'], baseline.get('phases'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""
+Replay flight recorder entries against the current engine
+
+Reads the records written by src/flight_recorder.py (slow or failed
+requests) and re-runs each one, either through app.handler in this process
+or against a running local_server.py. Prints the recorded and the replayed
+latency, outcome and phases side by side, so a production hot spot can be
+reproduced locally and a fix checked against it.
+
+Usage:
+    cd api
+    python3 bench/replay.py                      # records in FLIGHT_RECORDER_DIR
+    python3 bench/replay.py flights/ --route execute --slowest 10 --repeat 3 --trace
+    python3 bench/replay.py slot-00042.json --mode http --url http://localhost:3000
+
+Each replay appends a distinct comment to the code, so it is compiled and
+run again instead of being served from the result/binary caches. Use
+--cached to keep the code as recorded. Records without code
+(FLIGHT_RECORD_CODE=none) are skipped. Redacted code still compiles, but
+its output may differ from the original.
+
+In-process, --trace runs every build with `go build -x` and shows its
+slowest steps. Replays are never written over the records being replayed.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from load_test import SRC_DIR, HttpClient, InProcessClient, classify
+
+sys.path.insert(0, SRC_DIR)
+import flight_recorder  # noqa: E402
+import metrics  # noqa: E402
+
+ROUTE_PATHS = {'execute': '/execute', 'tests': '/execute/tests', 'check': '/check', 'wasm': '/compile/wasm'}
+TRACE_STEPS_SHOWN = 5
+# Part of every replay comment: a later invocation must not hit this one's cached binaries
+RUN_ID = f'{os.getpid()}-{int(time.time())}'
+
+
+def load_records(paths: list) -> list:
+    """Records from slot files, directories of them, or JSON-lines files"""
+    records = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(n for n in os.listdir(path) if n.startswith('slot-') and n.endswith('.json'))
+            files = [os.path.join(path, n) for n in names]
+        else:
+            files = [path]
+        for name in files:
+            with open(name) as f:
+                text = f.read().strip()
+            if not text:
+                continue
+            try:
+                records.append(json.loads(text))
+            except json.JSONDecodeError:
+                records.extend(json.loads(line) for line in text.splitlines() if line.strip())
+    records.sort(key=lambda r: r.get('seq', -1))
+    return records
+
+
+def replay_body(record: dict, n: int, cached: bool) -> dict:
+    body = {k: v for k, v in record['request'].items() if k != 'codeRedacted'}
+    if not cached:
+        body['code'] += f'\n// replay {RUN_ID} {record.get("seq")}-{n}\n'
+    return body
+
+
+def replay(client, record: dict, repeat: int, cached: bool) -> dict:
+    path = ROUTE_PATHS.get(record['route'], '/execute')
+    runs = []
+    for n in range(repeat):
+        body = replay_body(record, n, cached)
+        started = time.perf_counter()
+        try:
+            status, response = client.send(path, body)
+        except Exception as e:
+            status, response = 0, {'error': str(e)}
+        latency = (time.perf_counter() - started) * 1000
+        runs.append({
+            'codeHash': flight_recorder.code_hash(body['code']),
+            'status': status,
+            'outcome': classify(path, status, response) if status else 'client_error',
+            'latencyMs': round(latency, 3),
+            'timings': response.get('timings', {}) if isinstance(response, dict) else {},
+        })
+    return {
+        'seq': record.get('seq'),
+        'route': record['route'],
+        'codeHash': record['codeHash'],
+        'recorded': {'outcome': record['outcome'], 'totalMs': record['totalMs'], 'timings': record['timings']},
+        'replayed': {
+            'outcomes': sorted({r['outcome'] for r in runs}),
+            'medianMs': round(statistics.median(r['latencyMs'] for r in runs), 3),
+            'runs': runs,
+        },
+    }
+
+
+def attach_traces(results: list, recorder) -> None:
+    """Add the -x trace recorded for each replayed run (in-process --trace)"""
+    traces = {r['codeHash']: r.get('buildTrace') for r in recorder.entries()}
+    for result in results:
+        for run in result['replayed']['runs']:
+            run['buildTrace'] = traces.get(run['codeHash'])
+
+
+def print_report(results: list, skipped: int) -> None:
+    print(f"{len(results)} records replayed" + (f", {skipped} skipped (no code)" if skipped else ''))
+    print(f"\n{'seq':>6}  {'route':<8}{'recorded':<16}{'ms':>10}   {'replayed':<16}{'ms':>10}{'change':>9}")
+    for r in results:
+        recorded, replayed = r['recorded'], r['replayed']
+        change = (replayed['medianMs'] - recorded['totalMs']) / recorded['totalMs'] if recorded['totalMs'] else 0.0
+        print(f"{r['seq']!s:>6}  {r['route']:<8}{recorded['outcome']:<16}{recorded['totalMs']:>10.1f}   "
+              f"{','.join(replayed['outcomes']):<16}{replayed['medianMs']:>10.1f}{change:>+9.0%}")
+        phases = sorted(recorded['timings'].items(), key=lambda kv: -kv[1])[:3]
+        replay_timings = replayed['runs'][0]['timings']
+        details = ', '.join(f"{name} {ms:.0f}→{replay_timings.get(metrics.millis_key(name), 0):.0f}"
+                            for name, ms in phases)
+        if details:
+            print(f"{'':>8}phases ms: {details}")
+        for run in replayed['runs']:
+            steps = sorted(run.get('buildTrace') or [], key=lambda s: -s['durationMs'])[:TRACE_STEPS_SHOWN]
+            for step in steps:
+                print(f"{'':>8}{step['durationMs']:>8.1f} ms  {step['command'][:90]}")
+            if steps:
+                break
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='*', help='slot files, record directories or JSON-lines files '
+                                                 '(default: FLIGHT_RECORDER_DIR)')
+    parser.add_argument('--mode', choices=('inprocess', 'http'), default='inprocess')
+    parser.add_argument('--url', default='http://localhost:3000', help='local_server base URL (http mode)')
+    parser.add_argument('--route', choices=sorted(ROUTE_PATHS), help='only records of this route')
+    parser.add_argument('--outcome', help='only records with this recorded outcome')
+    parser.add_argument('--slowest', type=int, default=0, help='only the N slowest records')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per record (median is reported)')
+    parser.add_argument('--concurrency', type=int, default=1, help='records replayed at once')
+    parser.add_argument('--cached', action='store_true', help='do not defeat the result/binary caches')
+    parser.add_argument('--trace', action='store_true', help='trace every build with go build -x (in-process)')
+    parser.add_argument('--http-timeout', type=float, default=120)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    paths = args.paths or [flight_recorder.FLIGHT_RECORDER_DIR]
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        parser.error(f"not found: {', '.join(missing)}")
+    records = load_records(paths)
+    if args.route:
+        records = [r for r in records if r['route'] == args.route]
+    if args.outcome:
+        records = [r for r in records if r['outcome'] == args.outcome]
+    if args.slowest:
+        records = sorted(records, key=lambda r: -r['totalMs'])[:args.slowest]
+    replayable = [r for r in records if r['request'].get('code')]
+    skipped = len(records) - len(replayable)
+    if not replayable:
+        print('No hay registros para reproducir' + (f' ({skipped} sin código)' if skipped else ''))
+        return 1
+
+    recorder = None
+    if args.mode == 'inprocess':
+        client = InProcessClient()
+        # Replays go to a scratch recorder (all of them, to collect their traces), never over the input
+        recorder = flight_recorder.FlightRecorder(
+            directory=tempfile.mkdtemp(prefix='go-guru-replay-'),
+            slots=len(replayable) * max(1, args.repeat) + 1, slow_ms=0, log=False
+        )
+        flight_recorder.RECORDER = recorder
+        flight_recorder.FLIGHT_TRACE_SAMPLE = 1.0 if args.trace else 0.0
+    else:
+        client = HttpClient(args.url, args.http_timeout)
+
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        results = list(pool.map(lambda r: replay(client, r, max(1, args.repeat), args.cached), replayable))
+    if recorder is not None and args.trace:
+        attach_traces(results, recorder)
+
+    if args.json:
+        print(json.dumps({'skipped': skipped, 'results': results}, indent=2, ensure_ascii=False))
+    else:
+        print_report(results, skipped)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Key balance and movement of the router's consistent hash ring
+
+Places --keys random code hashes on a ring of --nodes nodes (router.HashRing)
+and reports how evenly they are spread, then how many keys change owner
+when one node joins or leaves. Every moved key is a cold cache on its new
+node. The ideal is an even share per node and 1/(N+1) (join) or 1/N (leave)
+of the keys moved, all of them to (join) or from (leave) that node.
+
+Usage:
+    cd api
+    python3 bench/router_ring.py [--nodes 4] [--keys 100000] [--vnodes 40,160,640] [--json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+
+from load_test import SRC_DIR
+
+sys.path.insert(0, SRC_DIR)
+import router  # noqa: E402
+
+
+def node_urls(count: int, base_port: int = 3001) -> list:
+    return [f'http://localhost:{port}' for port in range(base_port, base_port + count)]
+
+
+def owners(ring: router.HashRing, keys: list) -> list:
+    return [ring.owner(key) for key in keys]
+
+
+def measure(nodes: int, vnodes: int, keys: list) -> dict:
+    urls = node_urls(nodes + 1)
+    ring = router.HashRing(vnodes)
+    ring.set_nodes(urls[:nodes])
+    before = owners(ring, keys)
+
+    shares = [before.count(url) / len(keys) for url in urls[:nodes]]
+    ring.set_nodes(urls)
+    after_join = owners(ring, keys)
+    ring.set_nodes(urls[1:nodes])
+    after_leave = owners(ring, keys)
+
+    joined = sum(a != b for a, b in zip(before, after_join))
+    left = sum(a != b for a, b in zip(before, after_leave))
+    return {
+        'vnodes': vnodes,
+        'shareMin': round(min(shares), 4),
+        'shareMax': round(max(shares), 4),
+        'shareStdev': round(statistics.pstdev(shares), 4),
+        'movedOnJoin': round(joined / len(keys), 4),
+        # Keys that moved anywhere but to the new node (should be 0)
+        'strayOnJoin': sum(a != b and b != urls[nodes] for a, b in zip(before, after_join)),
+        'movedOnLeave': round(left / len(keys), 4),
+        'strayOnLeave': sum(a != b and a != urls[0] for a, b in zip(before, after_leave)),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=4)
+    parser.add_argument('--keys', type=int, default=100000)
+    parser.add_argument('--vnodes', default=f'40,{router.ROUTER_VNODES},640', help='comma-separated values to compare')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    keys = [hashlib.sha256(os.urandom(16)).hexdigest() for _ in range(args.keys)]
+    results = [measure(args.nodes, int(v), keys) for v in args.vnodes.split(',')]
+
+    if args.json:
+        print(json.dumps({'nodes': args.nodes, 'keys': args.keys, 'results': results}, indent=2))
+        return 0
+    print(f"{args.keys} keys on {args.nodes} nodes: ideal share {1 / args.nodes:.3f}, "
+          f"ideal moved {1 / (args.nodes + 1):.3f} on join, {1 / args.nodes:.3f} on leave")
+    print(f"\n{'vnodes':>7}{'share min':>11}{'max':>8}{'stdev':>8}{'join moved':>12}{'stray':>7}"
+          f"{'leave moved':>13}{'stray':>7}")
+    for r in results:
+        print(f"{r['vnodes']:>7}{r['shareMin']:>11.3f}{r['shareMax']:>8.3f}{r['shareStdev']:>8.3f}"
+              f"{r['movedOnJoin']:>12.3f}{r['strayOnJoin']:>7}{r['movedOnLeave']:>13.3f}{r['strayOnLeave']:>7}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Process launch latency: preexec_fn vs spawn vs forkserver
+
+Starts a trivial program (`true`) many times through each launch path and
+reports p50/p95/p99 of the time until it was exec'd (spawn) and until it
+was reaped (total). Runs sequentially and from --threads threads at once,
+with a --heap-mb ballast in this process: forking a large server costs
+more, which the forkserver helper avoids.
+
+    preexec     subprocess.Popen(preexec_fn=setpgrp + setrlimit), the old path
+    spawn       launcher, PROCESS_LAUNCHER=spawn
+    forkserver  launcher, PROCESS_LAUNCHER=forkserver
+
+Usage:
+    cd api
+    python3 bench/spawn_latency.py [--launches 200] [--threads 8] [--heap-mb 256] [--json]
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+from load_test import SRC_DIR, distribution
+
+sys.path.insert(0, SRC_DIR)
+import launcher  # noqa: E402
+
+LIMITS = {
+    resource.RLIMIT_CPU: 30,
+    resource.RLIMIT_AS: 1024 * 1024 * 1024,
+    resource.RLIMIT_FSIZE: 10 * 1024 * 1024,
+    resource.RLIMIT_NPROC: 256,
+}
+
+
+def _preexec() -> None:
+    os.setpgrp()
+    launcher.apply_limits(sorted(LIMITS.items()))
+
+
+def launch_preexec(argv: list) -> tuple:
+    started = time.perf_counter()
+    proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, preexec_fn=_preexec)
+    spawned = time.perf_counter()
+    proc.communicate()
+    return spawned - started, time.perf_counter() - started
+
+
+def launch_with(mode: str):
+    def launch(argv: list) -> tuple:
+        launcher.PROCESS_LAUNCHER = mode
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        started = time.perf_counter()
+        try:
+            process = launcher.spawn(argv, '/tmp', None, LIMITS, stdout_w, stderr_w)
+        finally:
+            os.close(stdout_w)
+            os.close(stderr_w)
+        spawned = time.perf_counter()
+        process.wait(None)
+        total = time.perf_counter() - started
+        os.close(stdout_r)
+        os.close(stderr_r)
+        return spawned - started, total
+    return launch
+
+
+def measure(launch, argv: list, launches: int, threads: int) -> dict:
+    spawn_ms, total_ms = [], []
+    lock = threading.Lock()
+    per_thread = max(1, launches // threads)
+
+    def worker():
+        for _ in range(per_thread):
+            spawn, total = launch(argv)
+            with lock:
+                spawn_ms.append(spawn * 1000)
+                total_ms.append(total * 1000)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - started
+    return {
+        'launchesPerSecond': round(len(total_ms) / wall, 1),
+        'spawnMs': distribution(spawn_ms),
+        'totalMs': distribution(total_ms),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--launches', type=int, default=200, help='per mode and concurrency level')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent launchers for the parallel run')
+    parser.add_argument('--heap-mb', type=int, default=256, help='memory held by this process while forking')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    argv = [shutil.which('true') or '/bin/true']
+    ballast = bytearray(args.heap_mb * 1024 * 1024)
+    for i in range(0, len(ballast), 4096):
+        ballast[i] = 1  # touch every page so fork has page tables to copy
+
+    launcher.FORK_SERVER.start()
+    modes = {'preexec': launch_preexec, 'spawn': launch_with('spawn'), 'forkserver': launch_with('forkserver')}
+    results = {}
+    for name, launch in modes.items():
+        for _ in range(5):
+            launch(argv)  # warm up (the forkserver helper, page cache)
+        results[name] = {
+            'sequential': measure(launch, argv, args.launches, 1),
+            'parallel': measure(launch, argv, args.launches, args.threads),
+        }
+
+    if args.json:
+        print(json.dumps({'heapMb': args.heap_mb, 'threads': args.threads, 'results': results}, indent=2))
+        return 0
+    print(f"{args.launches} launches of {argv[0]} per run, {args.heap_mb} MB heap, {os.cpu_count()} CPUs")
+    print(f"\n{'mode':<12}{'run':<12}{'launch/s':>10}{'spawn p50':>11}{'p99':>9}{'total p50':>11}{'p99':>9}")
+    for name, runs in results.items():
+        for run, r in runs.items():
+            label = run if run == 'sequential' else f'{args.threads} threads'
+            print(f"{name:<12}{label:<12}{r['launchesPerSecond']:>10}{r['spawnMs']['p50']:>11}"
+                  f"{r['spawnMs']['p99']:>9}{r['totalMs']['p50']:>11}{r['totalMs']['p99']:>9}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
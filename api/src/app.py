@@ -1,43 +1,125 @@
+import base64
+import contextlib
+import hashlib
 import json
 import subprocess
-import tempfile
 import os
 import re
+import resource
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, Tuple
+from typing import Callable, ContextManager, Dict, Any, List, Optional, Sequence, Tuple
+
+import binary_cache
+import build_cache
+import flight_recorder
+import go_scanner
+from go_scanner import FORBIDDEN_IMPORTS, SUSPICIOUS_IMPORTS
+import launcher
+import metrics
+import output_compare
+import process_runner
+import result_cache
+import singleflight
+import test_harness
+import workspace_pool
 
 # Security constants
 MAX_CODE_SIZE = 10000  # 10KB max code size
 MAX_OUTPUT_SIZE = 5000  # 5KB max output size
 EXECUTION_TIMEOUT = int(os.environ.get('MAX_EXECUTION_TIME', '30'))  # seconds (incluye compilación + ejecución)
 MAX_BINARY_SIZE = 50 * 1024 * 1024  # 50MB max binary size
+MAX_WASM_SIZE = 4 * 1024 * 1024  # js/wasm module; base64-encoded it still fits a 6 MB Lambda response
 MAX_LINES = 500  # Maximum lines of code
+TEST_CASE_TIMEOUT = int(os.environ.get('TEST_CASE_TIMEOUT', '5'))  # seconds per test case
+MAX_TEST_WORKERS = int(os.environ.get('MAX_TEST_WORKERS', str(min(8, os.cpu_count() or 2))))
+# Execution slots for the test-case fan-out beyond the request's own: called
+# with the number wanted, yields how many it got. local_server.py lends idle
+# scheduler slots; a Lambda container runs one request at a time, so by
+# default all are granted.
+EXTRA_TEST_SLOTS: Callable[[int], ContextManager[int]] = contextlib.nullcontext
 
-# Forbidden imports that could be used maliciously
-FORBIDDEN_IMPORTS = [
-    'os/exec',      # Prevent command execution
-    'syscall',      # Prevent system calls
-    'unsafe',       # Prevent unsafe operations
-    'net/http',     # Prevent network requests
-    'net/rpc',      # Prevent RPC calls
-    'plugin',       # Prevent loading plugins
-    'reflect',      # Prevent reflection abuse (opcional, puede ser necesario para algunos ejercicios)
-]
+# Hard per-process limits (0 disables one). The compiler gets more room than user programs.
+# RLIMIT_NPROC counts every thread of the user, so it must leave room for the server itself.
+RUN_LIMITS = {
+    resource.RLIMIT_CPU: int(os.environ.get('RUN_CPU_SECONDS', str(EXECUTION_TIMEOUT))),
+    resource.RLIMIT_AS: int(os.environ.get('RUN_MEMORY_MB', '1024')) * 1024 * 1024,
+    resource.RLIMIT_FSIZE: int(os.environ.get('RUN_MAX_FILE_MB', '10')) * 1024 * 1024,
+    resource.RLIMIT_NPROC: int(os.environ.get('RUN_MAX_PROCESSES', '256')),
+}
+BUILD_LIMITS = {
+    resource.RLIMIT_CPU: int(os.environ.get('BUILD_CPU_SECONDS', str(2 * EXECUTION_TIMEOUT))),
+    resource.RLIMIT_AS: int(os.environ.get('BUILD_MEMORY_MB', '2048')) * 1024 * 1024,
+    resource.RLIMIT_FSIZE: int(os.environ.get('BUILD_MAX_FILE_MB', '200')) * 1024 * 1024,
+    resource.RLIMIT_NPROC: int(os.environ.get('BUILD_MAX_PROCESSES', '512')),
+}
+MAX_COMPILE_OUTPUT = 64 * 1024  # compiler errors kept per build
+MAX_DIAGNOSTICS = 50  # diagnostics returned by /check
+
+# Messages for processes killed by a resource limit
+LIMIT_SIGNAL_MESSAGES = {
+    -signal.SIGXCPU: "La ejecución excedió el límite de tiempo de CPU",
+    -signal.SIGXFSZ: "La ejecución excedió el tamaño máximo de archivo",
+    -signal.SIGKILL: "La ejecución fue terminada (límite de recursos excedido)",
+}
 
-# Suspicious patterns that might indicate malicious code
-SUSPICIOUS_PATTERNS = [
-    r'for\s*{\s*}',              # Infinite loop: for {}
-    r'for\s*;\s*;\s*{',          # Infinite loop: for ; ; {
-    r'goto\s+\w+',               # Goto statements (código confuso)
-    r'//\s*go:linkname',         # Compiler directives
-    r'crypto/rand',              # Random access (puede ser usado para evadir detección)
+# Compiler flags for user code (part of the binary cache key)
+GO_BUILD_FLAGS = [
+    '-ldflags', '-s -w',  # Strip debug info to reduce size
+    '-trimpath',  # Remove file system paths
 ]
 
+# Suspicious constructs (see go_scanner.scan): infinite loops `for {}` / `for ;; {`,
+# goto statements (código confuso) and `//go:linkname` compiler directives
+MAX_SELF_CALLS = 20  # Calls per function above this look like recursive abuse
+
+# Container init: seed/warm the shared Go build cache before the first request
+build_cache.prepare()
+# ...and start the process launcher while the first request is on its way
+launcher.start()
+
+# /check type-checks a copy renamed to a library package: `go build` then compiles without linking
+CHECK_PACKAGE_RE = re.compile(r'^(\s*package\s+)main\b', re.M)
+# `./main.go:12:5: undefined: x` (go build) / `vet: ./main.go:12:5: ...` (go vet type errors)
+DIAGNOSTIC_RE = re.compile(r'^(?:vet: )?(?:\./)?main\.go:(\d+):(\d+): (.+)$', re.M)
+
+# Outcomes of execute_go_code that depend only on the code (safe to cache)
+CACHEABLE_OUTCOMES = {'compile_error', 'binary_too_large', 'runtime_error', 'output_limit', 'ok'}
+
+# Identical compiles/runs in progress: concurrent duplicates wait for the first one
+COMPILE_FLIGHTS = singleflight.SingleFlight()
+RUN_FLIGHTS = singleflight.SingleFlight()
+
+# Compiled binaries of recent submissions; MAX_BINARY_SIZE bounds each entry
+BINARY_STORE = binary_cache.BinaryStore(
+    binary_cache.BINARY_CACHE_DIR, binary_cache.BINARY_CACHE_MAX_BYTES, MAX_BINARY_SIZE
+)
+# js/wasm modules run by the browser (/compile/wasm), served as /wasm/<key>.wasm
+WASM_STORE = binary_cache.BinaryStore(
+    binary_cache.WASM_CACHE_DIR, binary_cache.WASM_CACHE_MAX_BYTES, MAX_WASM_SIZE, suffix='.wasm'
+)
+# Build target -> (store, extra go environment)
+BUILD_TARGETS = {
+    'native': (BINARY_STORE, {}),
+    'wasm': (WASM_STORE, {'GOOS': 'js', 'GOARCH': 'wasm'}),
+}
+# /wasm/ assets are content-addressed: a URL never changes its content
+# Only for /wasm/ assets whose bytes were just hashed and match their name
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+WASM_MODULE_RE = re.compile(r'^([0-9a-f]{64})\.wasm$')
+WASM_EXEC_RE = re.compile(r'^wasm_exec-([0-9a-f]{64})\.js$')
+# Scratch directories (sources, binary, program cwd), reused across requests
+WORKSPACES = workspace_pool.WorkspacePool()
+
 
-def validate_code(code: str) -> Tuple[bool, str]:
+def validate_code(code: str, require_main: bool = True) -> Tuple[bool, str]:
     """
     Validate Go code for security issues
 
+    `require_main` is False for graded code, where the harness provides main.
+
     Returns:
         Tuple of (is_valid, error_message)
     """
@@ -53,119 +135,319 @@ def validate_code(code: str) -> Tuple[bool, str]:
     if lines > MAX_LINES:
         return False, f"El código excede el número máximo de líneas ({MAX_LINES})"
 
+    # One pass over the tokens: strings and comments are never matched as code
+    facts = go_scanner.scan(code)
+
     # Check for forbidden imports
-    for forbidden in FORBIDDEN_IMPORTS:
-        if f'"{forbidden}"' in code or f'"{forbidden}/' in code:
-            return False, f"El import '{forbidden}' no está permitido por razones de seguridad"
+    for path in facts.imports:
+        for forbidden in FORBIDDEN_IMPORTS:
+            if path == forbidden or path.startswith(forbidden + '/'):
+                return False, f"El import '{forbidden}' no está permitido por razones de seguridad"
 
     # Check for suspicious patterns
-    for pattern in SUSPICIOUS_PATTERNS:
-        if re.search(pattern, code, re.IGNORECASE):
-            return False, "Se detectó un patrón de código sospechoso. Por favor, simplifica tu código."
+    if (facts.infinite_loop or facts.has_goto or facts.has_linkname
+            or any(path in SUSPICIOUS_IMPORTS for path in facts.imports)):
+        return False, "Se detectó un patrón de código sospechoso. Por favor, simplifica tu código."
 
     # Check for excessive recursion (simple heuristic)
-    func_name_pattern = r'func\s+(\w+)\s*\('
-    func_names = re.findall(func_name_pattern, code)
-    for func_name in func_names:
-        # Count how many times this function calls itself
-        self_calls = code.count(f'{func_name}(')
-        if self_calls > 20:  # Heuristic: probably recursive abuse
+    for func_name in facts.functions:
+        # Count how many times this function is called (declaration included)
+        if facts.calls[func_name] > MAX_SELF_CALLS:  # Heuristic: probably recursive abuse
             return False, f"La función '{func_name}' parece tener demasiadas llamadas recursivas"
 
     # Check for package main
-    if 'package main' not in code:
+    if not facts.has_package_main:
         return False, "El código debe contener 'package main'"
 
     # Check for main function
-    if 'func main()' not in code:
+    if require_main and not facts.has_main_func:
         return False, "El código debe contener 'func main()'"
 
-    # Check for shell characters (potential command injection attempts)
-    shell_chars = ['$', '`', '$(', '&&', '||', ';', '|']
-    for char in shell_chars:
-        if char in code and 'import' not in code.split(char)[0]:
-            # Allow in strings, but be suspicious otherwise
-            pass  # This is a soft check
-
     return True, ""
 
 
-def execute_go_code(code: str) -> Tuple[bool, str, str]:
+def _build_binary(sources: Dict[str, str], workdir: str, binary_key: str,
+                  trace: Optional[flight_recorder.BuildTrace] = None,
+                  target: str = 'native') -> Dict[str, Any]:
     """
-    Execute Go code safely and return the result
+    Run `go build` and admit the binary into the target's store (BUILD_TARGETS)
+
+    With a `trace`, the build runs with -x and the trace collects its steps.
 
     Returns:
-        Tuple of (success, stdout, stderr)
+        Dict with binary (stored path or None), error, outcome, usage and duration
     """
-    # Create temporary directory for execution
-    with tempfile.TemporaryDirectory() as tmpdir:
-        file_path = Path(tmpdir) / "main.go"
-        binary_path = Path(tmpdir) / 'main'
-
+    store, target_env = BUILD_TARGETS[target]
+    binary_path = Path(workdir) / f'main{store.suffix}'
+    file_paths = []
+    for name, src in sorted(sources.items()):
         # Write code to file
-        file_path.write_text(code)
+        file_path = Path(workdir) / name
+        file_path.write_text(src)
+        file_paths.append(str(file_path))
+
+    # Compile the Go code with optimizations for speed
+    trace_flags = ['-x'] if trace is not None else []
+    with build_cache.build_lock():
+        if trace is not None:
+            trace.begin()
+        compile_result = process_runner.run_process(
+            ['go', 'build', *trace_flags, *GO_BUILD_FLAGS, '-o', str(binary_path), *file_paths],
+            workdir,
+            EXECUTION_TIMEOUT,
+            MAX_COMPILE_OUTPUT,
+            # Shared, pre-warmed build cache: stdlib is not recompiled per request;
+            # the go tool's own scratch files go to tmpfs too
+            env=build_cache.go_env({'GOTMPDIR': WORKSPACES.tmpdir(), **target_env}),
+            limits=BUILD_LIMITS,
+            on_stderr=trace.feed if trace is not None else None
+        )
+    build = {'binary': None, 'error': '', 'outcome': None,
+             'usage': compile_result.usage(), 'duration': compile_result.duration}
+
+    build_cache.maybe_trim()
+
+    if compile_result.timed_out:
+        raise subprocess.TimeoutExpired('go build', EXECUTION_TIMEOUT)
+
+    if compile_result.returncode != 0:
+        build['outcome'] = 'compile_error'
+        # The -x lines are not part of the compiler's message
+        stderr = trace.output() if trace is not None else compile_result.stderr
+        build['error'] = stderr or LIMIT_SIGNAL_MESSAGES.get(compile_result.returncode, '')
+        return build
+
+    # Check binary size (prevent compilation bombs)
+    binary_size = binary_path.stat().st_size
+    if binary_size > store.max_entry_bytes:
+        build['outcome'] = 'binary_too_large'
+        build['error'] = (f"El binario compilado es demasiado grande ({binary_size} bytes). "
+                          f"Límite: {store.max_entry_bytes}")
+        return build
+
+    # The stored copy outlives this workdir, so requests sharing the build can run it
+    build['binary'] = store.put(binary_key, binary_path) or binary_path
+    return build
 
-        try:
-            # Compile the Go code with optimizations for speed
-            compile_result = subprocess.run(
-                [
-                    'go', 'build',
-                    '-ldflags', '-s -w',  # Strip debug info to reduce size
-                    '-trimpath',  # Remove file system paths
-                    '-o', str(binary_path),
-                    str(file_path)
-                ],
-                capture_output=True,
-                text=True,
-                timeout=EXECUTION_TIMEOUT,
-                cwd=tmpdir,
-                # Optimize for compilation speed
-                env={
-                    **os.environ,
-                    'GOCACHE': tmpdir,
-                    'GOPATH': tmpdir,
-                    'CGO_ENABLED': '0',  # Disable CGO for faster compilation
-                }
-            )
 
-            if compile_result.returncode != 0:
-                return False, "", compile_result.stderr
+def compile_go_code(sources: Dict[str, str], workdir: str, stats: Dict[str, Any],
+                    target: str = 'native') -> Tuple[Optional[Path], str]:
+    """
+    Compile one or more Go files of package main, reusing stored binaries
+
+    Identical builds requested concurrently run `go build` once; the others
+    wait for it and reuse its stored binary (binaryCache: shared).
+
+    Args:
+        sources: file name -> source code
+        workdir: scratch directory for the sources and the binary
+        stats: filled with binaryCache (hit | miss | shared), compile usage, outcome on
+            failure and, when this build was sampled by the flight recorder, buildTrace
+        target: `native` (run here) or `wasm` (GOOS=js GOARCH=wasm, run by the browser)
+
+    Returns:
+        Tuple of (binary_path or None, error_message)
+    """
+    store = BUILD_TARGETS[target][0]
+    binary_key = store.key(
+        [f"{name}\n{src}" for name, src in sorted(sources.items())], GO_BUILD_FLAGS,
+        extra='' if target == 'native' else target
+    )
 
-            # Check binary size (prevent compilation bombs)
-            binary_size = binary_path.stat().st_size
-            if binary_size > MAX_BINARY_SIZE:
-                return False, "", f"El binario compilado es demasiado grande ({binary_size} bytes). Límite: {MAX_BINARY_SIZE}"
+    # Unchanged code: run the stored binary, skip go build entirely
+    binary_path = store.get(binary_key)
+    stats['binaryCache'] = 'hit' if binary_path is not None else 'miss'
+    if binary_path is not None:
+        return binary_path, ""
+
+    started = time.monotonic()
+    trace = flight_recorder.BuildTrace() if flight_recorder.should_trace() else None
+    try:
+        build, shared = COMPILE_FLIGHTS.do(
+            binary_key,
+            lambda: _build_binary(sources, workdir, binary_key, trace, target),
+            # A binary left in the leader's workdir (not admitted to the store) is not reusable
+            shareable=lambda b: b['binary'] is None or store.root in b['binary'].parents
+        )
+    finally:
+        # Also kept when the build timed out; empty if another request's build was reused
+        if trace is not None and trace.started is not None:
+            stats['buildTrace'] = trace.steps()
+    if shared:
+        stats['binaryCache'] = 'shared'
+        stats['compile'] = None
+        stats.setdefault('phases', {})['compile'] = time.monotonic() - started
+        metrics.COALESCED.inc('compile')
+    else:
+        stats['compile'] = build['usage']
+        stats.setdefault('phases', {})['compile'] = build['duration']
+
+    if build['binary'] is None:
+        stats['outcome'] = build['outcome']
+        return None, build['error']
+    return build['binary'], ""
+
+
+def run_binary(binary_path: Path, cwd: str, args: Sequence[str] = (),
+               timeout: float = EXECUTION_TIMEOUT,
+               on_output: Optional[Callable[[bytes], Optional[bool]]] = None) -> process_runner.ProcessResult:
+    """
+    Run a compiled user binary, reading its output incrementally.
+    The process is killed as soon as stdout or stderr exceeds MAX_OUTPUT_SIZE.
+
+    Args:
+        on_output: receives stdout chunks as they are produced (streaming mode)
+
+    Raises:
+        subprocess.TimeoutExpired if it runs longer than `timeout`
+
+    Returns:
+        ProcessResult with output already limited
+    """
+    result = process_runner.run_process(
+        [str(binary_path), *args], cwd, timeout, MAX_OUTPUT_SIZE,
+        on_stdout=on_output, limits=RUN_LIMITS, confine=True
+    )
+    if result.timed_out:
+        raise subprocess.TimeoutExpired(str(binary_path), timeout)
+
+    if result.output_exceeded:
+        result = result._replace(
+            stdout=result.stdout + f"\n... (output truncado, límite: {MAX_OUTPUT_SIZE} bytes)",
+            stderr=(result.stderr + "\n" if result.stderr else "")
+            + f"Ejecución detenida: el output excedió el límite de {MAX_OUTPUT_SIZE} bytes"
+        )
+    elif result.returncode in LIMIT_SIGNAL_MESSAGES and not result.cancelled:
+        result = result._replace(
+            stderr=(result.stderr + "\n" if result.stderr else "") + LIMIT_SIGNAL_MESSAGES[result.returncode]
+        )
+    return result
+
+
+def execute_go_code(code: str, stats: Optional[Dict[str, Any]] = None,
+                    on_output: Optional[Callable[[bytes], Optional[bool]]] = None) -> Tuple[bool, str, str]:
+    """
+    Execute Go code safely and return the result
+
+    `on_output` receives stdout chunks while the program runs (streaming mode).
+
+    If `stats` is given it is filled with details about the execution:
+    - outcome: compile_error | binary_too_large | runtime_error | output_limit | ok | timeout
+      | cancelled | internal_error
+    - binaryCache: hit | miss | shared (hit and shared skip `go build`)
+    - compile / run: wall time, user/sys CPU and peak RSS of each step
+    - phases: phase name -> seconds
+
+    Returns:
+        Tuple of (success, stdout, stderr)
+    """
+    if stats is None:
+        stats = {}
+
+    # Create temporary directory for execution
+    # Pooled scratch directory on tmpfs instead of a TemporaryDirectory per request
+    with WORKSPACES.workspace(stats) as tmpdir:
+        try:
+            binary_path, error = compile_go_code({'main.go': code}, tmpdir, stats)
+            if binary_path is None:
+                return False, "", error
 
             # Execute the compiled binary
-            exec_result = subprocess.run(
-                [str(binary_path)],
-                capture_output=True,
-                text=True,
-                timeout=EXECUTION_TIMEOUT,
-                cwd=tmpdir,
-                # Security: prevent child processes
-                preexec_fn=os.setpgrp if hasattr(os, 'setpgrp') else None
-            )
+            result = run_binary(binary_path, tmpdir, on_output=on_output)
+            stats['run'] = result.usage()
+            stats['exitCode'] = result.returncode
+            stats.setdefault('phases', {})['run'] = result.duration
 
-            # Limit output size
-            stdout = exec_result.stdout[:MAX_OUTPUT_SIZE]
-            stderr = exec_result.stderr[:MAX_OUTPUT_SIZE]
+            if result.cancelled:
+                # The client went away mid-run: not a property of the code
+                stats['outcome'] = 'cancelled'
+                return False, result.stdout, result.stderr
 
-            if len(exec_result.stdout) > MAX_OUTPUT_SIZE:
-                stdout += f"\n... (output truncado, límite: {MAX_OUTPUT_SIZE} bytes)"
+            if result.output_exceeded:
+                stats['outcome'] = 'output_limit'
+                return False, result.stdout, result.stderr
 
-            return exec_result.returncode == 0, stdout, stderr
+            stats['outcome'] = 'ok' if result.returncode == 0 else 'runtime_error'
+            return result.returncode == 0, result.stdout, result.stderr
 
         except subprocess.TimeoutExpired:
+            stats['outcome'] = 'timeout'
             return False, "", f"La ejecución excedió el tiempo límite de {EXECUTION_TIMEOUT} segundos"
         except Exception as e:
+            stats['outcome'] = 'internal_error'
             return False, "", f"Error de ejecución: {str(e)}"
 
 
-def validate_output(actual_output: str, expected_output: str) -> Tuple[bool, str]:
+def _parse_diagnostics(output: str, severity: str, source: str) -> List[Dict[str, Any]]:
+    """Compiler/vet output -> [{line, column, message, severity, source}]"""
+    return [
+        {
+            'line': int(line),
+            'column': int(column),
+            'message': message.strip(),
+            'severity': severity,
+            'source': source,
+        }
+        for line, column, message in DIAGNOSTIC_RE.findall(output)[:MAX_DIAGNOSTICS]
+    ]
+
+
+def check_go_code(code: str, stats: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Type-check and vet Go code without linking or running it
+
+    `go vet` type-checks first but stops at the first type error; only then
+    the compiler (`-gcflags=-e`, no linking) is asked for the full list.
+
+    Args:
+        stats: filled with the check phase and the usage of each tool
+
+    Returns:
+        List of diagnostics (empty if the code is fine)
+
+    Raises:
+        subprocess.TimeoutExpired: the compiler or vet took too long
+    """
+    started = time.monotonic()
+    with WORKSPACES.workspace(stats) as tmpdir:
+        (Path(tmpdir) / 'main.go').write_text(CHECK_PACKAGE_RE.sub(r'\1goguru_check', code, count=1))
+
+        def run_tool(argv: List[str], name: str) -> process_runner.ProcessResult:
+            result = process_runner.run_process(
+                argv, tmpdir, EXECUTION_TIMEOUT, MAX_COMPILE_OUTPUT,
+                env=build_cache.go_env({'GOTMPDIR': WORKSPACES.tmpdir()}), limits=BUILD_LIMITS
+            )
+            if result.timed_out:
+                raise subprocess.TimeoutExpired(argv[:2], EXECUTION_TIMEOUT)
+            stats[name] = result.usage()
+            return result
+
+        with build_cache.build_lock():
+            vet_result = run_tool(['go', 'vet', 'main.go'], 'vet')
+            type_error = re.search(r'^vet: ', vet_result.stderr, re.M) is not None
+            if vet_result.returncode == 0 or not type_error:
+                diagnostics = _parse_diagnostics(vet_result.stderr, 'warning', 'vet')
+            else:
+                compile_result = run_tool(['go', 'build', '-gcflags=-e', 'main.go'], 'compile')
+                diagnostics = _parse_diagnostics(compile_result.stderr, 'error', 'compiler')
+                if not diagnostics:
+                    diagnostics = _parse_diagnostics(vet_result.stderr, 'error', 'compiler')
+
+    if vet_result.returncode != 0 and not diagnostics:
+        # Killed by a limit or an error without position
+        message = (vet_result.stderr.strip()
+                   or LIMIT_SIGNAL_MESSAGES.get(vet_result.returncode, 'Error de compilación'))
+        diagnostics = [{'line': 0, 'column': 0, 'message': message, 'severity': 'error', 'source': 'compiler'}]
+
+    stats.setdefault('phases', {})['check'] = time.monotonic() - started
+    return diagnostics
+
+
+def validate_output(actual_output: str, expected_output: str, mode: str = 'exact',
+                    tolerance: float = output_compare.DEFAULT_TOLERANCE) -> Tuple[bool, str]:
     """
     Validate actual output against expected output
-    Supports both exact match and regex patterns
+    Supports exact match, regex patterns and the comparison modes of output_compare
 
     Expected output format:
     - Exact string: "hello world"
@@ -174,26 +456,676 @@ def validate_output(actual_output: str, expected_output: str) -> Tuple[bool, str
     Returns:
         Tuple of (is_match, message)
     """
-    # Clean outputs (strip trailing newlines and spaces)
-    actual = actual_output.strip()
-    expected = expected_output.strip()
+    return output_compare.compare(actual_output, expected_output, mode, tolerance)
+
+
+def _run_test_case(binary_path: Path, workdir: str, index: int,
+                   test_case: Dict[str, Any], setup_error: str) -> Dict[str, Any]:
+    """Run a single test case in its own process with its own timeout"""
+    result: Dict[str, Any] = {
+        'index': index,
+        'input': test_case.get('args', test_case.get('input')),
+        'expected': test_case.get('output'),
+        'passed': False,
+    }
+    if setup_error:
+        result.update({'status': 'error', 'error': setup_error, 'timeMs': 0})
+        return result
+
+    started = time.monotonic()
+    try:
+        run = run_binary(binary_path, workdir, [str(index)], timeout=TEST_CASE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        result.update({
+            'status': 'timeout',
+            'error': f"El test excedió el tiempo límite de {TEST_CASE_TIMEOUT} segundos",
+            'timeMs': round((time.monotonic() - started) * 1000, 1),
+        })
+        return result
+    except Exception as e:
+        result.update({'status': 'error', 'error': f"Error de ejecución: {str(e)}", 'timeMs': 0})
+        return result
 
-    # Check if expected is a regex pattern (enclosed in /)
-    if expected.startswith('/') and expected.endswith('/'):
-        pattern = expected[1:-1]  # Remove slashes
+    output, actual, found = test_harness.parse_case_output(run.stdout)
+    expected = test_harness.format_expected(test_case.get('output', ''))
+    result.update({
+        'timeMs': round((time.monotonic() - started) * 1000, 1),
+        'output': output,
+        'stderr': run.stderr,
+        'usage': run.usage(),
+    })
+    if run.returncode != 0 or not found:
+        # Panics, os.Exit and output floods end up here
+        result.update({'status': 'error', 'error': run.stderr.strip() or f"Código de salida {run.returncode}"})
+        return result
+
+    result['actual'] = actual.strip()
+    result['passed'] = result['actual'] == expected
+    result['status'] = 'passed' if result['passed'] else 'failed'
+    return result
+
+
+def execute_test_cases(code: str, test_cases: List[Dict[str, Any]],
+                       stats: Optional[Dict[str, Any]] = None) -> Tuple[int, Dict[str, Any]]:
+    """
+    Compile the user code once with a generated harness and run every
+    test case in its own process with its own timeout, in parallel on the
+    request's slot plus whatever EXTRA_TEST_SLOTS grants.
+
+    `stats` is filled with the compile details, as in compile_go_code.
+
+    Returns:
+        Tuple of (status_code, body)
+    """
+    sources, setup_errors = test_harness.build_harness(code, test_cases)
+    if stats is None:
+        stats = {}
+
+    with WORKSPACES.workspace(stats) as tmpdir:
         try:
-            if re.search(pattern, actual):
-                return True, "¡Correcto! El output coincide con el patrón esperado."
+            started = time.monotonic()
+            binary_path, error = compile_go_code(sources, tmpdir, stats)
+            compile_ms = round((time.monotonic() - started) * 1000, 1)
+        except subprocess.TimeoutExpired:
+            return 200, {
+                'success': False,
+                'outcome': 'timeout',
+                'error': f"La compilación excedió el tiempo límite de {EXECUTION_TIMEOUT} segundos"
+            }
+
+        if binary_path is None:
+            return 200, {
+                'success': False,
+                'error': 'Error de compilación',
+                'stderr': error
+            }
+
+        wanted = max(1, min(MAX_TEST_WORKERS, len(test_cases)))
+        with EXTRA_TEST_SLOTS(wanted - 1) as extra, ThreadPoolExecutor(max_workers=1 + extra) as pool:
+            results = list(pool.map(
+                lambda item: _run_test_case(binary_path, tmpdir, item[0], item[1], setup_errors[item[0]]),
+                enumerate(test_cases)
+            ))
+
+    passed = sum(1 for r in results if r['passed'])
+    return 200, {
+        'success': True,
+        'allPassed': passed == len(results),
+        'passed': passed,
+        'total': len(results),
+        'compileTimeMs': compile_ms,
+        'binaryCache': stats.get('binaryCache'),
+        'compileUsage': stats.get('compile'),
+        'results': results
+    }
+
+
+def handle_tests(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    /execute/tests: grade user code against structured test cases
+
+    Expected request body:
+    {
+        "code": "package main\\n...func Solution(input string) int {...}",
+        "testCases": [{"input": "abc", "output": 3}, {"args": [1, 2], "output": 3}]
+    }
+    """
+    started = time.monotonic()
+    code = body.get('code', '')
+    test_cases = body.get('testCases')
+
+    error = None
+    if not code:
+        error = 'El código es requerido'
+    elif not isinstance(test_cases, list) or not test_cases:
+        error = "'testCases' debe ser una lista no vacía"
+    elif len(test_cases) > test_harness.MAX_TEST_CASES:
+        error = f"Demasiados test cases (máximo {test_harness.MAX_TEST_CASES})"
+    elif not all(isinstance(tc, dict) for tc in test_cases):
+        error = 'Cada test case debe ser un objeto'
+    elif any(test_harness.has_non_finite(tc) for tc in test_cases):
+        error = 'Los test cases no pueden contener NaN ni Infinity'
+    else:
+        is_valid, error_msg = validate_code(code, require_main=False)
+        if not is_valid:
+            error = error_msg
+    phases = {'validate': time.monotonic() - started}
+    if error:
+        metrics.record_request('tests', 'validation_reject', phases, time.monotonic() - started)
+        return _response(400, {'success': False, 'error': error})
+
+    stats: Dict[str, Any] = {}
+    status_code, response_body = execute_test_cases(code, test_cases, stats)
+
+    total = time.monotonic() - started
+    if response_body['success']:
+        outcome = 'correct' if response_body['allPassed'] else 'wrong_output'
+        phases['compile'] = response_body['compileTimeMs'] / 1000
+        phases['run'] = max(0.0, total - phases['compile'] - phases['validate'])
+    else:
+        outcome = response_body.get('outcome', 'compile_error')
+    metrics.record_request('tests', outcome, phases, total)
+    flight_recorder.RECORDER.maybe_record('tests', body, outcome, phases, total, stats, status_code)
+    return _response(status_code, response_body)
+
+
+def handle_check(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    /check: diagnostics for the editor without running the code
+
+    Expected request body:
+    {
+        "code": "package main\\n..."
+    }
+
+    Response:
+    {
+        "success": true,
+        "ok": false,
+        "diagnostics": [{"line": 7, "column": 2, "message": "undefined: x",
+                         "severity": "error", "source": "compiler"}],
+        "cache": "miss"
+    }
+
+    Results are cached per exact source, so repeated calls (e.g. on every
+    keystroke pause) do not reach the compiler.
+    """
+    started = time.monotonic()
+    phases: Dict[str, float] = {}
+    code = body.get('code', '')
+
+    error = 'El código es requerido' if not code else None
+    if error is None:
+        is_valid, error_msg = validate_code(code)
+        if not is_valid:
+            error = error_msg
+    phases['validate'] = time.monotonic() - started
+    if error:
+        metrics.record_request('check', 'validation_reject', phases, time.monotonic() - started)
+        return _response(400, {'success': False, 'error': error})
+
+    key = result_cache.check_key(code)
+    lookup_started = time.monotonic()
+    cached = result_cache.RESULT_CACHE.get(key)
+    phases['cache_lookup'] = time.monotonic() - lookup_started
+    if cached is not None:
+        total = time.monotonic() - started
+        metrics.record_request('check', cached['outcome'], phases, total, 'hit')
+        return _response(200, {**cached['body'], 'cache': 'hit', 'timings': _timings(phases, total)})
+
+    stats: Dict[str, Any] = {'phases': phases}
+    try:
+        diagnostics = check_go_code(code, stats)
+    except subprocess.TimeoutExpired:
+        metrics.record_request('check', 'timeout', phases, time.monotonic() - started, 'miss')
+        flight_recorder.RECORDER.maybe_record('check', body, 'timeout', phases, time.monotonic() - started, stats)
+        return _response(200, {
+            'success': False,
+            'error': f'El análisis excedió el tiempo límite de {EXECUTION_TIMEOUT} segundos'
+        })
+
+    if any(d['severity'] == 'error' for d in diagnostics):
+        outcome = 'compile_error'
+    else:
+        outcome = 'vet_warning' if diagnostics else 'ok'
+    response_body = {'success': True, 'ok': not diagnostics, 'diagnostics': diagnostics}
+    result_cache.RESULT_CACHE.set(key, {'statusCode': 200, 'body': response_body, 'outcome': outcome})
+
+    total = time.monotonic() - started
+    metrics.record_request('check', outcome, phases, total, 'miss')
+    flight_recorder.RECORDER.maybe_record('check', body, outcome, phases, total, stats)
+    return _response(200, {
+        **response_body,
+        'usage': {'compile': stats.get('compile'), 'vet': stats.get('vet')},
+        'cache': 'miss',
+        'timings': _timings(phases, total)
+    })
+
+
+_wasm_exec_file: Optional[Tuple[Path, str]] = None
+
+
+def _wasm_exec() -> Optional[Tuple[Path, str]]:
+    """The toolchain's wasm_exec.js and its sha256 (read once), None if missing"""
+    global _wasm_exec_file
+    if _wasm_exec_file is None:
+        # Go 1.24 moved it from misc/wasm to lib/wasm
+        for relative in ('lib/wasm/wasm_exec.js', 'misc/wasm/wasm_exec.js'):
+            candidate = Path(build_cache.go_root()) / relative
+            try:
+                _wasm_exec_file = candidate, hashlib.sha256(candidate.read_bytes()).hexdigest()
+                break
+            except OSError:
+                continue
+    return _wasm_exec_file
+
+
+def wasm_exec_name() -> Optional[str]:
+    """wasm_exec.js must match the Go version that built the module, so its name carries its hash"""
+    wasm_exec = _wasm_exec()
+    return f'wasm_exec-{wasm_exec[1]}.js' if wasm_exec is not None else None
+
+
+def wasm_asset(name: str) -> Optional[Tuple[bytes, str]]:
+    """
+    Contents of /wasm/<name>: a module from WASM_STORE or the toolchain's
+    wasm_exec.js. Names carry the sha256 of the content, which is checked
+    against the bytes returned.
+
+    Returns:
+        Tuple of (data, content_type), or None if this container does not have it
+    """
+    module = WASM_MODULE_RE.match(name)
+    if module:
+        data = WASM_STORE.read(module.group(1))
+        return (data, 'application/wasm') if data is not None else None
+    wasm_exec = _wasm_exec()
+    if WASM_EXEC_RE.match(name) and wasm_exec is not None and name == wasm_exec_name():
+        path, digest = wasm_exec
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        if hashlib.sha256(data).hexdigest() == digest:
+            return data, 'text/javascript; charset=utf-8'
+    return None
+
+
+def handle_compile_wasm(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    /compile/wasm: build the code for GOOS=js GOARCH=wasm, to be run by the browser
+
+    Expected request body:
+    {
+        "code": "package main\\n..."
+    }
+
+    Optional, as for /execute: "expectedOutput", "compareMode", "tolerance".
+    If the curriculum index already has the /execute answer for them, it is
+    returned as `result` (no module is built).
+
+    Response:
+    {
+        "success": true,
+        "module": "/wasm/5d41...9c.wasm",
+        "wasmExec": "/wasm/wasm_exec-8f3a...41.js",
+        "sizeBytes": 2022685,
+        "binaryCache": "hit"
+    }
+
+    Both names are the sha256 of the content, checked on every read, so they
+    are served with a one-year immutable Cache-Control. The same validate_code rules apply as for /execute; the
+    output is graded with /validate. `runOnServer: true` on a failure that
+    does not come from the code (module too large, timeout) means: use /execute.
+    """
+    started = time.monotonic()
+    phases: Dict[str, float] = {}
+    code = body.get('code', '')
+
+    error = 'El código es requerido' if not code else None
+    if error is None:
+        is_valid, error_msg = validate_code(code)
+        if not is_valid:
+            error = error_msg
+    if error is None:
+        error, compare_mode, tolerance = _comparison_options(body)
+    phases['validate'] = time.monotonic() - started
+    if error:
+        metrics.record_request('wasm', 'validation_reject', phases, time.monotonic() - started)
+        return _response(400, {'success': False, 'error': error})
+
+    key = result_key(code, body.get('expectedOutput') or '', compare_mode, tolerance)
+    precomputed = result_cache.PRECOMPUTED.get(key) if key is not None else None
+    if precomputed is not None:
+        total = time.monotonic() - started
+        metrics.record_request('wasm', precomputed.get('outcome', 'unknown'), phases, total, 'precomputed')
+        return _response(200, {
+            'success': True,
+            'result': {**precomputed['body'], 'cache': 'precomputed'},
+            'timings': _timings(phases, total)
+        })
+
+    stats: Dict[str, Any] = {'phases': phases}
+    size = 0
+    with WORKSPACES.workspace(stats) as tmpdir:
+        try:
+            module, error = compile_go_code({'main.go': code}, tmpdir, stats, target='wasm')
+        except subprocess.TimeoutExpired:
+            module, error = None, f"La compilación excedió el tiempo límite de {EXECUTION_TIMEOUT} segundos"
+            stats['outcome'] = 'timeout'
+        # A module not admitted to the store would be gone with this workspace
+        if module is not None and WASM_STORE.root not in module.parents:
+            module, error = None, f"El módulo es demasiado grande para el caché (límite: {WASM_STORE.max_bytes} bytes)"
+            stats['outcome'] = 'binary_too_large'
+        if module is not None:
+            # Served under the sha256 of its content
+            digest = WASM_STORE.digest(module.name[:-len(WASM_STORE.suffix)])
+            if digest is None or wasm_exec_name() is None:
+                # Evicted since the build, or a toolchain without wasm_exec.js
+                module, error = None, "El módulo no está disponible, compílalo de nuevo"
+                stats['outcome'] = 'internal_error'
             else:
-                return False, f"El output no coincide. Se esperaba un patrón como: {pattern}"
-        except re.error as e:
-            return False, f"Error en el patrón regex: {str(e)}"
+                size = module.stat().st_size
+
+    total = time.monotonic() - started
+    outcome = 'ok' if module is not None else stats.get('outcome', 'compile_error')
+    metrics.record_request('wasm', outcome, phases, total)
+    if stats.get('binaryCache'):
+        metrics.CACHE_LOOKUPS.inc('wasm', stats['binaryCache'])
+    flight_recorder.RECORDER.maybe_record('wasm', body, outcome, phases, total, stats)
+
+    if module is None:
+        response_body = {'success': False, 'error': 'Error de compilación', 'stderr': error}
+        if outcome != 'compile_error':
+            response_body['runOnServer'] = True
+    else:
+        response_body = {
+            'success': True,
+            'module': f'/wasm/{digest}.wasm',
+            'wasmExec': f'/wasm/{wasm_exec_name()}',
+            'sizeBytes': size,
+        }
+    return _response(200, {
+        **response_body,
+        'binaryCache': stats.get('binaryCache'),
+        'usage': {'compile': stats.get('compile')},
+        'timings': _timings(phases, total)
+    })
+
+
+def handle_validate(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    /validate: grade output produced elsewhere (a /compile/wasm module run by
+    the browser) exactly as /execute grades the output of its own run
+
+    Expected request body:
+    {
+        "output": "8\\n",
+        "expectedOutput": "8",
+        "compareMode": "exact"
+    }
+
+    Response: success, correct, message, output and expectedOutput, as from
+    /execute. The output is whatever the client reports, so graded battles
+    keep running on the server (/execute/tests).
+    """
+    started = time.monotonic()
+    output = body.get('output')
+    expected_output = body.get('expectedOutput', '')
+
+    error = None
+    if not isinstance(output, str):
+        error = "'output' debe ser un string"
+    elif len(output.encode('utf-8')) > MAX_OUTPUT_SIZE:
+        error = f"El output excede el límite de {MAX_OUTPUT_SIZE} bytes"
+    elif not isinstance(expected_output, str) or not expected_output:
+        error = "'expectedOutput' es requerido"
     else:
-        # Exact match
-        if actual == expected:
-            return True, "¡Perfecto! El output es exactamente el esperado."
-        else:
-            return False, f"El output no coincide.\nEsperado: {expected}\nRecibido: {actual}"
+        error, compare_mode, tolerance = _comparison_options(body)
+    phases = {'validate': time.monotonic() - started}
+    if error:
+        metrics.record_request('validate', 'validation_reject', phases, time.monotonic() - started)
+        return _response(400, {'success': False, 'error': error})
+
+    compare_started = time.monotonic()
+    is_match, message = validate_output(output, expected_output, compare_mode, tolerance)
+    phases['validate_output'] = time.monotonic() - compare_started
+
+    total = time.monotonic() - started
+    metrics.record_request('validate', 'correct' if is_match else 'wrong_output', phases, total)
+    return _response(200, {
+        'success': True,
+        'correct': is_match,
+        'message': message,
+        'output': output,
+        'expectedOutput': expected_output,
+        'timings': _timings(phases, total)
+    })
+
+
+def _asset_name(path: str) -> Optional[str]:
+    """`x.wasm` for /wasm/x.wasm (with or without a stage prefix), else None"""
+    head, _, name = path.rpartition('/')
+    return name if head.endswith('/wasm') or head == 'wasm' else None
+
+
+def _asset_response(name: str) -> Dict[str, Any]:
+    """API Gateway response for a /wasm/ asset (binary body, base64-encoded)"""
+    asset = wasm_asset(name)
+    if asset is None:
+        # Another container built it, or it was evicted: the client compiles again or runs on /execute
+        return _response(404, {'success': False, 'error': 'Módulo no encontrado, compílalo de nuevo'})
+    data, content_type = asset
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': content_type,
+            'Cache-Control': IMMUTABLE_CACHE_CONTROL,
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': base64.b64encode(data).decode('ascii'),
+        'isBase64Encoded': True
+    }
+
+
+def _request_path(event: Dict[str, Any]) -> str:
+    """Request path for HTTP API (rawPath), REST API (path) and local_server events"""
+    path = event.get('rawPath') or event.get('path') or '/execute'
+    return path.rstrip('/')
+
+
+def _response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
+    """Build an API Gateway proxy response with a JSON body"""
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(body)
+    }
+
+
+def run_and_validate(code: str, expected_output: str,
+                     on_output: Optional[Callable[[bytes], Optional[bool]]] = None,
+                     stats: Optional[Dict[str, Any]] = None,
+                     compare_mode: str = 'exact',
+                     tolerance: float = output_compare.DEFAULT_TOLERANCE) -> Tuple[int, Dict[str, Any], bool]:
+    """
+    Execute validated code and build the response body
+
+    `stats` is filled as in execute_go_code, plus the validate_output phase.
+    With an expected output, stdout is compared while it streams and the
+    program is stopped as soon as it can no longer match.
+
+    Returns:
+        Tuple of (status_code, body, cacheable)
+    """
+    if stats is None:
+        stats = {}
+    comparator = output_compare.StreamComparator(expected_output, compare_mode, tolerance) if expected_output else None
+
+    def on_chunk(chunk: bytes) -> bool:
+        if on_output is not None and on_output(chunk) is False:
+            return False
+        return comparator.feed(chunk)
+
+    success, stdout, stderr = execute_go_code(
+        code, stats, on_output=on_chunk if comparator is not None else on_output
+    )
+    # Stopped by the comparator, not by the client: a wrong answer like any other
+    stopped_early = comparator is not None and comparator.diverged and stats.get('outcome') == 'cancelled'
+    if stopped_early:
+        success = True
+    # Timeouts and internal errors depend on load, not on the code
+    cacheable = stopped_early or stats.get('outcome') in CACHEABLE_OUTCOMES
+
+    if not success:
+        body = {
+            'success': False,
+            'error': 'Error de compilación o ejecución',
+            'stderr': stderr,
+            'stdout': stdout
+        }
+    elif expected_output:
+        # Validate output if expected output is provided
+        started = time.monotonic()
+        is_match, message = validate_output(stdout, expected_output, compare_mode, tolerance)
+        stats.setdefault('phases', {})['validate_output'] = time.monotonic() - started
+        stats['outcome'] = 'correct' if is_match else 'wrong_output'
+        if stopped_early:
+            message += "\n(Ejecución detenida: el output ya no podía coincidir)"
+        body = {
+            'success': True,
+            'correct': is_match,
+            'message': message,
+            'output': stdout,
+            'expectedOutput': expected_output
+        }
+        if stopped_early:
+            body['stoppedEarly'] = True
+    else:
+        # No validation needed, just return output
+        body = {
+            'success': True,
+            'output': stdout
+        }
+
+    # Resource usage of each step (compile is null when the binary was cached)
+    body['usage'] = {'compile': stats.get('compile'), 'run': stats.get('run')}
+    return 200, body, cacheable
+
+
+def result_key(code: str, expected_output: str, compare_mode: str = 'exact',
+               tolerance: float = output_compare.DEFAULT_TOLERANCE) -> Optional[str]:
+    """Result cache key of an /execute request, None when its output may change between runs"""
+    deterministic, _ = result_cache.is_deterministic(code)
+    if not deterministic:
+        return None
+    comparison = f'{compare_mode}:{tolerance!r}' if compare_mode == 'numeric' else compare_mode
+    return result_cache.cache_key(code, expected_output, comparison)
+
+
+def _comparison_options(body: Dict[str, Any]) -> Tuple[Optional[str], str, float]:
+    """
+    compareMode and tolerance of a request (/execute, /validate)
+
+    Returns:
+        Tuple of (error_message or None, compare_mode, tolerance)
+    """
+    compare_mode = body.get('compareMode') or 'exact'
+    tolerance = body.get('tolerance', output_compare.DEFAULT_TOLERANCE)
+    if compare_mode not in output_compare.COMPARE_MODES:
+        return f"compareMode debe ser uno de: {', '.join(output_compare.COMPARE_MODES)}", compare_mode, tolerance
+    if isinstance(tolerance, bool) or not isinstance(tolerance, (int, float)) or not 0 <= tolerance < float('inf'):
+        return 'tolerance debe ser un número no negativo', compare_mode, tolerance
+    return None, compare_mode, tolerance
+
+
+def _timings(phases: Dict[str, float], total: float) -> Dict[str, float]:
+    """Phase durations for the response body, in milliseconds"""
+    timings = {metrics.millis_key(phase): round(seconds * 1000, 3) for phase, seconds in phases.items()}
+    timings['totalMs'] = round(total * 1000, 3)
+    return timings
+
+
+def handle_execute(body: Dict[str, Any],
+                   on_output: Optional[Callable[[bytes], Optional[bool]]] = None) -> Dict[str, Any]:
+    """
+    /execute: validate, run (or serve from cache) and check the output
+
+    `on_output` receives stdout chunks as the program runs; local_server
+    uses it for its streaming mode. Cached results are not re-streamed.
+    """
+    started = time.monotonic()
+    phases: Dict[str, float] = {}
+    code = body.get('code', '')
+    expected_output = body.get('expectedOutput', '')
+
+    if not code:
+        metrics.record_request('execute', 'validation_reject', phases, time.monotonic() - started)
+        return _response(400, {
+            'success': False,
+            'error': 'El código es requerido'
+        })
+
+    error, compare_mode, tolerance = _comparison_options(body)
+    if error:
+        metrics.record_request('execute', 'validation_reject', phases, time.monotonic() - started)
+        return _response(400, {
+            'success': False,
+            'error': error
+        })
+
+    # Validate code for security
+    is_valid, error_msg = validate_code(code)
+    phases['validate'] = time.monotonic() - started
+    if not is_valid:
+        metrics.record_request('execute', 'validation_reject', phases, time.monotonic() - started)
+        return _response(400, {
+            'success': False,
+            'error': error_msg
+        })
+
+    # Serve deterministic programs from the curriculum index or the result cache
+    key = result_key(code, expected_output, compare_mode, tolerance)
+    if key is not None:
+        lookup_started = time.monotonic()
+        cached, cache_status = result_cache.PRECOMPUTED.get(key), 'precomputed'
+        if cached is None:
+            cached, cache_status = result_cache.RESULT_CACHE.get(key), 'hit'
+        phases['cache_lookup'] = time.monotonic() - lookup_started
+        if cached is not None:
+            total = time.monotonic() - started
+            metrics.record_request('execute', cached.get('outcome', 'unknown'), phases, total, cache_status)
+            return _response(cached['statusCode'], {
+                **cached['body'],
+                'cache': cache_status,
+                'timings': _timings(phases, total)
+            })
+
+    # Execute code
+    stats: Dict[str, Any] = {'phases': phases}
+
+    def execute() -> Tuple[int, Dict[str, Any], str]:
+        status, result_body, cacheable = run_and_validate(
+            code, expected_output, on_output, stats, compare_mode, tolerance
+        )
+        result_outcome = stats.get('outcome', 'unknown')
+        if key is not None and cacheable:
+            # Usage describes this execution only; cache hits report none
+            cached_body = {k: v for k, v in result_body.items() if k != 'usage'}
+            result_cache.RESULT_CACHE.set(key, {'statusCode': status, 'body': cached_body, 'outcome': result_outcome})
+        return status, result_body, result_outcome
+
+    shared = False
+    if key is None:
+        status_code, response_body, outcome = execute()
+    else:
+        # Identical deterministic submissions in flight share a single run
+        wait_started = time.monotonic()
+        (status_code, response_body, outcome), shared = RUN_FLIGHTS.do(
+            key, execute,
+            # A run stopped by its own client (or failing internally) is redone by each waiter
+            shareable=lambda result: result[2] not in ('cancelled', 'internal_error')
+        )
+        if shared:
+            phases['shared_wait'] = time.monotonic() - wait_started
+            response_body = {k: v for k, v in response_body.items() if k != 'usage'}
+            metrics.COALESCED.inc('run')
+
+    if shared:
+        cache_status = 'shared'
+    else:
+        cache_status = 'miss' if key is not None else 'bypass'
+    total = time.monotonic() - started
+    metrics.record_request('execute', outcome, phases, total, cache_status)
+    flight_recorder.RECORDER.maybe_record('execute', body, outcome, phases, total, stats, status_code)
+    return _response(status_code, {
+        **response_body,
+        'cache': cache_status,
+        'timings': _timings(phases, total)
+    })
 
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -203,123 +1135,70 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Expected request body:
     {
         "code": "package main\\n\\nimport \\"fmt\\"\\n\\nfunc main() { fmt.Println(\\"hello\\") }",
-        "expectedOutput": "/^hello$/"
+        "expectedOutput": "/^hello$/",
+        "compareMode": "exact"
     }
 
+    `compareMode` (optional) is exact, lines, whitespace or numeric (with an
+    optional `tolerance`, default 1e-6); see output_compare.
+
     Response:
     {
         "success": true,
         "correct": true,
         "message": "¡Correcto! El output coincide...",
         "output": "hello\\n",
-        "expectedOutput": "/^hello$/"
+        "expectedOutput": "/^hello$/",
+        "cache": "miss"
     }
+
+    `cache` is "hit", "miss", "shared" (reused an identical run in flight)
+    or "bypass" (nondeterministic program).
+
+    Requests to /execute/tests are graded against test cases (see handle_tests);
+    /check only type-checks and vets the code (see handle_check). /compile/wasm
+    builds a module for the browser, served from GET /wasm/<name>, and
+    /validate grades the output the browser got (see handle_compile_wasm).
     """
+    started = time.monotonic()
+    body: Any = {}
+    route = 'execute'
     try:
-        # Parse request body
-        body = json.loads(event.get('body', '{}'))
-        code = body.get('code', '')
-        expected_output = body.get('expectedOutput', '')
-
-        if not code:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'error': 'El código es requerido'
-                })
-            }
+        path = _request_path(event)
+        asset = _asset_name(path)
+        if asset is not None:
+            route = 'wasm'
+            return _asset_response(asset)
 
-        # Validate code for security
-        is_valid, error_msg = validate_code(code)
-        if not is_valid:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'error': error_msg
-                })
-            }
+        # Parse request body
+        body = json.loads(event.get('body') or '{}')
 
-        # Execute code
-        success, stdout, stderr = execute_go_code(code)
-
-        if not success:
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': False,
-                    'error': 'Error de compilación o ejecución',
-                    'stderr': stderr,
-                    'stdout': stdout
-                })
-            }
+        if path.endswith('/compile/wasm'):
+            route = 'wasm'
+            return handle_compile_wasm(body)
+        if path.endswith('/validate'):
+            route = 'validate'
+            return handle_validate(body)
+        if path.endswith('/execute/tests'):
+            route = 'tests'
+            return handle_tests(body)
+        if path.endswith('/check'):
+            route = 'check'
+            return handle_check(body)
 
-        # Validate output if expected output is provided
-        if expected_output:
-            is_match, message = validate_output(stdout, expected_output)
-
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': True,
-                    'correct': is_match,
-                    'message': message,
-                    'output': stdout,
-                    'expectedOutput': expected_output
-                })
-            }
-        else:
-            # No validation needed, just return output
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({
-                    'success': True,
-                    'output': stdout
-                })
-            }
+        return handle_execute(body)
 
     except json.JSONDecodeError:
-        return {
-            'statusCode': 400,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'success': False,
-                'error': 'JSON inválido en el body'
-            })
-        }
+        return _response(400, {
+            'success': False,
+            'error': 'JSON inválido en el body'
+        })
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'success': False,
-                'error': f'Error interno del servidor: {str(e)}'
-            })
-        }
+        flight_recorder.RECORDER.maybe_record(
+            route, body if isinstance(body, dict) else {}, 'internal_error', {},
+            time.monotonic() - started, status_code=500
+        )
+        return _response(500, {
+            'success': False,
+            'error': f'Error interno del servidor: {str(e)}'
+        })
@@ -0,0 +1,214 @@
+"""
+On-disk store of compiled binaries so re-running unchanged code skips `go build`
+
+Entries are keyed by source hash + Go version + build flags and evicted in
+LRU order (file mtime is bumped on every hit) when the store exceeds its
+byte budget. Files are written atomically, so several processes can share
+the same directory.
+
+The directory is not trusted: each process remembers the sha256 of what it
+admitted and get()/read() only return content that still matches, so an
+entry written by anyone else (another process, a program that escaped its
+sandbox) is never executed or served. A mismatching entry is dropped.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import build_cache
+
+# Both caps count against the /tmp budget (README "Disk Budget")
+BINARY_CACHE_DIR = os.environ.get('BINARY_CACHE_DIR', '/tmp/go-guru-bin')
+BINARY_CACHE_MAX_BYTES = int(os.environ.get('BINARY_CACHE_MAX_MB', '256')) * 1024 * 1024
+# js/wasm modules built for in-browser runs (/compile/wasm)
+WASM_CACHE_DIR = os.environ.get('WASM_CACHE_DIR', '/tmp/go-guru-wasm')
+WASM_CACHE_MAX_BYTES = int(os.environ.get('WASM_CACHE_MAX_MB', '256')) * 1024 * 1024
+
+EVICT_LOCK_FILE = '.evict.lock'
+HASH_CHUNK = 1024 * 1024
+
+
+class BinaryStore:
+    """Byte-bounded LRU of executables in a directory"""
+
+    def __init__(self, root: str, max_bytes: int, max_entry_bytes: int, suffix: str = ''):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._total: Optional[int] = None
+        # key -> sha256 of the content admitted by this process
+        self._digests: Dict[str, str] = {}
+
+    def key(self, sources: Sequence[str], flags: Sequence[str], extra: str = '') -> str:
+        """Cache key for a build: every source file, the Go version and the build flags"""
+        material = json.dumps([build_cache.go_version(), list(flags), extra, list(sources)])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}{self.suffix}"
+
+    def digest(self, key: str) -> Optional[str]:
+        """sha256 of the content admitted for `key`, None if this process did not admit it"""
+        with self._lock:
+            return self._digests.get(key)
+
+    def get(self, key: str) -> Optional[Path]:
+        """Return the stored binary for `key` (marking it recently used) or None"""
+        expected = self.digest(key)
+        if expected is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                actual = _sha256(f)
+            os.utime(path)
+        except OSError:
+            self._forget(key)
+            return None
+        if actual != expected:
+            print(f"[WARN] Binario alterado en la caché, se descarta: {path.name}")
+            self._drop(key)
+            return None
+        return path
+
+    def read(self, digest: str) -> Optional[bytes]:
+        """
+        Content of the entry this process admitted with sha256 `digest`, hashed
+        again after reading, so the bytes returned are exactly the ones named
+
+        Returns:
+            The content, or None if there is no such entry or it was altered
+        """
+        with self._lock:
+            key = next((k for k, d in self._digests.items() if d == digest), None)
+        if key is None:
+            return None
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            self._forget(key)
+            return None
+        if hashlib.sha256(data).hexdigest() != digest:
+            print(f"[WARN] Binario alterado en la caché, se descarta: {path.name}")
+            self._drop(key)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._digests.pop(key, None)
+
+    def _drop(self, key: str) -> None:
+        self._forget(key)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def put(self, key: str, binary_path: Path) -> Optional[Path]:
+        """
+        Admit a freshly built binary into the store
+
+        Returns:
+            Path of the stored binary, or None if it is too big to be admitted
+        """
+        size = binary_path.stat().st_size
+        if size > self.max_entry_bytes or size > self.max_bytes:
+            return None
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        final_path = self._path(key)
+        # Copy under a unique name, then rename: readers never see a partial file
+        tmp_path = self.root / f".tmp-{uuid.uuid4().hex}"
+        try:
+            with open(binary_path, 'rb') as src, open(tmp_path, 'xb') as dst:
+                digest = _sha256(src, dst)
+            os.chmod(tmp_path, 0o755)
+            os.replace(tmp_path, final_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+        with self._lock:
+            self._digests[key] = digest
+            if self._total is None:
+                self._total = self._scan_total()
+            else:
+                self._total += size
+            over_budget = self._total > self.max_bytes
+        if over_budget:
+            self.evict()
+        return final_path
+
+    def _entries(self):
+        entries = []
+        try:
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _scan_total(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """
+        Remove least recently used binaries until the store fits its budget.
+        Other processes may share the directory, so it rescans under an flock.
+
+        Returns:
+            Number of bytes freed
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.root / EVICT_LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            freed = 0
+            for _, size, path in entries:
+                if total - freed <= self.max_bytes:
+                    break
+                try:
+                    # Running executables keep working after unlink
+                    os.remove(path)
+                    freed += size
+                except OSError:
+                    pass
+                self._forget(Path(path).name[:len(Path(path).name) - len(self.suffix)])
+            with self._lock:
+                self._total = total - freed
+            return freed
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+def _sha256(src, dst=None) -> str:
+    """Hash a file object, copying it to `dst` on the way"""
+    h = hashlib.sha256()
+    while True:
+        chunk = src.read(HASH_CHUNK)
+        if not chunk:
+            return h.hexdigest()
+        h.update(chunk)
+        if dst is not None:
+            dst.write(chunk)
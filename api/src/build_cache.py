@@ -0,0 +1,498 @@
+"""
+Shared Go build cache for every execution in the container
+
+All requests compile against the same GOCACHE so the standard library and the
+runtime are only compiled once. The cache is warmed at image build (seed
+directory) or at container init, capped in size, and protected against
+concurrent writers with file locks.
+
+CLI:
+    python3 build_cache.py warm   # precompile the allowed stdlib packages
+    python3 build_cache.py trim   # enforce the size cap
+    python3 build_cache.py status
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import go_scanner
+
+# Cache locations (the Dockerfile sets GOCACHE/GOPATH, local runs use /tmp)
+GO_BUILD_CACHE_DIR = os.environ.get('GOCACHE') or '/tmp/go-build'
+GO_PATH_DIR = os.environ.get('GOPATH') or '/tmp/go'
+# Cache baked into the image at build time. Lambda mounts an empty /tmp, so
+# the seed is copied into GO_BUILD_CACHE_DIR on container init.
+GO_BUILD_CACHE_SEED_DIR = os.environ.get('GOCACHE_SEED', '/opt/go-build-seed')
+# Counts against the /tmp budget (README "Disk Budget")
+GO_BUILD_CACHE_MAX_BYTES = int(os.environ.get('GOCACHE_MAX_MB', '384')) * 1024 * 1024
+# After trimming, keep the cache at this fraction of the cap to avoid trimming on every build
+TRIM_TARGET_RATIO = 0.8
+TRIM_CHECK_INTERVAL = 60  # seconds between size checks
+# How long the trimmer waits for running builds to release the cache; new
+# builds wait for it meanwhile, so this also bounds their extra latency
+TRIM_LOCK_TIMEOUT = float(os.environ.get('GOCACHE_TRIM_LOCK_TIMEOUT', '10'))  # seconds
+WARM_UP_TIMEOUT = int(os.environ.get('GOCACHE_WARM_TIMEOUT', '600'))  # seconds
+# The background warm-up (no seed) yields to requests: it runs at this
+# niceness, one compile job at a time, in batches of packages, and waits
+# before each batch while a request build is running
+WARM_UP_NICENESS = int(os.environ.get('GOCACHE_WARM_NICENESS', '19'))
+WARM_UP_BATCH = 16  # packages per `go build`
+
+# Packages whose vet facts are precomputed so /check is fast from the first request
+VET_WARM_PACKAGES = ['bytes', 'errors', 'fmt', 'math', 'sort', 'strconv', 'strings', 'unicode']
+# The same packages are also built for js/wasm (/compile/wasm), unless disabled
+GOCACHE_WARM_WASM = os.environ.get('GOCACHE_WARM_WASM', '1') == '1'
+
+READY_MARKER = '.go-guru-ready'
+WARM_LOCK_FILE = '.go-guru-warm.lock'
+TRIM_LOCK_FILE = '.go-guru-trim.lock'
+# Held by a trimmer waiting for TRIM_LOCK_FILE so new builds queue behind it
+TRIM_INTENT_FILE = '.go-guru-trim-intent.lock'
+# Files that belong to the cache itself and must never be trimmed
+_PROTECTED_FILES = {'README', 'trim.txt', READY_MARKER, WARM_LOCK_FILE, TRIM_LOCK_FILE, TRIM_INTENT_FILE}
+
+_ready = threading.Event()
+_warm_thread: Optional[threading.Thread] = None
+_warm_thread_lock = threading.Lock()
+_last_trim_check = 0.0
+_trim_thread: Optional[threading.Thread] = None
+_trim_check_lock = threading.Lock()
+_go_version: Optional[str] = None
+_go_root: Optional[str] = None
+# Request builds in progress (the background warm-up waits for zero)
+_active_builds = 0
+_builds_idle = threading.Condition()
+
+
+def go_env(extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Environment for every `go` invocation so they all share the same cache
+    """
+    env = {
+        **os.environ,
+        'GOCACHE': GO_BUILD_CACHE_DIR,
+        'GOPATH': GO_PATH_DIR,
+        'CGO_ENABLED': '0',  # Disable CGO for faster compilation
+        'GOTOOLCHAIN': 'local',  # Never download toolchains at request time
+    }
+    if extra:
+        env.update(extra)
+    return env
+
+
+def go_version() -> str:
+    """Return the installed Go version (e.g. "go1.22.0"), cached per process"""
+    global _go_version
+    if _go_version is None:
+        try:
+            result = subprocess.run(
+                ['go', 'env', 'GOVERSION'],
+                capture_output=True, text=True, timeout=30, env=go_env()
+            )
+            _go_version = result.stdout.strip() or 'unknown'
+        except (OSError, subprocess.TimeoutExpired):
+            _go_version = 'unknown'
+    return _go_version
+
+
+def go_root() -> str:
+    """Return GOROOT of the installed toolchain (wasm_exec.js lives there), cached per process"""
+    global _go_root
+    if _go_root is None:
+        try:
+            result = subprocess.run(
+                ['go', 'env', 'GOROOT'],
+                capture_output=True, text=True, timeout=30, env=go_env()
+            )
+            _go_root = result.stdout.strip()
+        except (OSError, subprocess.TimeoutExpired):
+            _go_root = ''
+    return _go_root
+
+
+@contextmanager
+def _file_lock(name: str, exclusive: bool, blocking: bool = True,
+               timeout: Optional[float] = None) -> Iterator[bool]:
+    """
+    Hold an flock on a file inside the cache directory.
+    Yields False (without locking) if non-blocking, or still busy after
+    `timeout` seconds.
+    """
+    cache_dir = Path(GO_BUILD_CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    fd = os.open(cache_dir / name, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        if not blocking or timeout is not None:
+            flags |= fcntl.LOCK_NB
+        # flock has no timeout: poll
+        deadline = time.monotonic() + (timeout or 0.0)
+        while True:
+            try:
+                fcntl.flock(fd, flags)
+                break
+            except BlockingIOError:
+                if timeout is None or time.monotonic() >= deadline:
+                    yield False
+                    return
+                time.sleep(0.05)
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def build_lock() -> Iterator[None]:
+    """
+    Shared lock held while a build reads the cache.
+    Many builds can run at once; only trimming needs the exclusive side. A
+    build first passes the trim intent lock, so a waiting trimmer is not
+    starved by builds that keep overlapping.
+    """
+    global _active_builds
+    with _builds_idle:
+        _active_builds += 1
+    try:
+        with ExitStack() as stack:
+            with _file_lock(TRIM_INTENT_FILE, exclusive=False):
+                stack.enter_context(_file_lock(TRIM_LOCK_FILE, exclusive=False))
+            yield
+    finally:
+        with _builds_idle:
+            _active_builds -= 1
+            if not _active_builds:
+                _builds_idle.notify_all()
+
+
+def _wait_for_idle_builds() -> None:
+    with _builds_idle:
+        _builds_idle.wait_for(lambda: not _active_builds)
+
+
+def _read_marker(cache_dir: str) -> Optional[Dict[str, str]]:
+    try:
+        return json.loads((Path(cache_dir) / READY_MARKER).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def is_warm(cache_dir: str = GO_BUILD_CACHE_DIR) -> bool:
+    """True if the cache directory was warmed with the installed Go version"""
+    marker = _read_marker(cache_dir)
+    return bool(marker) and marker.get('goVersion') == go_version()
+
+
+def is_ready() -> bool:
+    """Readiness signal: the shared cache is warm and builds will be fast"""
+    if not _ready.is_set() and is_warm():
+        _ready.set()
+    return _ready.is_set()
+
+
+def wait_until_ready(timeout: Optional[float] = None) -> bool:
+    """Block until warm-up finishes (or the timeout expires)"""
+    return is_ready() or _ready.wait(timeout)
+
+
+def allowed_std_packages(forbidden: Sequence[str]) -> List[str]:
+    """
+    List the stdlib packages user code may import, i.e. `go list std`
+    minus internal/vendored packages and anything validate_code forbids
+    """
+    result = subprocess.run(
+        ['go', 'list', 'std'],
+        capture_output=True, text=True, timeout=60, env=go_env()
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"go list std falló: {result.stderr.strip()}")
+
+    packages = []
+    for pkg in result.stdout.split():
+        parts = pkg.split('/')
+        if 'internal' in parts or 'vendor' in parts:
+            continue
+        if any(pkg == f or pkg.startswith(f + '/') for f in forbidden):
+            continue
+        packages.append(pkg)
+    return packages
+
+
+def _copy_seed() -> bool:
+    """Copy the image-baked seed cache into the writable cache directory"""
+    if os.path.abspath(GO_BUILD_CACHE_SEED_DIR) == os.path.abspath(GO_BUILD_CACHE_DIR):
+        return False
+    if not is_warm(GO_BUILD_CACHE_SEED_DIR):
+        return False
+    shutil.copytree(GO_BUILD_CACHE_SEED_DIR, GO_BUILD_CACHE_DIR, dirs_exist_ok=True)
+    return True
+
+
+def warm_up(packages: Optional[Sequence[str]] = None, background: bool = False) -> bool:
+    """
+    Warm the shared cache: copy the seed if there is one, otherwise
+    precompile the allowed stdlib packages with the same flags user builds use.
+
+    Only one process warms at a time; the others wait and reuse its result.
+    In the background (server running) the compile yields to request builds
+    (WARM_UP_NICENESS, WARM_UP_BATCH).
+
+    Returns:
+        True if the cache is ready
+    """
+    if is_ready():
+        return True
+
+    with _file_lock(WARM_LOCK_FILE, exclusive=True):
+        if is_warm():
+            _ready.set()
+            return True
+
+        started = time.monotonic()
+        source = 'seed'
+        if not _copy_seed():
+            source = 'compile'
+            if packages is None:
+                packages = allowed_std_packages(go_scanner.FORBIDDEN_IMPORTS)
+            # Must match the compile flags in execute_go_code so cache keys line up
+            # (-p does not change them)
+            batches = [packages]
+            flags = ['-trimpath']
+            if background:
+                batches = [packages[i:i + WARM_UP_BATCH] for i in range(0, len(packages), WARM_UP_BATCH)]
+                flags.insert(0, '-p=1')
+            for batch in batches:
+                if background:
+                    _wait_for_idle_builds()
+                result = subprocess.run(
+                    ['go', 'build', *flags, *batch],
+                    capture_output=True, text=True, timeout=WARM_UP_TIMEOUT,
+                    cwd=GO_BUILD_CACHE_DIR, env=go_env()
+                )
+                if result.returncode != 0:
+                    print(f"[WARN] Warm-up del build cache falló: {result.stderr.strip()[:500]}")
+                    return False
+            if background:
+                _wait_for_idle_builds()
+            _warm_vet()
+            if GOCACHE_WARM_WASM:
+                if background:
+                    _wait_for_idle_builds()
+                _warm_wasm()
+
+        marker = {
+            'goVersion': go_version(),
+            'source': source,
+            'seconds': round(time.monotonic() - started, 2),
+            'warmedAt': int(time.time()),
+        }
+        (Path(GO_BUILD_CACHE_DIR) / READY_MARKER).write_text(json.dumps(marker))
+        _ready.set()
+
+    print(f"[INFO] Build cache listo en {marker['seconds']}s ({source})")
+    trim()
+    return True
+
+
+def _warm_vet() -> None:
+    """Run `go vet` once on a program importing the common packages (used by /check)"""
+    imports = ''.join(f'\t_ "{pkg}"\n' for pkg in VET_WARM_PACKAGES)
+    with tempfile.TemporaryDirectory() as workdir:
+        (Path(workdir) / 'main.go').write_text(f'package main\n\nimport (\n{imports})\n\nfunc main() {{}}\n')
+        result = subprocess.run(
+            ['go', 'vet', 'main.go'],
+            capture_output=True, text=True, timeout=WARM_UP_TIMEOUT,
+            cwd=workdir, env=go_env()
+        )
+    if result.returncode != 0:
+        print(f"[WARN] Warm-up de go vet falló: {result.stderr.strip()[:500]}")
+
+
+def _warm_wasm() -> None:
+    """Build the common packages (and the runtime) for GOOS=js GOARCH=wasm"""
+    imports = ''.join(f'\t_ "{pkg}"\n' for pkg in VET_WARM_PACKAGES)
+    with tempfile.TemporaryDirectory() as workdir:
+        (Path(workdir) / 'main.go').write_text(f'package main\n\nimport (\n{imports})\n\nfunc main() {{}}\n')
+        result = subprocess.run(
+            ['go', 'build', '-trimpath', '-o', 'main.wasm', 'main.go'],
+            capture_output=True, text=True, timeout=WARM_UP_TIMEOUT,
+            cwd=workdir, env=go_env({'GOOS': 'js', 'GOARCH': 'wasm'})
+        )
+    if result.returncode != 0:
+        print(f"[WARN] Warm-up de js/wasm falló: {result.stderr.strip()[:500]}")
+
+
+def start_background_warm_up() -> None:
+    """Warm the cache in a daemon thread so the first request is not blocked"""
+    global _warm_thread
+    if is_ready():
+        return
+    with _warm_thread_lock:
+        if _warm_thread is not None and _warm_thread.is_alive():
+            return
+
+        def _run() -> None:
+            try:
+                # Niceness is per thread on Linux and inherited by the go processes it starts
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WARM_UP_NICENESS)
+            except OSError:
+                pass
+            try:
+                warm_up(background=True)
+            except Exception as e:
+                print(f"[WARN] Warm-up del build cache falló: {str(e)}")
+
+        _warm_thread = threading.Thread(target=_run, name='go-build-cache-warm-up', daemon=True)
+        _warm_thread.start()
+
+
+def cache_size(cache_dir: str = GO_BUILD_CACHE_DIR) -> int:
+    """Total size in bytes of the cache directory"""
+    total = 0
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def trim(max_bytes: int = GO_BUILD_CACHE_MAX_BYTES, lock_timeout: float = TRIM_LOCK_TIMEOUT) -> int:
+    """
+    Enforce the size cap by deleting the least recently used entries
+    (Go refreshes mtimes of entries it uses).
+
+    The size is checked without locking. Over the cap, new builds are held
+    back while running ones finish (up to `lock_timeout` seconds, else the
+    trim is skipped). Go treats missing entries as cache misses, but builds
+    hold the shared lock so nothing is removed while one is reading.
+
+    Returns:
+        Number of bytes freed
+    """
+    if cache_size(GO_BUILD_CACHE_DIR) <= max_bytes:
+        return 0
+    with _file_lock(TRIM_INTENT_FILE, exclusive=True, timeout=lock_timeout) as intent:
+        if not intent:
+            # Another process is trimming
+            return 0
+        with _file_lock(TRIM_LOCK_FILE, exclusive=True, timeout=lock_timeout) as locked:
+            if not locked:
+                print(f"[WARN] Trim del build cache omitido: builds activos tras {lock_timeout:.0f}s")
+                return 0
+            return _trim_locked(max_bytes)
+
+
+def _trim_locked(max_bytes: int) -> int:
+    """Delete least recently used entries down to TRIM_TARGET_RATIO of the cap (trim lock held)"""
+    entries = []
+    total = 0
+    for root, _, files in os.walk(GO_BUILD_CACHE_DIR):
+        for name in files:
+            if name in _PROTECTED_FILES:
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+    if total <= max_bytes:
+        return 0
+
+    target = int(max_bytes * TRIM_TARGET_RATIO)
+    freed = 0
+    entries.sort()
+    for _, size, path in entries:
+        if total - freed <= target:
+            break
+        try:
+            os.remove(path)
+            freed += size
+        except OSError:
+            pass
+    return freed
+
+
+def maybe_trim() -> None:
+    """
+    Called after builds: at most every TRIM_CHECK_INTERVAL seconds, start a
+    background size check and trim (one at a time) off the request thread
+    """
+    global _last_trim_check, _trim_thread
+    with _trim_check_lock:
+        now = time.monotonic()
+        if now - _last_trim_check < TRIM_CHECK_INTERVAL:
+            return
+        if _trim_thread is not None and _trim_thread.is_alive():
+            return
+        _last_trim_check = now
+
+        def _run() -> None:
+            try:
+                trim()
+            except Exception as e:
+                print(f"[WARN] Trim del build cache falló: {str(e)}")
+
+        _trim_thread = threading.Thread(target=_run, name='go-build-cache-trim', daemon=True)
+        _trim_thread.start()
+
+
+def prepare() -> None:
+    """
+    Container init hook: copy the seed synchronously when present (fast),
+    otherwise warm up in the background.
+    """
+    if os.environ.get('GOCACHE_PREPARE', '1') != '1':
+        return
+    Path(GO_PATH_DIR).mkdir(parents=True, exist_ok=True)
+    if is_ready():
+        return
+    if is_warm(GO_BUILD_CACHE_SEED_DIR):
+        try:
+            warm_up()
+            return
+        except Exception as e:
+            print(f"[WARN] No se pudo copiar el build cache: {str(e)}")
+    start_background_warm_up()
+
+
+def status(include_size: bool = True) -> Dict[str, object]:
+    """Cache summary; walking the directory for its size is optional because it is slow"""
+    info = {
+        'ready': is_ready(),
+        'cacheDir': GO_BUILD_CACHE_DIR,
+        'maxBytes': GO_BUILD_CACHE_MAX_BYTES,
+        'marker': _read_marker(GO_BUILD_CACHE_DIR),
+    }
+    if include_size:
+        info['sizeBytes'] = cache_size()
+    return info
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    if command == 'warm':
+        sys.exit(0 if warm_up() else 1)
+    elif command == 'trim':
+        print(f"Liberados {trim()} bytes")
+    elif command == 'status':
+        print(json.dumps(status(), indent=2))
+    else:
+        print(f"Comando desconocido: {command}")
+        sys.exit(2)
@@ -0,0 +1,300 @@
+"""
+Pool of pre-generated, pre-validated challenges for /generate
+
+Challenges are generated in the background per (difficulty, language) and
+admitted only after their `solution` compiles and passes their own
+`testCases` on the execution engine (and `initialCode` compiles). /generate
+then pops one in milliseconds; when a key falls to its low-water mark a
+background refill tops it up again.
+
+The model is pluggable: anything with `generate(difficulty, language) -> dict`
+works, e.g. StubBackend for local testing without an API key.
+
+Note: runs under the python3.9 generator Lambda, keep it 3.9-compatible.
+"""
+
+import collections
+import copy
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import json_stream
+
+POOL_TARGET_SIZE = int(os.environ.get('CHALLENGE_POOL_SIZE', '3'))  # challenges kept per key
+POOL_LOW_WATER = int(os.environ.get('CHALLENGE_POOL_LOW_WATER', '1'))  # refill when size <= this
+POOL_MAX_FAILURES = int(os.environ.get('CHALLENGE_POOL_MAX_FAILURES', '3'))  # per refill, in a row
+# Keys filled at startup, e.g. "beginner:es,intermediate:es,beginner:en"
+POOL_WARM_KEYS = os.environ.get('CHALLENGE_POOL_KEYS', '')
+# Base URL of the execution API (…/execute/tests); empty = run in-process with app.py
+EXECUTOR_URL = os.environ.get('CHALLENGE_EXECUTOR_URL', '').rstrip('/')
+EXECUTOR_TIMEOUT = int(os.environ.get('CHALLENGE_EXECUTOR_TIMEOUT', '60'))  # seconds
+# The executor's PRIORITY_TOKEN: lets validation runs ask for the background class
+EXECUTOR_TOKEN = os.environ.get('CHALLENGE_EXECUTOR_TOKEN', '')
+# StubBackend.stream(): seconds between tokens and characters per token
+STUB_TOKEN_DELAY = float(os.environ.get('CHALLENGE_STUB_TOKEN_DELAY', '0'))
+STUB_TOKEN_CHARS = 16
+
+PoolKey = Tuple[str, str]
+# (code, test_cases) -> (status_code, body) with the /execute/tests response body
+TestRunner = Callable[[str, List[Dict[str, Any]]], Tuple[int, Dict[str, Any]]]
+
+
+class InvalidChallenge(ValueError):
+    """The generated challenge is malformed or its solution does not pass"""
+
+
+class StubBackend:
+    """
+    Model backend that serves canned challenges, for local testing.
+
+    CHALLENGE_STUB_FILE may point to a JSON list of challenges; otherwise a
+    built-in one is used. Challenges are served round-robin. An entry may also
+    be a list of strings: a canned token sequence, streamed as-is by stream().
+    """
+
+    def __init__(self, challenges: Optional[List[Any]] = None, delay: float = 0.0,
+                 token_delay: float = STUB_TOKEN_DELAY):
+        if challenges is None:
+            stub_file = os.environ.get('CHALLENGE_STUB_FILE')
+            if stub_file:
+                with open(stub_file) as f:
+                    challenges = json.load(f)
+            else:
+                challenges = [_BUILTIN_STUB_CHALLENGE]
+        self.challenges = challenges
+        self.delay = delay
+        self.token_delay = token_delay
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _take(self) -> Any:
+        with self._lock:
+            challenge = self.challenges[self._next % len(self.challenges)]
+            self._next += 1
+        return challenge
+
+    def generate(self, difficulty: str, language: str) -> Dict[str, Any]:
+        if self.delay:
+            time.sleep(self.delay)
+        challenge = self._take()
+        if isinstance(challenge, list):
+            return json_stream.loads(challenge)
+        return copy.deepcopy(challenge)
+
+    def stream(self, difficulty: str, language: str) -> Iterator[str]:
+        """Yield the challenge as fenced JSON in STUB_TOKEN_CHARS pieces, like a model would"""
+        if self.delay:
+            time.sleep(self.delay)
+        challenge = self._take()
+        if isinstance(challenge, list):
+            tokens = challenge
+        else:
+            text = '```json\n' + json.dumps(challenge, ensure_ascii=False, indent=2) + '\n```'
+            tokens = [text[i:i + STUB_TOKEN_CHARS] for i in range(0, len(text), STUB_TOKEN_CHARS)]
+        for token in tokens:
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield token
+
+
+_BUILTIN_STUB_CHALLENGE = {
+    'title': 'Suma de dígitos',
+    'description': 'Escribe la función Solution que recibe un número entero no negativo y devuelve la suma de sus dígitos.',
+    'initialCode': 'package main\n\nimport "fmt"\n\nfunc Solution(n int) int {\n\t// Tu código aquí\n\treturn 0\n}\n\nfunc main() {\n\tfmt.Println(Solution(123))\n}',
+    'solution': 'package main\n\nimport "fmt"\n\nfunc Solution(n int) int {\n\tsum := 0\n\tfor n > 0 {\n\t\tsum += n % 10\n\t\tn /= 10\n\t}\n\treturn sum\n}\n\nfunc main() {\n\tfmt.Println(Solution(123))\n}',
+    'testCases': [
+        {'input': 123, 'output': 6},
+        {'input': 0, 'output': 0},
+        {'input': 9999, 'output': 36},
+        {'input': 1001, 'output': 2},
+    ],
+}
+
+
+def http_test_runner(base_url: str, timeout: int = EXECUTOR_TIMEOUT) -> TestRunner:
+    """Grade code by calling POST {base_url}/execute/tests"""
+    # urllib.request alone costs tens of ms to import: load it with the first runner
+    import urllib.error
+    import urllib.request
+
+    headers = {'Content-Type': 'application/json'}
+    if EXECUTOR_TOKEN:
+        # Validation must not delay players' battle submissions
+        headers.update({'X-Priority': 'background', 'X-Service-Token': EXECUTOR_TOKEN})
+
+    def run(code: str, test_cases: List[Dict[str, Any]]) -> Tuple[int, Dict[str, Any]]:
+        request = urllib.request.Request(
+            f"{base_url}/execute/tests",
+            data=json.dumps({'code': code, 'testCases': test_cases}).encode('utf-8'),
+            headers=headers,
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return response.status, json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read().decode('utf-8') or '{}')
+    return run
+
+
+def local_test_runner() -> TestRunner:
+    """Grade code in this process with app.execute_test_cases (needs Go installed)"""
+    def run(code: str, test_cases: List[Dict[str, Any]]) -> Tuple[int, Dict[str, Any]]:
+        import app
+        is_valid, error = app.validate_code(code, require_main=False)
+        if not is_valid:
+            return 400, {'success': False, 'error': error}
+        return app.execute_test_cases(code, test_cases)
+    return run
+
+
+def default_test_runner() -> TestRunner:
+    return http_test_runner(EXECUTOR_URL) if EXECUTOR_URL else local_test_runner()
+
+
+def check_solution_name(code: str, field: str) -> None:
+    """
+    The function to implement must be named exactly "Solution"
+
+    Raises:
+        InvalidChallenge
+    """
+    if 'func Solution' not in code:
+        raise InvalidChallenge(f"La función en '{field}' debe llamarse \"Solution\"")
+
+
+def check_structure(challenge: Any) -> None:
+    """
+    Cheap checks before anything is compiled
+
+    Raises:
+        InvalidChallenge
+    """
+    if not isinstance(challenge, dict):
+        raise InvalidChallenge('El desafío no es un objeto JSON')
+    for field in ('title', 'description', 'initialCode', 'solution'):
+        if not isinstance(challenge.get(field), str) or not challenge[field].strip():
+            raise InvalidChallenge(f"Falta el campo '{field}'")
+    for field in ('initialCode', 'solution'):
+        check_solution_name(challenge[field], field)
+    test_cases = challenge.get('testCases')
+    if not isinstance(test_cases, list) or not test_cases:
+        raise InvalidChallenge("'testCases' debe ser una lista no vacía")
+
+
+def validate_challenge(challenge: Any, run_tests: TestRunner) -> None:
+    """
+    Admit a challenge only if its solution passes every test case and its
+    initialCode compiles (its stub answers are expected to fail)
+
+    Raises:
+        InvalidChallenge
+    """
+    check_structure(challenge)
+    test_cases = challenge['testCases']
+
+    status, body = run_tests(challenge['solution'], test_cases)
+    if status != 200 or not body.get('success'):
+        raise InvalidChallenge(f"La solución no compila: {body.get('error') or body.get('stderr', '')}"[:500])
+    if not body.get('allPassed'):
+        failed = [r['index'] for r in body.get('results', []) if not r.get('passed')]
+        raise InvalidChallenge(f"La solución falla los test cases {failed}")
+
+    status, body = run_tests(challenge['initialCode'], test_cases)
+    if status != 200 or not body.get('success'):
+        raise InvalidChallenge(f"El initialCode no compila: {body.get('error') or body.get('stderr', '')}"[:500])
+
+
+class ChallengePool:
+    """Validated challenges per (difficulty, language), refilled in the background"""
+
+    def __init__(self, backend: Any, run_tests: Optional[TestRunner] = None,
+                 target_size: int = POOL_TARGET_SIZE, low_water: int = POOL_LOW_WATER,
+                 max_failures: int = POOL_MAX_FAILURES):
+        self.backend = backend
+        self.run_tests = run_tests or default_test_runner()
+        self.target_size = max(1, target_size)
+        self.low_water = min(max(0, low_water), self.target_size - 1)
+        self.max_failures = max(1, max_failures)
+        self._pools: Dict[PoolKey, Deque[Dict[str, Any]]] = collections.defaultdict(collections.deque)
+        self._refilling: Dict[PoolKey, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = collections.Counter()
+
+    def take(self, difficulty: str, language: str) -> Optional[Dict[str, Any]]:
+        """
+        Pop a validated challenge (or None if the pool is empty); a refill is
+        scheduled when the key is at or below its low-water mark
+        """
+        key = (difficulty, language)
+        with self._lock:
+            pool = self._pools[key]
+            challenge = pool.popleft() if pool else None
+            remaining = len(pool)
+            self.counters['hit' if challenge is not None else 'miss'] += 1
+        if remaining <= self.low_water:
+            self.refill(difficulty, language)
+        return challenge
+
+    def refill(self, difficulty: str, language: str) -> None:
+        """Top the key up to its target size in a background thread (one per key)"""
+        key = (difficulty, language)
+        with self._lock:
+            thread = self._refilling.get(key)
+            if thread is not None and thread.is_alive():
+                return
+            thread = threading.Thread(
+                target=self._refill, args=(key,), name=f'challenge-pool-{difficulty}-{language}', daemon=True
+            )
+            self._refilling[key] = thread
+        thread.start()
+
+    def _refill(self, key: PoolKey) -> None:
+        failures = 0
+        while failures < self.max_failures:
+            with self._lock:
+                if len(self._pools[key]) >= self.target_size:
+                    return
+            started = time.monotonic()
+            try:
+                challenge = self.backend.generate(*key)
+                validate_challenge(challenge, self.run_tests)
+            except Exception as e:
+                failures += 1
+                self.counters['rejected'] += 1
+                print(f"[WARN] Desafío descartado para {key}: {str(e)[:300]}")
+                continue
+            failures = 0
+            with self._lock:
+                self._pools[key].append(challenge)
+                self.counters['admitted'] += 1
+            print(f"[INFO] Desafío admitido para {key} en {time.monotonic() - started:.1f}s")
+
+    def warm(self, keys: str = POOL_WARM_KEYS) -> None:
+        """Start filling keys given as "difficulty:language,..." """
+        for item in filter(None, (k.strip() for k in keys.split(','))):
+            difficulty, _, language = item.partition(':')
+            self.refill(difficulty, language or 'es')
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait for running refills to finish (tests, warm-up scripts)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            threads = list(self._refilling.values())
+        for thread in threads:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            thread.join(remaining)
+        return not any(t.is_alive() for t in threads)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'sizes': {f"{d}:{l}": len(p) for (d, l), p in self._pools.items()},
+                'refilling': sorted(f"{d}:{l}" for (d, l), t in self._refilling.items() if t.is_alive()),
+                'targetSize': self.target_size,
+                'lowWater': self.low_water,
+                **self.counters,
+            }
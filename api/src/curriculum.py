@@ -0,0 +1,312 @@
+"""
+Precomputed /execute results for the curriculum's code samples
+
+The examples, starters and solutions in the topic data have fixed source,
+yet every Run click on one compiles and runs it again. This tool runs all of
+them once, in parallel, through run_and_validate (execute_go_code and
+validate_output, as /execute does). It writes the results to an index keyed
+by result_cache.cache_key, which the API loads at startup
+(result_cache.PRECOMPUTED) to answer matching submissions without compiling.
+
+It is incremental: a sample runs again only when its key changes (its code,
+its expected output, CACHE_VERSION or the Go version) or when its last run
+ended in an outcome that depends on the machine (timeout, internal error).
+
+The summary lists broken samples: a solution that does not produce its
+expectedOutput, or an example or solution that validate_code rejects, that
+does not compile, crashes or times out. Starters are often unfinished on
+purpose, so they only count as broken when they can never run (rejected,
+timeout). The exit status is 1 if there is any broken sample.
+
+Sources are the topic modules in src/data (read through node) and JSON
+exports of the Firestore `topics` collection (see scripts/migrateTopics.js).
+Build the index with the Go version of the image, since the keys include it.
+
+CLI:
+    cd api/src
+    python3 curriculum.py [--topics FILE ...] [--workers N] [--index PATH] [--rebuild] [--json]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Importing app must not start a background warm-up: main() warms synchronously
+os.environ.setdefault('GOCACHE_PREPARE', '0')
+
+import app  # noqa: E402
+import build_cache  # noqa: E402
+import result_cache  # noqa: E402
+
+INDEX_FORMAT = 1
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_SOURCES = sorted(str(p) for p in (REPO_ROOT / 'src' / 'data').glob('topics.js*'))
+DEFAULT_INDEX = result_cache.CURRICULUM_INDEX or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'curriculum_index.json.gz'
+)
+
+# Outcomes that depend on the machine rather than the code: never reused
+RERUN_OUTCOMES = {'timeout', 'internal_error', 'cancelled'}
+# Outcomes that make a sample broken (a solution is also broken on wrong_output)
+BROKEN_OUTCOMES = {
+    'validation_reject', 'compile_error', 'binary_too_large', 'runtime_error',
+    'output_limit', 'timeout', 'internal_error',
+}
+# Starters may be incomplete on purpose (unused imports, stubs): broken only if they can never run here
+BROKEN_STARTER_OUTCOMES = {'validation_reject', 'timeout', 'internal_error'}
+
+# Prints the `topics` export of a JS module as JSON
+_NODE_EXPORT = (
+    'const m = await import(process.argv[1]);'
+    'process.stdout.write(JSON.stringify(m.topics ?? m.default ?? []));'
+)
+
+
+def load_topics(path: str) -> List[Dict[str, Any]]:
+    """Topics of a JSON export (a list, {"topics": [...]} or {id: topic}) or of a JS module"""
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    else:
+        node = shutil.which('node')
+        if node is None:
+            raise RuntimeError(f"{path}: se necesita node para leer módulos JS (o exporta los temas a JSON)")
+        with tempfile.TemporaryDirectory() as tmp:
+            # import() goes by extension: topics.js.backup has to be read as a module
+            module = Path(tmp) / 'topics.mjs'
+            shutil.copyfile(path, module)
+            result = subprocess.run(
+                [node, '--input-type=module', '-e', _NODE_EXPORT, module.as_uri()],
+                capture_output=True, text=True, timeout=60
+            )
+        if result.returncode != 0:
+            raise RuntimeError(f"{path}: {result.stderr.strip()[:500]}")
+        data = json.loads(result.stdout)
+    if isinstance(data, dict):
+        data = data.get('topics', list(data.values()))
+    return [topic for topic in data if isinstance(topic, dict)]
+
+
+def topic_samples(topic: Dict[str, Any]) -> Tuple[List[Dict[str, str]], int]:
+    """
+    Runnable samples of a topic: its example, its use case, and the exercise's
+    starter (as CodePlayground sends it) and solution, with the expected output
+
+    Returns:
+        Tuple of (samples, snippets skipped because they are not whole programs)
+    """
+    samples = []
+    skipped = 0
+    exercise = topic.get('exercise') or {}
+    expected_output = exercise.get('expectedOutput') or ''
+    starter = exercise.get('initialCode')
+    if isinstance(starter, str):
+        # CodePlayground turns literal \n sequences into newlines before running it
+        starter = starter.replace('\\n', '\n')
+    candidates = [
+        ('code', topic.get('code'), ''),
+        ('useCase', (topic.get('useCase') or {}).get('code'), ''),
+        ('initialCode', starter, expected_output),
+        ('solution', exercise.get('solution'), expected_output),
+    ]
+    for kind, code, expected in candidates:
+        if not isinstance(code, str) or not code.strip():
+            continue
+        if not app.CHECK_PACKAGE_RE.search(code) or 'func main()' not in code:
+            skipped += 1
+            continue
+        samples.append({
+            'id': f"{topic.get('id', '?')}/{kind}",
+            'kind': kind,
+            'code': code,
+            'expectedOutput': expected,
+            'key': result_cache.cache_key(code, expected),
+        })
+    return samples, skipped
+
+
+def run_sample(code: str, expected_output: str) -> Dict[str, Any]:
+    """One /execute run: the cacheable result plus what the summary needs"""
+    started = time.monotonic()
+    is_valid, error = app.validate_code(code)
+    if not is_valid:
+        return {'outcome': 'validation_reject', 'detail': error, 'ms': 0.0}
+
+    stats: Dict[str, Any] = {}
+    status, body, cacheable = app.run_and_validate(code, expected_output, stats=stats)
+    outcome = stats.get('outcome', 'unknown')
+    run = {
+        'outcome': outcome,
+        'ms': round((time.monotonic() - started) * 1000, 1),
+        # Usage describes this run only, as in the result cache
+        'result': {'statusCode': status, 'body': {k: v for k, v in body.items() if k != 'usage'}, 'outcome': outcome},
+        'cacheable': cacheable,
+    }
+    if outcome in BROKEN_OUTCOMES or outcome == 'wrong_output':
+        # First line that says something (not the `# command-line-arguments` header)
+        lines = [line for line in (body.get('stderr') or body.get('message') or '').splitlines()
+                 if line.strip() and not line.startswith('#')]
+        run['detail'] = lines[0].strip()[:200] if lines else ''
+        if not run['detail'] and stats.get('exitCode'):
+            run['detail'] = f"exit status {stats['exitCode']}"
+    return run
+
+
+def broken_reason(kind: str, outcome: str, detail: str) -> Optional[str]:
+    if outcome in (BROKEN_STARTER_OUTCOMES if kind == 'initialCode' else BROKEN_OUTCOMES):
+        return f"{outcome}: {detail}" if detail else outcome
+    if kind == 'solution' and outcome == 'wrong_output':
+        return f"wrong_output: {detail}" if detail else outcome
+    return None
+
+
+def load_index(path: str) -> Dict[str, Any]:
+    """Previous index, or an empty one if it is missing or from another format"""
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if index.get('formatVersion') != INDEX_FORMAT or index.get('cacheVersion') != result_cache.CACHE_VERSION:
+        return {}
+    return index
+
+
+def write_index(path: str, index: Dict[str, Any]) -> int:
+    """Atomically write the gzip'd index (mtime 0: same input, same bytes)"""
+    data = json.dumps(index, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return os.path.getsize(path)
+
+
+def build(sources: List[str], index_path: str, workers: int, rebuild: bool = False) -> Dict[str, Any]:
+    """
+    Run every sample whose key is not in the previous index and write the new one
+
+    Returns:
+        Summary: counts, timings and broken samples
+    """
+    samples: List[Dict[str, str]] = []
+    topics = skipped = 0
+    for source in sources:
+        for topic in load_topics(source):
+            topics += 1
+            found, not_programs = topic_samples(topic)
+            samples.extend(found)
+            skipped += not_programs
+
+    previous = {} if rebuild else load_index(index_path)
+    known = {s['key']: s for s in previous.get('samples', []) if s['outcome'] not in RERUN_OUTCOMES}
+    previous_results = previous.get('results', {})
+
+    # One run per distinct key: several samples can share their source
+    pending = {s['key']: s for s in samples if s['key'] not in known}
+    started = time.monotonic()
+    if pending and not build_cache.warm_up():
+        raise RuntimeError('El build cache de Go no se pudo preparar')
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        runs = dict(zip(pending, pool.map(
+            lambda s: run_sample(s['code'], s['expectedOutput']), pending.values()
+        )))
+    elapsed = time.monotonic() - started
+
+    records = []
+    results = {}
+    broken = []
+    for sample in samples:
+        key = sample['key']
+        deterministic, _ = result_cache.is_deterministic(sample['code'])
+        if key in runs:
+            run = runs[key]
+            outcome, detail = run['outcome'], run.get('detail', '')
+            if deterministic and run.get('cacheable'):
+                results[key] = run['result']
+        else:
+            outcome, detail = known[key]['outcome'], known[key].get('detail', '')
+            if key in previous_results:
+                results[key] = previous_results[key]
+        record = {'id': sample['id'], 'kind': sample['kind'], 'key': key, 'outcome': outcome}
+        if detail:
+            record['detail'] = detail
+        reason = broken_reason(sample['kind'], outcome, detail)
+        if reason:
+            broken.append({'id': sample['id'], 'reason': reason})
+        records.append(record)
+
+    index = {
+        'formatVersion': INDEX_FORMAT,
+        'cacheVersion': result_cache.CACHE_VERSION,
+        'goVersion': build_cache.go_version(),
+        'samples': records,
+        'results': results,
+    }
+    size = write_index(index_path, index)
+    return {
+        'index': index_path,
+        'indexBytes': size,
+        'goVersion': index['goVersion'],
+        'topics': topics,
+        'samples': len(samples),
+        'skippedSnippets': skipped,
+        'executed': len(runs),
+        'reused': len(samples) - sum(1 for s in samples if s['key'] in runs),
+        'indexed': len(results),
+        'seconds': round(elapsed, 2),
+        'workers': workers,
+        'slowest': sorted(
+            ({'key': k, 'ms': r['ms']} for k, r in runs.items()), key=lambda r: r['ms'], reverse=True
+        )[:5],
+        'broken': broken,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--topics', action='append', help='topic module (.js) or JSON export; repeatable '
+                        '(default: src/data/topics.js*)')
+    parser.add_argument('--index', default=DEFAULT_INDEX)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--rebuild', action='store_true', help='ignore the previous index')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    sources = args.topics or DEFAULT_SOURCES
+    if not sources:
+        print('No hay temas: pasa --topics con un módulo JS o un export JSON')
+        return 2
+    summary = build(sources, args.index, max(1, args.workers), args.rebuild)
+
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    else:
+        print(f"{summary['topics']} temas, {summary['samples']} programas "
+              f"({summary['skippedSnippets']} fragmentos sin main omitidos)")
+        print(f"Ejecutados {summary['executed']} en {summary['seconds']} s con {summary['workers']} workers, "
+              f"{summary['reused']} reutilizados del índice anterior")
+        print(f"Índice: {summary['index']} ({summary['indexed']} resultados, "
+              f"{summary['indexBytes'] / 1024:.1f} KB, {summary['goVersion']})")
+        print(f"Muestras rotas: {len(summary['broken'])}")
+        for item in summary['broken']:
+            print(f"  {item['id']:<40} {item['reason']}")
+    return 1 if summary['broken'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+Flight recorder: slow or failed executions kept on disk for replay
+
+A request slower than FLIGHT_SLOW_MS, or ending in an outcome that depends
+on the engine rather than the code (timeout, internal error, limits), is
+written as one JSON record. Records go into a fixed set of slot files:
+record N overwrites slot N % FLIGHT_RECORDER_SLOTS. This makes the
+directory a ring buffer that never grows.
+
+A record holds:
+- the code hash and the code with string literals masked and comments
+  dropped (FLIGHT_RECORD_CODE: `none` keeps only the hash, `full` keeps
+  the code as submitted)
+- the request fields needed to replay it
+- phase timings, outcome, exit status and resource usage
+- for a sampled fraction of builds (FLIGHT_TRACE_SAMPLE), the
+  `go build -x` trace: every step the go tool ran, with its start time
+
+Each record is also printed as one log line without the code. On Lambda,
+/tmp does not outlive the container, but CloudWatch keeps the log.
+bench/replay.py re-runs records against the current engine.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import go_scanner
+
+# Empty string disables the recorder
+FLIGHT_RECORDER_DIR = os.environ.get('FLIGHT_RECORDER_DIR', os.path.join(tempfile.gettempdir(), 'go-guru-flights'))
+FLIGHT_RECORDER_SLOTS = int(os.environ.get('FLIGHT_RECORDER_SLOTS', '256'))
+FLIGHT_SLOW_MS = float(os.environ.get('FLIGHT_SLOW_MS', '2000'))
+# redact | none | full. Submissions may hold personal data, so keeping them
+# verbatim is opt-in; an unknown value means redact
+FLIGHT_RECORD_CODE = os.environ.get('FLIGHT_RECORD_CODE', 'redact')
+# Fraction of `go build` runs traced with -x
+FLIGHT_TRACE_SAMPLE = float(os.environ.get('FLIGHT_TRACE_SAMPLE', '0.05'))
+
+# Outcomes recorded however fast they were
+FAILED_OUTCOMES = {'timeout', 'internal_error', 'output_limit', 'binary_too_large'}
+
+# Request fields kept for replay (code is handled separately)
+REPLAY_FIELDS = ('expectedOutput', 'compareMode', 'tolerance', 'testCases')
+
+MAX_TRACE_STEPS = 200
+
+# Lines printed by `go build -x` (as opposed to compiler output)
+# (steps may start with environment assignments: GOROOT='/usr/local/go' .../link ...)
+_TRACE_LINE_RE = re.compile(
+    r"^(?:WORK=|(?:[A-Z][A-Z0-9_]*=(?:'[^']*'|\S*) )*"
+    r'(?:mkdir |cat >|cd |cp |mv |rm |echo |touch |ln |\$WORK/'
+    r'|\S*/pkg/tool/\S+ |\S+/(?:compile|link|asm|buildid|pack|cgo|vet) ))'
+)
+_HEREDOC_RE = re.compile(r"<< '(\w+)'(?: #.*)?$")
+
+
+def should_trace() -> bool:
+    """Whether this build should run with -x (sampled)"""
+    return bool(FLIGHT_RECORDER_DIR) and random.random() < FLIGHT_TRACE_SAMPLE
+
+
+class BuildTrace:
+    """
+    Stderr of `go build -x`, split into timestamped steps and compiler output
+
+    feed() is process_runner's on_stderr callback: each step gets the time
+    its line arrived. The go tool prints a step just before running it, so
+    the gap to the next step is roughly how long it took.
+    """
+
+    def __init__(self):
+        self.started: Optional[float] = None  # set by begin(), when the build starts
+        self._pending = ''
+        self._heredoc: Optional[str] = None
+        self._steps: List[List[Any]] = []  # [offset_seconds, command]
+        self._output: List[str] = []
+
+    def begin(self) -> None:
+        self.started = time.monotonic()
+
+    def feed(self, chunk: bytes) -> None:
+        if self.started is None:
+            self.begin()
+        now = time.monotonic() - self.started
+        *lines, self._pending = (self._pending + chunk.decode('utf-8', errors='replace')).split('\n')
+        for line in lines:
+            self._add(line, now)
+
+    def _add(self, line: str, offset: float) -> None:
+        if self._heredoc is not None:
+            # File contents written by the go tool (importcfg...), not steps
+            if line == self._heredoc:
+                self._heredoc = None
+            return
+        if _TRACE_LINE_RE.match(line):
+            heredoc = _HEREDOC_RE.search(line)
+            if heredoc:
+                self._heredoc = heredoc.group(1)
+            if len(self._steps) < MAX_TRACE_STEPS:
+                self._steps.append([offset, line])
+        else:
+            self._output.append(line)
+
+    def output(self) -> str:
+        """Stderr without the -x lines: what the build prints without tracing"""
+        lines = self._output + ([self._pending] if self._pending else [])
+        return '\n'.join(lines) + ('\n' if lines and not self._pending else '')
+
+    def steps(self) -> List[Dict[str, Any]]:
+        total = time.monotonic() - self.started if self.started is not None else 0.0
+        steps = []
+        for i, (offset, command) in enumerate(self._steps):
+            end = self._steps[i + 1][0] if i + 1 < len(self._steps) else total
+            steps.append({
+                'atMs': round(offset * 1000, 1),
+                'durationMs': round((end - offset) * 1000, 1),
+                'command': command[:500],
+            })
+        return steps
+
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+class FlightRecorder:
+    """Ring buffer of slow or failed requests, one JSON file per slot"""
+
+    def __init__(self, directory: str = FLIGHT_RECORDER_DIR, slots: int = FLIGHT_RECORDER_SLOTS,
+                 slow_ms: float = FLIGHT_SLOW_MS, record_code: str = FLIGHT_RECORD_CODE,
+                 log: bool = True):
+        self.directory = directory
+        self.slots = max(0, slots)
+        self.slow_seconds = slow_ms / 1000
+        self.record_code = record_code
+        self.log = log
+        self.recorded = 0
+        self._seq: Optional[int] = None  # next sequence number, found on first write
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory) and self.slots > 0
+
+    def should_record(self, outcome: str, total: float, status_code: int = 200) -> bool:
+        return self.enabled and (total >= self.slow_seconds or outcome in FAILED_OUTCOMES or status_code >= 500)
+
+    def maybe_record(self, route: str, body: Dict[str, Any], outcome: str, phases: Dict[str, float],
+                     total: float, stats: Optional[Dict[str, Any]] = None,
+                     status_code: int = 200) -> Optional[Dict[str, Any]]:
+        """Record the request if it was slow or failed; never raises"""
+        if not self.should_record(outcome, total, status_code):
+            return None
+        try:
+            return self._write(self._build(route, body, outcome, phases, total, stats or {}, status_code))
+        except Exception as e:  # recording must never fail the request
+            print(f"[flight] no se pudo guardar el registro: {e}")
+            return None
+
+    def _build(self, route: str, body: Dict[str, Any], outcome: str, phases: Dict[str, float],
+               total: float, stats: Dict[str, Any], status_code: int) -> Dict[str, Any]:
+        code = body.get('code') if isinstance(body.get('code'), str) else ''
+        if self.record_code == 'none':
+            recorded_code = None
+        elif self.record_code == 'full':
+            recorded_code = code
+        else:
+            recorded_code = go_scanner.redact(code)
+        return {
+            'time': time.time(),
+            'route': route,
+            'outcome': outcome,
+            'statusCode': status_code,
+            'codeHash': code_hash(code),
+            'codeBytes': len(code),
+            'request': {
+                'code': recorded_code,
+                'codeRedacted': self.record_code != 'full',
+                **{field: body[field] for field in REPLAY_FIELDS if field in body},
+            },
+            'totalMs': round(total * 1000, 3),
+            'timings': {phase: round(seconds * 1000, 3) for phase, seconds in phases.items()},
+            'exitCode': stats.get('exitCode'),
+            'binaryCache': stats.get('binaryCache'),
+            'usage': {name: stats.get(name) for name in ('compile', 'run', 'vet') if stats.get(name)},
+            'buildTrace': stats.get('buildTrace'),
+        }
+
+    def _slot_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f'slot-{seq % self.slots:05d}.json')
+
+    def _next_seq(self) -> int:
+        """Continue after the newest record left by an earlier process"""
+        newest = -1
+        for record in self.entries():
+            newest = max(newest, record.get('seq', -1))
+        return newest + 1
+
+    def _write(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if self._seq is None:
+                self._seq = self._next_seq()
+            record['seq'] = self._seq
+            self._seq += 1
+            path = self._slot_path(record['seq'])
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(record, f)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self.recorded += 1
+
+        if self.log:
+            summary = {k: record[k] for k in ('seq', 'route', 'outcome', 'statusCode', 'codeHash', 'totalMs', 'timings')}
+            print(json.dumps({'flight': summary}))
+        return record
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Records on disk, oldest first"""
+        records = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return records
+        for name in names:
+            if not (name.startswith('slot-') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    records.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        records.sort(key=lambda r: r.get('seq', -1))
+        return records
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'directory': self.directory,
+            'slots': self.slots,
+            'slowMs': self.slow_seconds * 1000,
+            'recorded': self.recorded,
+        }
+
+
+RECORDER = FlightRecorder()
@@ -1,46 +1,43 @@
 import json
 import os
-from agno.agent import Agent
-from agno.models.groq import Groq
+import threading
+import time
 
-def handler(event, context):
-    """
-    Lambda handler to generate a Go challenge using Groq API via Agno
-    """
-    api_key = os.environ.get('GROQ_API_KEY')
-    
-    if not api_key:
-        print("[ERROR] GROQ_API_KEY is NOT SET!")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': 'GROQ_API_KEY no configurada'})
-        }
-    
-    print(f"[DEBUG] Using GROQ_API_KEY: {api_key[:10]}...{api_key[-4:]}")
-    
-    # Set the API key for Groq
-    os.environ['GROQ_API_KEY'] = api_key
-    
-    # Parse request body
-    try:
-        body = json.loads(event.get('body', '{}'))
-    except json.JSONDecodeError:
-        body = {}
-    
-    difficulty = body.get('difficulty', 'beginner')
-    language = body.get('language', 'es')  # 'es' or 'en'
-    
-    # Create agent
-    agent = Agent(
-        model=Groq("llama-3.3-70b-versatile"),
-        description="You are an expert in Go (Golang) programming and education.",
-        markdown=False
-    )
-    
+import challenge_pool
+import json_stream
+
+# agno/groq are imported on the first live generation, not at cold start:
+# most requests are served from the pool and never need them.
+
+MODEL_ID = 'llama-3.3-70b-versatile'
+# "groq" (default) or "stub" (canned challenges, no API key needed)
+CHALLENGE_BACKEND = os.environ.get('CHALLENGE_BACKEND', 'groq')
+# Under Lambda, CHALLENGE_POOL_KEYS are only filled by the scheduled warm-up
+# event (template.yaml); elsewhere after the first request
+IS_LAMBDA = bool(os.environ.get('AWS_LAMBDA_FUNCTION_NAME'))
+# Seconds kept free before the Lambda timeout while a warm-up waits for refills
+WARMUP_MARGIN = 2.0
+
+# Streamed events in order, each sent once all its fields are complete;
+# the full challenge follows only after check_structure()
+STREAM_STAGES = (
+    ('meta', ('title', 'description')),
+    ('initialCode', ('initialCode',)),
+    ('testCases', ('testCases',)),
+)
+
+RESPONSE_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+
+
+def _response(status_code, body):
+    return {'statusCode': status_code, 'headers': RESPONSE_HEADERS, 'body': json.dumps(body)}
+
+
+def build_prompt(difficulty, language):
+    """Prompt asking the model for one challenge as JSON"""
     # Determine language-specific instructions
     if language == 'en':
         lang_instruction = "Generate the challenge in English. All text (title, description, comments) must be in English."
@@ -48,9 +45,8 @@ def handler(event, context):
     else:  # Spanish by default
         lang_instruction = "Genera el desafío en Español. Todo el texto (título, descripción, comentarios) debe estar en Español."
         example_comment = "// Tu código aquí"
-    
-    # Prompt for challenge generation
-    prompt = f"""Generate a programming challenge in Go (Golang) for {difficulty} level.
+
+    return f"""Generate a programming challenge in Go (Golang) for {difficulty} level.
 The challenge should be an interesting algorithmic problem solvable in 5-10 minutes.
 
 {lang_instruction}
@@ -86,78 +82,257 @@ FINAL REMINDER:
 - Adapt return type and parameters based on the problem
 - Generate at least 3-4 varied test cases"""
 
-    try:
+
+def parse_challenge(content):
+    """Model output -> challenge dict (tolerates a ```json fence)"""
+    # Clean up potential markdown formatting
+    if content.startswith('```'):
+        content = content.split('```')[1]
+        if content.startswith('json'):
+            content = content[4:]
+
+    return json.loads(content.strip())
+
+
+class GroqBackend:
+    """
+    Challenge generation with Groq through an agno Agent
+
+    The Groq model (and the HTTP client with keep-alive connections it
+    creates on first use) lives as long as the container, one per thread:
+    warm invocations and pool refills reuse it instead of reconnecting.
+    """
+
+    def __init__(self, model_id=MODEL_ID):
+        self.model_id = model_id
+        self._local = threading.local()
+
+    def _model(self):
+        model = getattr(self._local, 'model', None)
+        if model is None:
+            from agno.models.groq import Groq
+            model = self._local.model = Groq(self.model_id)
+        return model
+
+    def _agent(self):
+        from agno.agent import Agent
+
+        # A fresh Agent per call keeps no run history; the model/client is shared
+        return Agent(
+            model=self._model(),
+            description="You are an expert in Go (Golang) programming and education.",
+            markdown=False
+        )
+
+    def generate(self, difficulty, language):
         # Get response from agent
-        response = agent.run(prompt)
-        
+        response = self._agent().run(build_prompt(difficulty, language))
+
         # Extract content from response
         content = response.content if hasattr(response, 'content') else str(response)
-        
+
         print(f"[DEBUG] Raw response: {content[:200]}...")
-        
-        # Clean up potential markdown formatting
-        if content.startswith('```'):
-            content = content.split('```')[1]
-            if content.startswith('json'):
-                content = content[4:]
-        
-        content = content.strip()
-        
-        # Parse JSON
-        challenge = json.loads(content)
-        
-        # VALIDATION: Check if initialCode and solution use "Solution" function
-        initial_code = challenge.get('initialCode', '')
-        solution_code = challenge.get('solution', '')
-        
-        if 'func Solution' not in initial_code:
-            print("[ERROR] AI did not use 'Solution' as function name in initialCode")
-            return {
-                'statusCode': 500,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'error': 'AI generation error: Function must be named "Solution"',
-                    'details': 'The AI generated code with incorrect function name. Please try again.'
-                })
-            }
-        
-        if 'func Solution' not in solution_code:
-            print("[ERROR] AI did not use 'Solution' as function name in solution")
-            return {
-                'statusCode': 500,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'error': 'AI generation error: Function must be named "Solution"',
-                    'details': 'The AI generated code with incorrect function name. Please try again.'
-                })
-            }
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps(challenge)
-        }
-        
-    except json.JSONDecodeError as e:
+
+        return parse_challenge(content)
+
+    def stream(self, difficulty, language):
+        """Yield the model's text as it arrives"""
+        for event in self._agent().run(build_prompt(difficulty, language), stream=True):
+            content = getattr(event, 'content', None)
+            if isinstance(content, str) and content:
+                yield content
+
+
+def make_backend(name=CHALLENGE_BACKEND):
+    if name == 'stub':
+        return challenge_pool.StubBackend()
+    return GroqBackend()
+
+
+# Validated challenges ready to serve; refills run in background threads
+BACKEND = make_backend()
+POOL = challenge_pool.ChallengePool(BACKEND)
+# Never warmed at import: a cold container must not start generating (and
+# paying for model calls) before it has served anything
+_pool_warm_started = False
+_pool_warm_lock = threading.Lock()
+
+
+def _warm_pool_once():
+    """Start filling CHALLENGE_POOL_KEYS, once per process"""
+    global _pool_warm_started
+    with _pool_warm_lock:
+        if _pool_warm_started:
+            return
+        _pool_warm_started = True
+    POOL.warm()
+
+
+def _after_request():
+    if not IS_LAMBDA:
+        _warm_pool_once()
+
+
+def warm_up(context):
+    """
+    Scheduled warm-up event ({"warmUp": true}): fill CHALLENGE_POOL_KEYS within
+    this invocation, up to WARMUP_MARGIN seconds before the Lambda timeout;
+    refills still running continue on the container's next invocation
+    """
+    timeout = None
+    if context is not None:
+        timeout = max(0.0, context.get_remaining_time_in_millis() / 1000 - WARMUP_MARGIN)
+    POOL.warm()
+    POOL.wait_idle(timeout)
+    return _response(200, POOL.stats())
+
+
+def _api_key_error():
+    """Error message when the Groq backend has no API key, else None"""
+    if not isinstance(BACKEND, GroqBackend):
+        return None
+    api_key = os.environ.get('GROQ_API_KEY')
+
+    if not api_key:
+        print("[ERROR] GROQ_API_KEY is NOT SET!")
+        return 'GROQ_API_KEY no configurada'
+
+    print(f"[DEBUG] Using GROQ_API_KEY: {api_key[:10]}...{api_key[-4:]}")
+    return None
+
+
+def _parse_request(event):
+    """
+    Returns:
+        Tuple of (difficulty, language)
+    """
+    # Parse request body
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except json.JSONDecodeError:
+        body = {}
+
+    return body.get('difficulty', 'beginner'), body.get('language', 'es')  # 'es' or 'en'
+
+
+def _generation_error(e):
+    """Error body for a failed live generation"""
+    if isinstance(e, json.JSONDecodeError):
         print(f"[ERROR] JSON Parse Error: {str(e)}")
+        return {'error': f'Invalid JSON from AI: {str(e)}'}
+    if isinstance(e, challenge_pool.InvalidChallenge):
+        print(f"[ERROR] Invalid challenge: {str(e)}")
         return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': f'Invalid JSON from AI: {str(e)}'})
+            'error': 'AI generation error: Invalid challenge',
+            'details': f'{str(e)}. Please try again.'
         }
+    print(f"[ERROR] Exception: {str(e)}")
+    return {'error': str(e)}
+
+
+def handler(event, context):
+    """
+    Lambda handler to generate a Go challenge using Groq API via Agno
+
+    Challenges come from the pre-validated pool when one is ready
+    ("source": "pool"); otherwise one is generated live ("source": "live")
+    and the pool is refilled in the background for the next room. The
+    scheduled {"warmUp": true} event fills the pool instead (see warm_up).
+    """
+    if event.get('warmUp'):
+        return warm_up(context)
+    try:
+        return _generate(event)
+    finally:
+        _after_request()
+
+
+def _generate(event):
+    api_key_error = _api_key_error()
+    if api_key_error:
+        return _response(500, {'error': api_key_error})
+
+    difficulty, language = _parse_request(event)
+
+    challenge = POOL.take(difficulty, language)
+    if challenge is not None:
+        return _response(200, {**challenge, 'source': 'pool'})
+
+    try:
+        challenge = BACKEND.generate(difficulty, language)
+
+        # VALIDATION: fields present and "Solution" used in initialCode and solution
+        challenge_pool.check_structure(challenge)
+
+        return _response(200, {**challenge, 'source': 'live'})
+
     except Exception as e:
-        print(f"[ERROR] Exception: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': str(e)})
-        }
+        return _response(500, _generation_error(e))
+
+
+def _live_members(difficulty, language):
+    """Batches of (key, value) members completed by each chunk of the model's output"""
+    parser = json_stream.ObjectStreamParser()
+    stream = getattr(BACKEND, 'stream', None)
+    chunks = stream(difficulty, language) if stream else [json.dumps(BACKEND.generate(difficulty, language))]
+    for chunk in chunks:
+        yield parser.feed(chunk)
+        if parser.done:
+            break
+    parser.close()
+
+
+def stream_challenge(event):
+    """
+    Streaming /generate: yield (event_name, data) while the model writes
+
+    `meta` (title, description), `initialCode` and `testCases` are sent as
+    soon as they are complete, in that order; `challenge` (the body /generate
+    returns, plus timings) comes last and only once the whole challenge
+    passed check_structure(), so a challenge breaking the "Solution" rule
+    never gets committed. Failures end the stream with an `error` event.
+    """
+    try:
+        yield from _stream_events(event)
+    finally:
+        _after_request()
+
+
+def _stream_events(event):
+    api_key_error = _api_key_error()
+    if api_key_error:
+        yield 'error', {'error': api_key_error}
+        return
+
+    difficulty, language = _parse_request(event)
+    started = time.monotonic()
+    first_content_ms = None
+    challenge = {}
+    stage = 0
+
+    pooled = POOL.take(difficulty, language)
+    source = 'pool' if pooled is not None else 'live'
+    try:
+        batches = [list(pooled.items())] if pooled is not None else _live_members(difficulty, language)
+        for members in batches:
+            challenge.update(members)
+            while stage < len(STREAM_STAGES) and all(f in challenge for f in STREAM_STAGES[stage][1]):
+                name, fields = STREAM_STAGES[stage]
+                if name == 'initialCode':
+                    challenge_pool.check_solution_name(challenge['initialCode'], 'initialCode')
+                if first_content_ms is None:
+                    first_content_ms = round((time.monotonic() - started) * 1000)
+                yield name, {field: challenge[field] for field in fields}
+                stage += 1
+
+        # VALIDATION: fields present and "Solution" used in initialCode and solution
+        challenge_pool.check_structure(challenge)
+    except Exception as e:
+        yield 'error', _generation_error(e)
+        return
+
+    yield 'challenge', {
+        **challenge,
+        'source': source,
+        'timings': {'firstContentMs': first_content_ms, 'totalMs': round((time.monotonic() - started) * 1000)},
+    }
@@ -0,0 +1,165 @@
+"""
+Linear-time lexical scan of Go source for validate_code
+
+One lexer pass blanks comments and replaces string/rune literals with
+numbered placeholders, so nothing inside them is ever mistaken for code.
+Every rule then runs as a precompiled regex over that stripped text; each
+starts with a literal (`for`, `func`, `import`...), which lets `re` skip
+ahead instead of trying every position.
+
+Calls are counted in one scan over the reversed text: `\\(\\s*(\\w+)` anchors
+on the `(` and captures the (reversed) identifier before it, so counting
+calls to every declared function costs O(size) instead of
+O(functions × size).
+"""
+
+import re
+from collections import Counter
+from typing import Iterator, List, NamedTuple, Pattern, Tuple
+
+# Comments and literals; unterminated ones run to the end of the line / file
+_LITERAL_RE = re.compile(
+    r'//[^\n]*'
+    r'|/\*[^*]*(?:\*+[^*/][^*]*)*(?:\*+/)?'
+    r'|`[^`]*`?'
+    r'|"[^"\\\n]*(?:\\.[^"\\\n]*)*"?'
+    r"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'?"
+)
+_PLACEHOLDER_RE = re.compile(r'"#(\d+)"')
+
+# Forbidden imports that could be used maliciously (validate_code; the
+# build cache warm-up precompiles every other stdlib package)
+FORBIDDEN_IMPORTS = [
+    'os/exec',      # Prevent command execution
+    'syscall',      # Prevent system calls
+    'unsafe',       # Prevent unsafe operations
+    'net/http',     # Prevent network requests
+    'net/rpc',      # Prevent RPC calls
+    'plugin',       # Prevent loading plugins
+    'reflect',      # Prevent reflection abuse (opcional, puede ser necesario para algunos ejercicios)
+]
+
+# Imports that are allowed to compile but flagged as suspicious
+SUSPICIOUS_IMPORTS = [
+    'crypto/rand',  # Random access (puede ser usado para evadir detección)
+]
+
+# `//go:linkname` lets code reach unexported runtime symbols
+_LINKNAME_RE = re.compile(r'//\s*go:linkname')
+
+# Rules over the stripped text (a match preceded by an identifier char is ignored)
+_IMPORT_RE = re.compile(r'import\s*(?:\(([^)]*)\)|(?:[\w.]+\s*)?"#(\d+)")')
+_INFINITE_LOOP_RE = re.compile(r'for\s*(?:\{\s*\}|;\s*;\s*\{)')
+_GOTO_RE = re.compile(r'goto\s+\w')
+_PACKAGE_MAIN_RE = re.compile(r'package\s+main\b')
+_MAIN_FUNC_RE = re.compile(r'func\s+main\s*\(\s*\)')
+_FUNC_DECL_RE = re.compile(r'func\s+(\w+)\s*\(')
+_REVERSED_CALL_RE = re.compile(r'\(\s*(\w+)')
+
+
+class SourceFacts(NamedTuple):
+    imports: List[str]          # import paths, in order
+    functions: List[str]        # names of top-level funcs (`func name(`)
+    calls: Counter              # function name -> occurrences of `name(` (declaration included)
+    infinite_loop: bool         # `for {}` or `for ;; {`
+    has_goto: bool
+    has_linkname: bool
+    has_package_main: bool
+    has_main_func: bool         # `func main()`
+
+
+def strip_literals(code: str) -> Tuple[str, List[str], bool]:
+    """
+    Blank comments and replace literals with "#<index>" placeholders
+
+    Returns:
+        Tuple of (stripped_code, literals, has_linkname)
+    """
+    literals: List[str] = []
+    linkname = []
+
+    def replace(match) -> str:
+        text = match.group()
+        if text[0] == '/':
+            if _LINKNAME_RE.match(text):
+                linkname.append(text)
+            return ' '
+        literals.append(text[1:-1])
+        return f'"#{len(literals) - 1}"'
+
+    return _LITERAL_RE.sub(replace, code), literals, bool(linkname)
+
+
+def blank_literals(code: str) -> str:
+    """
+    Code with comments and the contents of literals replaced by spaces
+    (newlines kept): same length, so match positions apply to `code` itself
+    """
+    def replace(match) -> str:
+        text = match.group()
+        if text[0] == '/':
+            return re.sub(r'[^\n]', ' ', text)
+        closed = len(text) > 1 and text[-1] == text[0]
+        inner = text[1:-1] if closed else text[1:]
+        return text[0] + re.sub(r'[^\n]', ' ', inner) + (text[-1] if closed else '')
+
+    return _LITERAL_RE.sub(replace, code)
+
+
+def _is_word_start(text: str, index: int) -> bool:
+    return index == 0 or not (text[index - 1].isalnum() or text[index - 1] in '_.')
+
+
+def finditer_words(pattern: Pattern, text: str) -> Iterator['re.Match']:
+    """Matches of `pattern` that start at an identifier boundary"""
+    return (m for m in pattern.finditer(text) if _is_word_start(text, m.start()))
+
+
+def _search_word(pattern: Pattern, text: str) -> bool:
+    return next(finditer_words(pattern, text), None) is not None
+
+
+def scan(code: str) -> SourceFacts:
+    """Collect the facts validate_code checks, in time linear in len(code)"""
+    stripped, literals, has_linkname = strip_literals(code)
+
+    imports: List[str] = []
+    for match in finditer_words(_IMPORT_RE, stripped):
+        block, single = match.groups()
+        indexes = _PLACEHOLDER_RE.findall(block) if block is not None else [single]
+        imports.extend(literals[int(i)] for i in indexes)
+
+    functions = [m.group(1) for m in finditer_words(_FUNC_DECL_RE, stripped)]
+    reversed_calls = Counter(_REVERSED_CALL_RE.findall(stripped[::-1]))
+    calls = Counter({name: reversed_calls[name[::-1]] for name in functions})
+
+    return SourceFacts(
+        imports=imports,
+        functions=functions,
+        calls=calls,
+        infinite_loop=_search_word(_INFINITE_LOOP_RE, stripped),
+        has_goto=_search_word(_GOTO_RE, stripped),
+        has_linkname=has_linkname,
+        has_package_main=_search_word(_PACKAGE_MAIN_RE, stripped),
+        has_main_func=_search_word(_MAIN_FUNC_RE, stripped),
+    )
+
+
+def redact(code: str) -> str:
+    """
+    Code with comments removed and the contents of string literals masked
+    (same length, so the program keeps its shape); import paths and rune
+    literals are left as they are so the result still compiles
+    """
+    import_paths = set(scan(code).imports)
+
+    def replace(match) -> str:
+        text = match.group()
+        if text[0] == '/':
+            # Keep line numbers of the remaining code
+            return '\n' * text.count('\n')
+        if text[0] == "'" or text[1:-1] in import_paths:
+            return text
+        return text[0] + re.sub(r'[^\n]', '*', text[1:-1]) + text[-1]
+
+    return _LITERAL_RE.sub(replace, code)
@@ -0,0 +1,124 @@
+"""
+Incremental parsing of one JSON object arriving in chunks (LLM token stream)
+
+ObjectStreamParser hands out each top-level member (`"key": value`) as soon
+as its value is complete, so a caller can use `title` while the model is
+still writing `testCases`. Text before the opening `{` (a ```json fence,
+a stray sentence) and after the closing `}` is ignored.
+
+Only structural characters are visited: a regex jumps from one quote,
+bracket or comma to the next, and completed members are handed to
+json.loads, so the whole stream costs O(size).
+
+Note: runs under the python3.9 generator Lambda, keep it 3.9-compatible.
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, List, Tuple
+
+_STRUCTURE_RE = re.compile(r'["{}\[\],]')
+_STRING_END_RE = re.compile(r'["\\]')
+
+
+class ObjectStreamParser:
+    """Feed text chunks, get back the top-level members completed by each one"""
+
+    def __init__(self):
+        self._buffer = ''
+        self._pos = 0               # next index of _buffer to scan
+        self._member_start = None   # start of the current member, None before `{`
+        self._depth = 0
+        self._in_string = False
+        self.done = False           # closing `}` seen
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Returns:
+            List of (key, value) for members completed by this chunk, in order
+
+        Raises:
+            json.JSONDecodeError: a completed member is not valid JSON
+        """
+        if self.done:
+            return []
+        self._buffer += chunk
+        members: List[Tuple[str, Any]] = []
+        buffer = self._buffer
+        pos = self._pos
+
+        if self._member_start is None:
+            pos = buffer.find('{', pos)
+            if pos < 0:
+                # Keep nothing before the object, e.g. a ```json fence
+                self._buffer, self._pos = '', 0
+                return members
+            self._depth, self._member_start = 1, pos + 1
+            pos += 1
+
+        while True:
+            if self._in_string:
+                match = _STRING_END_RE.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+                if match.group() == '\\':
+                    if match.end() >= len(buffer):
+                        # Escape split across chunks: look at it again next time
+                        pos = match.start()
+                        break
+                    pos = match.end() + 1
+                    continue
+                self._in_string = False
+                pos = match.end()
+                continue
+
+            match = _STRUCTURE_RE.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+            char, pos = match.group(), match.end()
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    members.extend(self._member(buffer[self._member_start:pos - 1]))
+                    self.done = True
+                    break
+            elif self._depth == 1:  # `,` between members
+                members.extend(self._member(buffer[self._member_start:pos - 1]))
+                self._member_start = pos
+
+        # Drop completed members from the buffer
+        start = self._member_start
+        self._buffer, self._pos, self._member_start = buffer[start:], pos - start, 0
+        if self.done:
+            self._buffer, self._pos = '', 0
+        return members
+
+    @staticmethod
+    def _member(text: str) -> List[Tuple[str, Any]]:
+        if not text.strip():  # `{}` or a trailing comma
+            return []
+        return list(json.loads('{' + text + '}').items())
+
+    def close(self) -> None:
+        """
+        Raises:
+            json.JSONDecodeError: the stream ended before the object was closed
+        """
+        if not self.done:
+            raise json.JSONDecodeError('Unterminated object', self._buffer, len(self._buffer))
+
+
+def loads(chunks: Iterable[str]) -> Dict[str, Any]:
+    """Parse a whole chunked object (same result as collecting feed())"""
+    parser = ObjectStreamParser()
+    result: Dict[str, Any] = {}
+    for chunk in chunks:
+        result.update(parser.feed(chunk))
+    parser.close()
+    return result
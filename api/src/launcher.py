@@ -0,0 +1,479 @@
+"""
+Start compiler and user processes without preexec_fn
+
+subprocess's preexec_fn runs a Python callback between fork and exec, in a
+child of the (large, multithreaded) server process. Every launch pays for
+the slow fork path plus the interpreter. A lock held by another thread at
+fork time can also deadlock the child. Two launch paths avoid it:
+
+- forkserver (default): a small single-threaded helper process, started
+  once, receives launch requests over a Unix socket, along with the pipe
+  ends to use as stdout/stderr (SCM_RIGHTS). It forks itself, which is
+  cheap because it is tiny and has no threads. The child joins a new
+  process group, applies the resource limits, confines run-step programs
+  to their working directory (sandbox.py) and execs. Exec errors come
+  back through a close-on-exec pipe, as in subprocess. The helper reaps
+  its children with wait4 and sends back exit status and rusage. Kills go
+  through the helper too: only it knows whether a pid was already reaped
+  (and could have been reused).
+- spawn: subprocess with start_new_session (fork/vfork and exec done in C,
+  no Python in the child), with the limits applied right after via
+  prlimit. Used when PROCESS_LAUNCHER=spawn or when the helper cannot
+  start. Here the limits take effect a few microseconds after the program
+  starts, and confined programs are started through `sandbox.py`, which
+  confines itself and execs them.
+
+Both paths are safe to use from many threads at once. The time from the
+launch request until the program is exec'd is recorded in
+goguru_spawn_seconds and in each ProcessResult.
+"""
+
+import abc
+import errno
+import gc
+import itertools
+import json
+import os
+import resource
+import selectors
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import metrics
+import sandbox
+
+# forkserver | spawn
+PROCESS_LAUNCHER = os.environ.get('PROCESS_LAUNCHER', 'forkserver')
+# Seconds to wait for the helper to answer a launch request
+LAUNCH_TIMEOUT = 10.0
+MAX_MESSAGE = 256 * 1024
+# Ignored by Python (or the helper) and inherited through exec: reset like Popen(restore_signals=True)
+RESTORED_SIGNALS = (signal.SIGPIPE, signal.SIGXFSZ, signal.SIGINT)
+
+SPAWN_SECONDS = metrics.Histogram(
+    'goguru_spawn_seconds', 'Time from launch request to exec of the child process', ('launcher',)
+)
+metrics.register(SPAWN_SECONDS)
+
+
+class Usage(NamedTuple):
+    """The parts of the child's rusage that are reported"""
+    ru_utime: float
+    ru_stime: float
+    ru_maxrss: int
+
+
+def _limit_pair(res: int, value: int, hard: int) -> Tuple[int, int]:
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    if res == resource.RLIMIT_CPU:
+        # SIGXCPU at the soft limit, SIGKILL one second later
+        return value, value + 1 if hard == resource.RLIM_INFINITY else hard
+    return value, value
+
+
+def apply_limits(limits: Sequence[Tuple[int, int]], pid: int = 0) -> None:
+    """
+    Set hard resource limits on this process (pid 0) or on `pid`.
+    A limit of 0 (or less) leaves that resource untouched.
+    """
+    for res, value in limits:
+        if value <= 0:
+            continue
+        if pid:
+            _, hard = resource.prlimit(pid, res)
+            resource.prlimit(pid, res, _limit_pair(res, value, hard))
+        else:
+            _, hard = resource.getrlimit(res)
+            resource.setrlimit(res, _limit_pair(res, value, hard))
+
+
+def kill_group(pid: int) -> None:
+    """Kill the process and anything it spawned (it leads its own process group)"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+class LaunchedProcess(abc.ABC):
+    """A started child: wait() returns (returncode, Usage), or None on timeout"""
+
+    def __init__(self, pid: int, spawn_time: float):
+        self.pid = pid
+        self.spawn_time = spawn_time
+
+    @abc.abstractmethod
+    def wait(self, timeout: Optional[float]) -> Optional[Tuple[int, Usage]]:
+        ...
+
+    def kill(self) -> None:
+        kill_group(self.pid)
+
+
+# --- spawn ---------------------------------------------------------------
+
+class _SpawnedProcess(LaunchedProcess):
+    def __init__(self, proc: subprocess.Popen, spawn_time: float):
+        super().__init__(proc.pid, spawn_time)
+        self._proc = proc
+
+    def kill(self) -> None:
+        # Once wait() reaped it, the pid may belong to another process
+        if self._proc.returncode is None:
+            kill_group(self.pid)
+
+    def wait(self, timeout: Optional[float]) -> Optional[Tuple[int, Usage]]:
+        """Wait with wait4 to collect the child's rusage"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.0005
+        while True:
+            pid, status, rusage = os.wait4(self.pid, os.WNOHANG if deadline is not None else 0)
+            if pid:
+                returncode = os.waitstatus_to_exitcode(status)
+                # Let Popen know the child is gone so it does not try to reap it again
+                self._proc.returncode = returncode
+                return returncode, Usage(rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss)
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+
+def _spawn(argv: Sequence[str], cwd: str, env: Optional[Dict[str, str]],
+           limits: Sequence[Tuple[int, int]], stdout_fd: int, stderr_fd: int,
+           confinement: str = 'off') -> LaunchedProcess:
+    started = time.monotonic()
+    if confinement != 'off':
+        argv = sandbox.wrap(argv, cwd, confinement)
+    proc = subprocess.Popen(
+        list(argv), stdin=subprocess.DEVNULL, stdout=stdout_fd, stderr=stderr_fd,
+        cwd=cwd, env=env, start_new_session=True
+    )
+    try:
+        apply_limits(limits, proc.pid)
+    except (OSError, ValueError):
+        kill_group(proc.pid)
+        proc.wait()
+        raise
+    return _SpawnedProcess(proc, time.monotonic() - started)
+
+
+# --- forkserver: helper side --------------------------------------------
+
+# (program, PATH) -> executable: a PATH search per launch costs as much as the fork
+_executables: Dict[Tuple[str, str], Optional[str]] = {}
+
+
+def _executable(program: str, env: Dict[str, str]) -> Optional[str]:
+    key = (program, env.get('PATH', os.defpath))
+    if key not in _executables:
+        _executables[key] = program if os.sep in program else shutil.which(program, path=key[1])
+    return _executables[key]
+
+
+def _launch(request: dict, fds: List[int]) -> dict:
+    """Fork, set up and exec one child (runs in the helper)"""
+    stdout_fd, stderr_fd = fds
+    executable = _executable(request['argv'][0], request['env'])
+    if executable is None:
+        os.close(stdout_fd)
+        os.close(stderr_fd)
+        return {'id': request['id'], 'errno': errno.ENOENT, 'error': os.strerror(errno.ENOENT)}
+    error_r, error_w = os.pipe()  # close-on-exec: EOF means exec succeeded
+    try:
+        pid = os.fork()
+    except OSError as e:
+        for fd in (error_r, error_w, stdout_fd, stderr_fd):
+            os.close(fd)
+        return {'id': request['id'], 'errno': e.errno, 'error': e.strerror}
+
+    if pid == 0:
+        try:
+            os.setpgrp()
+            for signum in RESTORED_SIGNALS:
+                signal.signal(signum, signal.SIG_DFL)
+            apply_limits(request['limits'])
+            null = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(null, 0)
+            os.dup2(stdout_fd, 1)
+            os.dup2(stderr_fd, 2)
+            os.chdir(request['cwd'])
+            sandbox.confine([request['cwd']], request['sandbox'])
+            os.execve(executable, request['argv'], request['env'])
+        except OSError as e:
+            os.write(error_w, f'{e.errno}:{e.strerror}'.encode())
+        except BaseException as e:
+            os.write(error_w, f'0:{e}'.encode())
+        finally:
+            os._exit(127)
+
+    for fd in (error_w, stdout_fd, stderr_fd):
+        os.close(fd)
+    failure = b''
+    while True:
+        chunk = os.read(error_r, 4096)
+        if not chunk:
+            break
+        failure += chunk
+    os.close(error_r)
+    if failure:
+        os.waitpid(pid, 0)
+        _executables.pop((request['argv'][0], request['env'].get('PATH', os.defpath)), None)
+        code, _, message = failure.decode(errors='replace').partition(':')
+        return {'id': request['id'], 'errno': int(code) or errno.EINVAL, 'error': message}
+    return {'id': request['id'], 'pid': pid}
+
+
+def serve(fd: int) -> None:
+    """Helper main loop: launch requests from the socket, exits reported back"""
+    # Inherited through pass_fds: children (user programs!) must not get the control socket
+    os.set_inheritable(fd, False)
+    sock = socket.socket(fileno=fd)
+    children = set()
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_r, False)
+    os.set_blocking(wake_w, False)
+    signal.set_wakeup_fd(wake_w)
+    signal.signal(signal.SIGCHLD, lambda *_: None)
+    # The server's Ctrl+C is for the server; the helper exits when its socket closes
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Nothing allocated so far is garbage: keep gc from touching (and copying) it in every fork
+    gc.freeze()
+
+    with selectors.DefaultSelector() as selector:
+        selector.register(sock, selectors.EVENT_READ)
+        selector.register(wake_r, selectors.EVENT_READ)
+        while True:
+            for key, _ in selector.select():
+                if key.fileobj is sock:
+                    data, fds, _, _ = socket.recv_fds(sock, MAX_MESSAGE, 2)
+                    if not data:
+                        # The server is gone: so are the programs it started
+                        for pid in children:
+                            kill_group(pid)
+                        return
+                    message = json.loads(data)
+                    if 'kill' in message:
+                        # Not reaped yet (at worst a zombie), so the pid is still this child's
+                        if message['kill'] in children:
+                            kill_group(message['kill'])
+                        continue
+                    for received in fds:
+                        os.set_inheritable(received, False)
+                    reply = _launch(message, fds)
+                    if 'pid' in reply:
+                        children.add(reply['pid'])
+                    sock.send(json.dumps(reply).encode())
+                    continue
+                try:
+                    while os.read(wake_r, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+                while children:
+                    try:
+                        pid, status, rusage = os.wait4(-1, os.WNOHANG)
+                    except ChildProcessError:
+                        break
+                    if not pid:
+                        break
+                    children.discard(pid)
+                    sock.send(json.dumps({
+                        'exit': pid,
+                        'returncode': os.waitstatus_to_exitcode(status),
+                        'usage': [rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss],
+                    }).encode())
+
+
+# --- forkserver: server side ---------------------------------------------
+
+class _Exit:
+    __slots__ = ('event', 'result')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[Tuple[int, Usage]] = None
+
+
+class _ForkServerProcess(LaunchedProcess):
+    def __init__(self, pid: int, spawn_time: float, exit_slot: _Exit, server: 'ForkServer'):
+        super().__init__(pid, spawn_time)
+        self._exit = exit_slot
+        self._server = server
+
+    def kill(self) -> None:
+        if not self._exit.event.is_set():
+            self._server.kill(self.pid)
+
+    def wait(self, timeout: Optional[float]) -> Optional[Tuple[int, Usage]]:
+        if not self._exit.event.wait(timeout):
+            return None
+        return self._exit.result
+
+
+class ForkServer:
+    """Client of the helper process; started on first use and after it dies"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._proc: Optional[subprocess.Popen] = None
+        self._ids = itertools.count()
+        self._replies: Dict[int, list] = {}  # request id -> [Event, reply, exit slot]
+        self._exits: Dict[int, _Exit] = {}   # pid -> exit slot
+
+    def start(self) -> None:
+        with self._lock:
+            self._start()
+
+    def _start(self) -> None:
+        if self._sock is not None:
+            return
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            # -S: no site packages, the helper only needs the standard library and this file
+            self._proc = subprocess.Popen(
+                [sys.executable, '-S', os.path.abspath(__file__), str(child.fileno())],
+                pass_fds=(child.fileno(),), stdin=subprocess.DEVNULL
+            )
+        except BaseException:
+            parent.close()
+            raise
+        finally:
+            child.close()
+        self._sock = parent
+        threading.Thread(target=self._read_loop, args=(parent, self._proc), daemon=True,
+                         name='launcher-reader').start()
+
+    def spawn(self, argv: Sequence[str], cwd: str, env: Optional[Dict[str, str]],
+              limits: Sequence[Tuple[int, int]], stdout_fd: int, stderr_fd: int,
+              confinement: str = 'off') -> LaunchedProcess:
+        started = time.monotonic()
+        slot = [threading.Event(), None, None]
+        request = {
+            'argv': list(argv), 'cwd': cwd, 'env': dict(os.environ if env is None else env),
+            'limits': [list(limit) for limit in limits], 'sandbox': confinement,
+        }
+        with self._lock:
+            self._start()
+            request['id'] = request_id = next(self._ids)
+            self._replies[request_id] = slot
+            try:
+                socket.send_fds(self._sock, [json.dumps(request).encode()], [stdout_fd, stderr_fd])
+            except OSError:
+                del self._replies[request_id]
+                raise
+        if not slot[0].wait(LAUNCH_TIMEOUT):
+            with self._lock:
+                self._replies.pop(request_id, None)
+            raise OSError(errno.ETIMEDOUT, 'El lanzador de procesos no respondió')
+        reply = slot[1]
+        if 'pid' not in reply:
+            raise OSError(reply['errno'], reply['error'], argv[0])
+        return _ForkServerProcess(reply['pid'], time.monotonic() - started, slot[2], self)
+
+    def kill(self, pid: int) -> None:
+        """Ask the helper to kill a child's process group, unless it already reaped it"""
+        with self._lock:
+            if self._sock is None or pid not in self._exits:
+                # Exited, or the helper died and its children were killed already
+                return
+            try:
+                self._sock.send(json.dumps({'kill': pid}).encode())
+            except OSError:
+                pass
+
+    def _read_loop(self, sock: socket.socket, proc: subprocess.Popen) -> None:
+        while True:
+            try:
+                data = sock.recv(MAX_MESSAGE)
+            except OSError:
+                data = b''
+            if not data:
+                break
+            message = json.loads(data)
+            with self._lock:
+                if 'exit' in message:
+                    exit_slot = self._exits.pop(message['exit'], None)
+                    if exit_slot is not None:
+                        exit_slot.result = (message['returncode'], Usage(*message['usage']))
+                        exit_slot.event.set()
+                    continue
+                slot = self._replies.pop(message['id'], None)
+                if slot is not None:
+                    if 'pid' in message:
+                        # Registered before the exit message can be read, so it cannot be missed
+                        slot[2] = self._exits[message['pid']] = _Exit()
+                    slot[1] = message
+                    slot[0].set()
+
+        # The helper died: nothing will report on its children anymore
+        with self._lock:
+            if self._sock is sock:
+                self._sock = None
+            sock.close()
+            for slot in self._replies.values():
+                slot[1] = {'errno': errno.EPIPE, 'error': 'El lanzador de procesos terminó'}
+                slot[0].set()
+            self._replies.clear()
+            for pid, exit_slot in self._exits.items():
+                kill_group(pid)
+                exit_slot.result = (-signal.SIGKILL, Usage(0.0, 0.0, 0))
+                exit_slot.event.set()
+            self._exits.clear()
+        proc.wait()
+
+
+FORK_SERVER = ForkServer()
+_fallback = False
+
+
+def start() -> None:
+    """Start the helper ahead of the first launch (container init)"""
+    global _fallback
+    if PROCESS_LAUNCHER != 'forkserver' or _fallback:
+        return
+    try:
+        FORK_SERVER.start()
+    except OSError as e:
+        _fallback = True
+        print(f"[WARN] No se pudo iniciar el lanzador de procesos, se usa spawn: {str(e)}")
+
+
+def spawn(argv: Sequence[str], cwd: str, env: Optional[Dict[str, str]],
+          limits: Dict[int, int], stdout_fd: int, stderr_fd: int,
+          confine: bool = False) -> LaunchedProcess:
+    """
+    Start `argv` in its own process group with hard resource limits,
+    stdin from /dev/null and the given stdout/stderr pipe ends
+
+    Args:
+        confine: user programs; they may only write under `cwd` (sandbox.py)
+
+    Raises:
+        OSError: the program could not be started (e.g. not found)
+    """
+    start()
+    pairs = sorted(limits.items())
+    confinement = sandbox.mechanism() if confine else 'off'
+    if PROCESS_LAUNCHER == 'forkserver' and not _fallback:
+        process = FORK_SERVER.spawn(argv, cwd, env, pairs, stdout_fd, stderr_fd, confinement)
+        SPAWN_SECONDS.observe(process.spawn_time, 'forkserver')
+    else:
+        process = _spawn(argv, cwd, env, pairs, stdout_fd, stderr_fd, confinement)
+        SPAWN_SECONDS.observe(process.spawn_time, 'spawn')
+    return process
+
+
+if __name__ == '__main__':
+    serve(int(sys.argv[1]))
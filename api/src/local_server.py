@@ -1,42 +1,192 @@
 #!/usr/bin/env python3
 """
 Servidor local para desarrollo rápido sin Docker/SAM
-Ejecuta: python3 local_server.py
+Ejecuta: python3 local_server.py [--port 3000]
 """
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import argparse
+import codecs
+import gzip
+import hmac
 import json
 import sys
 import os
+import time
+import zlib
+from typing import Optional
 
 # Agregar el directorio actual al path para importar app.py
 sys.path.insert(0, os.path.dirname(__file__))
 
 # Importar el handler de Lambda
-from app import handler
+import app
+from app import handler, handle_execute, wasm_asset, IMMUTABLE_CACHE_CONTROL, WORKSPACES
+import build_cache
+import flight_recorder
+import metrics
+import result_cache
+import scheduler
+
+# Compile/run slots: one per CPU core, plus a bounded wait queue
+MAX_CONCURRENT_EXECUTIONS = int(os.environ.get('MAX_CONCURRENT_EXECUTIONS', str(os.cpu_count() or 1)))
+MAX_QUEUE_SIZE = int(os.environ.get('MAX_QUEUE_SIZE', str(4 * MAX_CONCURRENT_EXECUTIONS)))
+QUEUE_TIMEOUT = float(os.environ.get('QUEUE_TIMEOUT', '30'))  # seconds a request may wait for a slot
+MAX_QUEUED_PER_CLIENT = int(os.environ.get('MAX_QUEUED_PER_CLIENT', '4'))  # waiting requests per client
+# Seconds after which a lesson/background request is served before battle traffic
+STARVATION_SECONDS = float(os.environ.get('STARVATION_SECONDS', '10'))
+
+# Priority class per route
+DEFAULT_PRIORITY = {'/execute/tests': 'battle', '/execute': 'lesson', '/compile/wasm': 'lesson', '/check': 'background'}
+# Internal callers (challenge pool refills) that send this secret in
+# X-Service-Token may pick their class with X-Priority; empty: nobody can
+PRIORITY_TOKEN = os.environ.get('PRIORITY_TOKEN', '')
+# Peers whose X-Forwarded-For names the client (router.py sets it for the nodes it starts)
+TRUSTED_PROXIES = {ip.strip() for ip in os.environ.get('TRUSTED_PROXIES', '').split(',') if ip.strip()}
+
+# Headers the browser is allowed to read
+EXPOSED_HEADERS = 'X-Queue-Depth, X-Queue-Wait-Ms, X-Queue-Class, X-Active-Executions, Retry-After'
+
+# Seconds a browser may reuse a CORS preflight (Chromium caps it at 7200)
+CORS_MAX_AGE = int(os.environ.get('CORS_MAX_AGE', '7200'))
+# Seconds an idle keep-alive connection stays open
+KEEPALIVE_TIMEOUT = float(os.environ.get('KEEPALIVE_TIMEOUT', '15'))
+# Responses at least this large are compressed when the client accepts it
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+COMPRESS_LEVEL = 6
+
+
+SCHEDULER = scheduler.Scheduler(
+    MAX_CONCURRENT_EXECUTIONS, MAX_QUEUE_SIZE, QUEUE_TIMEOUT, MAX_QUEUED_PER_CLIENT, STARVATION_SECONDS
+)
+# /execute/tests runs its cases in parallel only on slots nobody is waiting for
+app.EXTRA_TEST_SLOTS = SCHEDULER.extra_slots
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """gzip or deflate from an Accept-Encoding header (q-values honoured), None for identity"""
+    accepted = {}
+    for item in accept_encoding.lower().split(','):
+        name, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    best = max(('gzip', 'deflate'), key=lambda e: accepted.get(e, accepted.get('*', 0.0)))
+    return best if accepted.get(best, accepted.get('*', 0.0)) > 0 else None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+    # HTTP "deflate" is the zlib format
+    return zlib.compress(data, COMPRESS_LEVEL)
+
 
 class LocalRequestHandler(BaseHTTPRequestHandler):
+    # Persistent connections: every response is framed by Content-Length (or chunked)
+    protocol_version = 'HTTP/1.1'
+    # Idle keep-alive connections are closed after this (it also bounds each socket read/write)
+    timeout = KEEPALIVE_TIMEOUT
+    # Headers and body are separate writes: do not let Nagle hold the body back
+    disable_nagle_algorithm = True
+    _chunked = False  # current event stream uses chunked framing
+
     def do_OPTIONS(self):
-        """Handle CORS preflight"""
-        self.send_response(200)
+        """Handle CORS preflight (cacheable for CORS_MAX_AGE seconds)"""
+        self.send_response(204)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Max-Age', str(CORS_MAX_AGE))
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
+    def do_GET(self):
+        """Handle GET requests (readiness, metrics and /wasm/ assets)"""
+        if self.path == '/metrics':
+            self._send_metrics()
+            return
+        if self.path.startswith('/wasm/'):
+            self._send_wasm_asset(self.path[len('/wasm/'):])
+            return
+        if self.path != '/health':
+            self.send_error(404, 'Not Found')
+            return
+
+        # 503 until the shared Go build cache is warm
+        ready = build_cache.is_ready()
+        body = json.dumps({
+            'ready': ready,
+            'buildCache': build_cache.status(include_size=False),
+            'queue': SCHEDULER.snapshot(),
+            'workspaces': WORKSPACES.snapshot(),
+            'flightRecorder': flight_recorder.RECORDER.snapshot(),
+            'curriculumIndex': result_cache.PRECOMPUTED.snapshot()
+        })
+        self._send_body(200 if ready else 503, {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        }, body.encode('utf-8'))
+
     def do_POST(self):
         """Handle POST requests"""
-        if self.path != '/execute':
+        if self.path == '/generate':
+            self._generate()
+            return
+        if self.path == '/validate':
+            self._validate()
+            return
+        if self.path not in ('/execute', '/execute/tests', '/check', '/compile/wasm'):
             self.send_error(404, 'Not Found')
             return
 
         # Leer el body de la request
-        content_length = int(self.headers['Content-Length'])
-        post_data = self.rfile.read(content_length)
+        post_data = self._read_body()
+        if post_data is None:
+            return
+
+        # Esperar un slot de ejecución según prioridad y cliente (o rechazar si la cola está llena)
+        priority, client = self._priority(), self._client_id()
+        acquired, depth, waited = SCHEDULER.acquire(priority, client)
+        queue_headers = {
+            'X-Queue-Depth': str(depth),
+            'X-Queue-Wait-Ms': str(round(waited * 1000)),
+            'X-Queue-Class': priority,
+            'Access-Control-Expose-Headers': EXPOSED_HEADERS,
+        }
+        if not acquired:
+            retry_after = SCHEDULER.retry_after()
+            self._send_body(503, {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                'Retry-After': str(retry_after),
+                **queue_headers
+            }, json.dumps({
+                'success': False,
+                'error': 'Servidor ocupado, intenta de nuevo en unos segundos',
+                'retryAfter': retry_after,
+                'queue': SCHEDULER.snapshot()
+            }).encode('utf-8'))
+            return
+
+        started = time.monotonic()
+        if self.path == '/execute' and self._wants_stream(post_data):
+            try:
+                self._stream_execute(post_data, queue_headers)
+            finally:
+                SCHEDULER.release(time.monotonic() - started, client)
+            return
 
         try:
             # Crear el evento simulado de Lambda
             event = {
+                'rawPath': self.path,
                 'body': post_data.decode('utf-8'),
                 'headers': dict(self.headers)
             }
@@ -44,37 +194,255 @@ class LocalRequestHandler(BaseHTTPRequestHandler):
             # Llamar al handler de Lambda
             response = handler(event, None)
 
-            # Enviar respuesta
-            self.send_response(response['statusCode'])
+        except Exception as e:
+            response = {
+                'statusCode': 500,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({
+                    'success': False,
+                    'error': f'Server error: {str(e)}'
+                })
+            }
+        finally:
+            SCHEDULER.release(time.monotonic() - started, client)
+
+        # Enviar respuesta
+        self._send_body(response['statusCode'], {
+            **response.get('headers', {}),
+            **queue_headers,
+            'X-Active-Executions': str(SCHEDULER.snapshot()['active'])
+        }, response['body'].encode('utf-8'))
 
-            # Headers de respuesta
-            for key, value in response.get('headers', {}).items():
-                self.send_header(key, value)
+    def _priority(self) -> str:
+        """The route's class, or X-Priority (battle | lesson | background) from a caller with PRIORITY_TOKEN"""
+        token = (self.headers.get('X-Service-Token') or '').encode()
+        if PRIORITY_TOKEN and hmac.compare_digest(token, PRIORITY_TOKEN.encode()):
+            requested = (self.headers.get('X-Priority') or '').strip().lower()
+            if requested in scheduler.PRIORITY_CLASSES:
+                return requested
+        return DEFAULT_PRIORITY.get(self.path, 'lesson')
 
-            self.end_headers()
+    def _client_id(self) -> str:
+        """
+        The client's IP address: the peer, or the address a trusted proxy
+        appended to X-Forwarded-For. Nothing the client sends itself counts,
+        so new ids cannot buy another fair share or queue allowance.
+        """
+        peer = self.client_address[0]
+        if peer in TRUSTED_PROXIES:
+            forwarded = (self.headers.get('X-Forwarded-For') or '').rpartition(',')[2].strip()
+            return forwarded[:64] or peer
+        return peer
 
-            # Body de respuesta
-            self.wfile.write(response['body'].encode('utf-8'))
+    def _validate(self):
+        """/validate: only compares strings, so it does not take an execution slot"""
+        post_data = self._read_body()
+        if post_data is None:
+            return
+        response = handler({'rawPath': self.path, 'body': post_data.decode('utf-8')}, None)
+        self._send_body(response['statusCode'], response.get('headers', {}), response['body'].encode('utf-8'))
 
+    def _send_wasm_asset(self, name: str):
+        """A /compile/wasm module or wasm_exec.js, cacheable forever (wasm_asset checked its hash against the name)"""
+        asset = wasm_asset(name)
+        if asset is None:
+            self.send_error(404, 'Not Found')
+            return
+        data, content_type = asset
+        self._send_body(200, {
+            'Content-Type': content_type,
+            'Cache-Control': IMMUTABLE_CACHE_CONTROL,
+            'Access-Control-Allow-Origin': '*'
+        }, data)
+
+    def _generate(self):
+        """
+        /generate: challenge generation (generator.handler, same as its Lambda).
+        Does not take an execution slot: it mostly waits for the model.
+        """
+        post_data = self._read_body()
+        if post_data is None:
+            return
+        if self._wants_stream(post_data):
+            self._stream_generate(post_data)
+            return
+        try:
+            # Importado al usarse: el generador necesita sus propias dependencias (agno/groq)
+            import generator
+            response = generator.handler({'rawPath': self.path, 'body': post_data.decode('utf-8')}, None)
         except Exception as e:
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            error_response = json.dumps({
-                'success': False,
-                'error': f'Server error: {str(e)}'
-            })
-            self.wfile.write(error_response.encode('utf-8'))
+            response = {
+                'statusCode': 500,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'success': False, 'error': f'Generador no disponible: {str(e)}'})
+            }
+
+        self._send_body(response['statusCode'], response.get('headers', {}), response['body'].encode('utf-8'))
+
+    def _stream_generate(self, post_data: bytes):
+        """
+        Server-Sent Events: `meta`, `initialCode` and `testCases` as the model
+        writes them, then `challenge` (or `error`); see generator.stream_challenge
+        """
+        self._start_event_stream({})
+        try:
+            import generator
+            events = generator.stream_challenge({'rawPath': self.path, 'body': post_data.decode('utf-8')})
+            for name, data in events:
+                self._send_event(name, data)
+            self._end_event_stream()
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente se fue: el desafío no se usa
+            self.close_connection = True
+        except Exception as e:
+            try:
+                self._send_event('error', {'error': f'Generador no disponible: {str(e)}'})
+                self._end_event_stream()
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+    def _send_metrics(self):
+        """Prometheus text exposition of the in-process metrics"""
+        snapshot = SCHEDULER.snapshot()
+        lines = [
+            '# HELP goguru_queue_waiting Requests waiting for an execution slot',
+            '# TYPE goguru_queue_waiting gauge',
+            *(f'goguru_queue_waiting{{class="{name}"}} {c["waiting"]}' for name, c in snapshot['classes'].items()),
+            '# HELP goguru_executions_active Requests holding an execution slot',
+            '# TYPE goguru_executions_active gauge',
+            f"goguru_executions_active {snapshot['active']}",
+        ]
+        body = (metrics.render() + '\n'.join(lines) + '\n').encode('utf-8')
+        self._send_body(200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}, body)
+
+    def _read_body(self) -> Optional[bytes]:
+        """Request body by Content-Length; None (after a 411) when it is missing"""
+        length = self.headers.get('Content-Length')
+        if length is None or not length.strip().isdigit():
+            # Without it the next request on this connection cannot be found
+            self.send_error(411, 'Length Required')
+            return None
+        return self.rfile.read(int(length))
+
+    def _send_body(self, status: int, headers: dict, body: bytes):
+        """
+        A complete response framed by Content-Length, so the connection can be
+        reused. Compressed (gzip or deflate, per Accept-Encoding) from
+        COMPRESS_MIN_BYTES: compiler errors and test reports shrink several times.
+        """
+        encoding = None
+        if len(body) >= COMPRESS_MIN_BYTES:
+            encoding = negotiate_encoding(self.headers.get('Accept-Encoding') or '')
+        if encoding:
+            body = compress(body, encoding)
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _wants_stream(self, post_data: bytes) -> bool:
+        """Streaming mode: `Accept: text/event-stream` or `"stream": true` in the body"""
+        if 'text/event-stream' in (self.headers.get('Accept') or ''):
+            return True
+        try:
+            body = json.loads(post_data.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return False
+        return isinstance(body, dict) and body.get('stream') is True
+
+    def _start_event_stream(self, extra_headers: dict):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        for key, value in extra_headers.items():
+            self.send_header(key, value)
+        # HTTP/1.1: one chunk per event, so the connection survives the stream.
+        # HTTP/1.0 clients: sin Content-Length, el stream termina al cerrar la conexión
+        self._chunked = self.request_version == 'HTTP/1.1'
+        if self._chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.close_connection = True
+        self.end_headers()
+
+    def _send_event(self, name: str, data: dict):
+        event = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+        if self._chunked:
+            event = b'%x\r\n%s\r\n' % (len(event), event)
+        self.wfile.write(event)
+        self.wfile.flush()
+
+    def _end_event_stream(self):
+        if self._chunked:
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
+
+    def _stream_execute(self, post_data: bytes, extra_headers: dict):
+        """
+        Server-Sent Events: `output` events while the program runs,
+        then a single `result` event with the usual /execute response
+        """
+        self._start_event_stream(extra_headers)
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        streamed = False
+        send_event = self._send_event
+
+        def on_output(chunk: bytes):
+            nonlocal streamed
+            text = decoder.decode(chunk)
+            if not text:
+                return True
+            try:
+                send_event('output', {'chunk': text})
+            except (BrokenPipeError, ConnectionResetError):
+                # El cliente se fue: detener el programa
+                self.close_connection = True
+                return False
+            streamed = True
+            return True
+
+        try:
+            response = handle_execute(json.loads(post_data.decode('utf-8')), on_output=on_output)
+            result = json.loads(response['body'])
+            result['statusCode'] = response['statusCode']
+        except Exception as e:
+            result = {'success': False, 'error': f'Server error: {str(e)}', 'statusCode': 500}
+
+        try:
+            # Resultados desde cache (o errores de compilación): enviar el output de una vez
+            output = result.get('output') or result.get('stdout')
+            if not streamed and output:
+                send_event('output', {'chunk': output})
+            send_event('result', result)
+            self._end_event_stream()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
 
     def log_message(self, format, *args):
         """Override para tener logs más limpios"""
         print(f"[{self.log_date_time_string()}] {format % args}")
 
+    def log_error(self, format, *args):
+        # An idle keep-alive connection reaching KEEPALIVE_TIMEOUT is not an error
+        if format.startswith('Request timed out'):
+            return
+        super().log_error(format, *args)
+
 def run_server(port=3000):
     """Inicia el servidor local"""
     server_address = ('', port)
-    httpd = HTTPServer(server_address, LocalRequestHandler)
+    # One thread per connection; SCHEDULER bounds the actual compile/run work
+    httpd = ThreadingHTTPServer(server_address, LocalRequestHandler)
+    httpd.daemon_threads = True
 
     print(f"""
 ╔══════════════════════════════════════════════════════════╗
@@ -83,6 +451,12 @@ def run_server(port=3000):
 
 ✅ Servidor corriendo en: http://localhost:{port}
 📡 Endpoint: http://localhost:{port}/execute
+⚙️  Slots: {SCHEDULER.slots} concurrentes, cola máx. {SCHEDULER.max_queue} (prioridad: battle > lesson > background)
+🧪 Tests:    http://localhost:{port}/execute/tests
+🔎 Check:    http://localhost:{port}/check
+🎲 Generate: http://localhost:{port}/generate
+🩺 Readiness: http://localhost:{port}/health
+📈 Métricas:  http://localhost:{port}/metrics
 
 🧪 Prueba con:
    curl -X POST http://localhost:{port}/execute \\
@@ -99,6 +473,10 @@ def run_server(port=3000):
         httpd.server_close()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servidor local de Go Guru API')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', '3000')))
+    args = parser.parse_args()
+
     # Verificar que Go esté instalado
     import subprocess
     try:
@@ -109,4 +487,4 @@ if __name__ == '__main__':
         print("   Instala Go desde: https://go.dev/dl/")
         sys.exit(1)
 
-    run_server()
+    run_server(args.port)
@@ -0,0 +1,185 @@
+"""
+In-process metrics for the execution API
+
+Counters and latency histograms per phase and per outcome, rendered in the
+Prometheus text format by local_server's GET /metrics. Under Lambda every
+request is also printed as one structured log line (CloudWatch Embedded
+Metric Format), so the same data is available without a scraper.
+
+Recording is a dict lookup plus a bisect under a lock per metric.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds: validation is sub-millisecond, builds take seconds
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# Structured log lines are on by default only under Lambda
+LOG_METRICS = os.environ.get(
+    'METRICS_LOG', '1' if os.environ.get('AWS_LAMBDA_FUNCTION_NAME') else '0'
+) == '1'
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'GoGuru')
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = '') -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                    bucket_labels = _format_labels(self.label_names, labels, 'le="%s"' % le)
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                label_str = _format_labels(self.label_names, labels)
+                lines.append(f"{self.name}_sum{label_str} {total:.6f}")
+                lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+REQUESTS = Counter(
+    'goguru_requests_total', 'Requests by route and outcome', ('route', 'outcome')
+)
+CACHE_LOOKUPS = Counter(
+    'goguru_cache_total', 'Cache lookups by cache and result', ('cache', 'result')
+)
+COALESCED = Counter(
+    'goguru_coalesced_total', 'Requests that reused an identical compile or run in flight', ('stage',)
+)
+REQUEST_SECONDS = Histogram(
+    'goguru_request_seconds', 'End-to-end request latency', ('route', 'outcome')
+)
+PHASE_SECONDS = Histogram(
+    'goguru_phase_seconds', 'Latency of each execution phase', ('phase', 'outcome')
+)
+
+_ALL = [REQUESTS, CACHE_LOOKUPS, COALESCED, REQUEST_SECONDS, PHASE_SECONDS]
+
+
+def millis_key(phase: str) -> str:
+    """"validate_output" -> "validateOutputMs" (JSON field / log field name)"""
+    head, *rest = phase.split('_')
+    return head + ''.join(part.capitalize() for part in rest) + 'Ms'
+
+
+def register(metric) -> None:
+    """Add a metric defined elsewhere to the /metrics output"""
+    _ALL.append(metric)
+
+
+def record_request(route: str, outcome: str, phases: Dict[str, float],
+                   total: float, cache: Optional[str] = None) -> None:
+    """
+    Record one request
+
+    Args:
+        route: e.g. "execute", "tests"
+        outcome: validation_reject | compile_error | timeout | wrong_output | correct | ...
+        phases: phase name -> seconds (validate, compile, run, validate_output...)
+        total: end-to-end seconds
+        cache: hit | miss | shared | bypass | precomputed for the result cache, if consulted
+    """
+    REQUESTS.inc(route, outcome)
+    REQUEST_SECONDS.observe(total, route, outcome)
+    for phase, seconds in phases.items():
+        PHASE_SECONDS.observe(seconds, phase, outcome)
+    if cache:
+        CACHE_LOOKUPS.inc('result', cache)
+
+    if LOG_METRICS:
+        _log_line(route, outcome, phases, total, cache)
+
+
+def _log_line(route: str, outcome: str, phases: Dict[str, float],
+              total: float, cache: Optional[str]) -> None:
+    """One JSON log line per request in CloudWatch Embedded Metric Format"""
+    values = {millis_key(phase): round(seconds * 1000, 3) for phase, seconds in phases.items()}
+    values['totalMs'] = round(total * 1000, 3)
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['route', 'outcome']],
+                'Metrics': [{'Name': name, 'Unit': 'Milliseconds'} for name in values],
+            }],
+        },
+        'type': 'execution',
+        'route': route,
+        'outcome': outcome,
+        'cache': cache,
+        **values,
+    }))
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in _ALL:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
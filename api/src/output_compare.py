@@ -0,0 +1,205 @@
+"""
+Comparison of program output with `expectedOutput`
+
+Modes (request field `compareMode`; a "/pattern/" expected output is always
+a regex):
+- exact: whole output, surrounding whitespace ignored (default)
+- lines: line by line, trailing spaces and leading/trailing blank lines ignored
+- whitespace: same words in the same order, any spacing
+- numeric: like whitespace, but numbers match within `tolerance`
+  (absolute, or relative to the expected value when that is larger)
+
+StreamComparator checks stdout while the program runs: once the output can
+no longer match (an exact prefix diverges, a complete line/word differs,
+or there is more output than expected) feed() returns False so the process
+is stopped and its slot freed, instead of running to the end or the timeout.
+"""
+
+import codecs
+import functools
+import math
+import re
+from typing import List, Optional, Pattern, Tuple
+
+COMPARE_MODES = ('exact', 'lines', 'whitespace', 'numeric')
+DEFAULT_TOLERANCE = 1e-6
+
+_NUMBER_RE = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+
+@functools.lru_cache(maxsize=256)
+def compile_pattern(pattern: str) -> Pattern:
+    """re.compile, cached across requests (raises re.error)"""
+    return re.compile(pattern)
+
+
+def is_regex(expected_output: str) -> bool:
+    expected = expected_output.strip()
+    return len(expected) >= 2 and expected.startswith('/') and expected.endswith('/')
+
+
+def _lines(text: str) -> List[str]:
+    """Lines without trailing spaces, leading and trailing blank lines dropped"""
+    lines = [line.rstrip() for line in text.split('\n')]
+    start = next((i for i, line in enumerate(lines) if line), len(lines))
+    end = len(lines)
+    while end > start and not lines[end - 1]:
+        end -= 1
+    return lines[start:end]
+
+
+def _parse_number(token: str) -> Optional[float]:
+    if not _NUMBER_RE.fullmatch(token):
+        return None
+    return float(token)
+
+
+def _tokens_match(actual: str, expected: str, tolerance: float) -> bool:
+    if actual == expected:
+        return True
+    if tolerance < 0:  # words only
+        return False
+    a, e = _parse_number(actual), _parse_number(expected)
+    if a is None or e is None:
+        return False
+    return math.isclose(a, e, rel_tol=tolerance, abs_tol=tolerance)
+
+
+def compare(actual_output: str, expected_output: str, mode: str = 'exact',
+            tolerance: float = DEFAULT_TOLERANCE) -> Tuple[bool, str]:
+    """
+    Returns:
+        Tuple of (is_match, message)
+    """
+    # Clean outputs (strip trailing newlines and spaces)
+    actual = actual_output.strip()
+    expected = expected_output.strip()
+
+    # Check if expected is a regex pattern (enclosed in /)
+    if is_regex(expected):
+        pattern = expected[1:-1]  # Remove slashes
+        try:
+            if compile_pattern(pattern).search(actual):
+                return True, "¡Correcto! El output coincide con el patrón esperado."
+            else:
+                return False, f"El output no coincide. Se esperaba un patrón como: {pattern}"
+        except re.error as e:
+            return False, f"Error en el patrón regex: {str(e)}"
+
+    if mode == 'lines':
+        actual_lines, expected_lines = _lines(actual_output), _lines(expected_output)
+        for number, (a, e) in enumerate(zip(actual_lines, expected_lines), 1):
+            if a != e:
+                return False, f"El output no coincide en la línea {number}.\nEsperado: {e}\nRecibido: {a}"
+        if len(actual_lines) != len(expected_lines):
+            return False, (f"El output no coincide: se esperaban {len(expected_lines)} líneas "
+                           f"y se recibieron {len(actual_lines)}.")
+        return True, "¡Perfecto! El output coincide línea por línea."
+
+    if mode in ('whitespace', 'numeric'):
+        token_tolerance = tolerance if mode == 'numeric' else -1.0
+        actual_tokens, expected_tokens = actual.split(), expected.split()
+        matches = len(actual_tokens) == len(expected_tokens) and all(
+            _tokens_match(a, e, token_tolerance) for a, e in zip(actual_tokens, expected_tokens)
+        )
+        if matches:
+            if mode == 'numeric':
+                return True, f"¡Perfecto! El output coincide (tolerancia numérica {tolerance:g})."
+            return True, "¡Perfecto! El output coincide (ignorando espacios)."
+        return False, f"El output no coincide.\nEsperado: {expected}\nRecibido: {actual}"
+
+    # Exact match
+    if actual == expected:
+        return True, "¡Perfecto! El output es exactamente el esperado."
+    else:
+        return False, f"El output no coincide.\nEsperado: {expected}\nRecibido: {actual}"
+
+
+class StreamComparator:
+    """
+    Incremental check of stdout against the expected output
+
+    feed() returns False (and sets `diverged`) as soon as the output can no
+    longer match; compare() remains the final verdict.
+    """
+
+    def __init__(self, expected_output: str, mode: str = 'exact', tolerance: float = DEFAULT_TOLERANCE):
+        self.mode = mode
+        self.tolerance = tolerance
+        self.diverged = False
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._pending = ''     # lines/words: incomplete last line or word
+        self._started = False  # exact/lines: first non-blank text seen
+        self._index = 0        # exact: characters checked; lines/words: lines/words checked
+        if is_regex(expected_output):
+            # A later line may still match: only the final compare() can tell
+            self.mode = None
+        elif mode == 'lines':
+            self._expected: List[str] = _lines(expected_output)
+        elif mode in ('whitespace', 'numeric'):
+            self._expected = expected_output.split()
+        else:
+            self._expected_text = expected_output.strip()
+
+    def feed(self, chunk: bytes) -> bool:
+        """False once the output cannot match anymore"""
+        if self.diverged or self.mode is None:
+            return not self.diverged
+        text = self._decoder.decode(chunk)
+        if self.mode == 'lines':
+            ok = self._feed_lines(text)
+        elif self.mode in ('whitespace', 'numeric'):
+            ok = self._feed_words(text)
+        else:
+            ok = self._feed_exact(text)
+        self.diverged = not ok
+        return ok
+
+    def _feed_exact(self, text: str) -> bool:
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return True
+            self._started = True
+        expected = self._expected_text
+        offset = self._index
+        self._index += len(text)
+        # The output must stay a prefix of expected, then only whitespace may follow
+        head = text[:max(0, len(expected) - offset)]
+        if head != expected[offset:offset + len(head)]:
+            return False
+        return not text[len(head):].strip()
+
+    def _feed_lines(self, text: str) -> bool:
+        *complete, self._pending = (self._pending + text).split('\n')
+        for line in complete:
+            line = line.rstrip()
+            if not self._started:
+                if not line:
+                    continue
+                self._started = True
+            if self._index < len(self._expected):
+                if line != self._expected[self._index]:
+                    return False
+            elif line:
+                return False
+            self._index += 1
+        return True
+
+    def _feed_words(self, text: str) -> bool:
+        text = self._pending + text
+        words = text.split()
+        # The last word may continue in the next chunk
+        self._pending = words.pop() if words and not text[-1].isspace() else ''
+        token_tolerance = self.tolerance if self.mode == 'numeric' else -1.0
+        for word in words:
+            if self._index >= len(self._expected):
+                return False
+            if not _tokens_match(word, self._expected[self._index], token_tolerance):
+                return False
+            self._index += 1
+        # More words than expected, or a partial word already longer than its counterpart
+        if self._pending and self.mode == 'whitespace':
+            if self._index >= len(self._expected) or not self._expected[self._index].startswith(self._pending):
+                return False
+        return True
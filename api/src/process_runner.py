@@ -0,0 +1,155 @@
+"""
+Run a child process while reading its output incrementally as bytes
+
+The output is never buffered beyond the configured limit: as soon as a
+stream exceeds it (or the timeout expires) the whole process group is
+killed. Optional callbacks receive stdout/stderr chunks as they are produced.
+
+The child is started by launcher (no preexec_fn) in its own process group
+with hard resource limits, and reaped with wait4, so its CPU time and peak
+RSS are reported back, along with how long the launch took.
+"""
+
+import os
+import resource
+import selectors
+import time
+from typing import Callable, Dict, NamedTuple, Optional, Sequence
+
+import launcher
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Friendly names for the limits, used in reports
+LIMIT_NAMES = {
+    resource.RLIMIT_CPU: 'cpuSeconds',
+    resource.RLIMIT_AS: 'addressSpaceBytes',
+    resource.RLIMIT_FSIZE: 'fileSizeBytes',
+    resource.RLIMIT_NPROC: 'processes',
+}
+
+
+class ProcessResult(NamedTuple):
+    returncode: int
+    stdout: str
+    stderr: str
+    timed_out: bool
+    output_exceeded: bool
+    duration: float
+    user_time: float = 0.0  # seconds of user CPU (process and its waited-for children)
+    sys_time: float = 0.0
+    # Peak RSS over the process' life, pre-exec launcher memory included:
+    # a floor of ~10 MB (forkserver) below which small programs are not told apart
+    max_rss_kb: int = 0
+    cancelled: bool = False  # stopped because on_stdout returned False
+    spawn_time: float = 0.0  # launch request until the program was exec'd
+
+    def usage(self) -> Dict[str, float]:
+        """Resource usage summary for API responses"""
+        return {
+            'wallMs': round(self.duration * 1000, 1),
+            'userCpuMs': round(self.user_time * 1000, 1),
+            'sysCpuMs': round(self.sys_time * 1000, 1),
+            'maxRssKb': self.max_rss_kb,
+            'spawnMs': round(self.spawn_time * 1000, 2),
+        }
+
+
+def run_process(argv: Sequence[str], cwd: str, timeout: float, max_output: int,
+                env: Optional[Dict[str, str]] = None,
+                on_stdout: Optional[Callable[[bytes], Optional[bool]]] = None,
+                limits: Optional[Dict[int, int]] = None,
+                on_stderr: Optional[Callable[[bytes], None]] = None,
+                confine: bool = False) -> ProcessResult:
+    """
+    Run `argv` and capture at most `max_output` bytes of stdout and of stderr
+
+    Args:
+        on_stdout: called with each stdout chunk; returning False stops the
+            process (e.g. the client went away)
+        on_stderr: called with each captured stderr chunk (e.g. to timestamp
+            `go build -x` lines)
+        limits: resource.RLIMIT_* -> value, applied as hard limits in the child
+        confine: user programs; they may only write under `cwd` (sandbox.py)
+
+    Returns:
+        ProcessResult; stdout/stderr are decoded as UTF-8 (invalid bytes replaced)
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    stdout_fd, stdout_w = os.pipe()
+    stderr_fd, stderr_w = os.pipe()
+    try:
+        # Security: own process group (killed as a whole), hard resource limits
+        # and, for user programs, no writes outside their workspace
+        process = launcher.spawn(argv, cwd, env, limits or {}, stdout_w, stderr_w, confine)
+    except BaseException:
+        os.close(stdout_fd)
+        os.close(stderr_fd)
+        raise
+    finally:
+        # The child has its own copies
+        os.close(stdout_w)
+        os.close(stderr_w)
+
+    buffers = {stdout_fd: bytearray(), stderr_fd: bytearray()}
+    timed_out = False
+    output_exceeded = False
+    stopped = False
+
+    with selectors.DefaultSelector() as selector:
+        for fd in buffers:
+            selector.register(fd, selectors.EVENT_READ)
+
+        while selector.get_map() and not (output_exceeded or stopped):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+
+            for key, _ in selector.select(remaining):
+                chunk = os.read(key.fd, READ_CHUNK_SIZE)
+                if not chunk:
+                    selector.unregister(key.fd)
+                    continue
+
+                buffer = buffers[key.fd]
+                room = max_output - len(buffer)
+                buffer += chunk[:room]
+                if key.fd == stdout_fd and on_stdout is not None and room > 0:
+                    if on_stdout(chunk[:room]) is False:
+                        stopped = True
+                        break
+                if key.fd == stderr_fd and on_stderr is not None and room > 0:
+                    on_stderr(chunk[:room])
+                if len(chunk) > room:
+                    output_exceeded = True
+                    break
+
+    try:
+        reaped = None
+        if not (timed_out or output_exceeded or stopped):
+            reaped = process.wait(max(0.0, deadline - time.monotonic()))
+            # Output closed but the process keeps running
+            timed_out = reaped is None
+        if reaped is None:
+            process.kill()
+            reaped = process.wait(None)
+        returncode, rusage = reaped
+    finally:
+        os.close(stdout_fd)
+        os.close(stderr_fd)
+
+    return ProcessResult(
+        returncode=returncode,
+        stdout=buffers[stdout_fd].decode('utf-8', errors='replace'),
+        stderr=buffers[stderr_fd].decode('utf-8', errors='replace'),
+        timed_out=timed_out,
+        output_exceeded=output_exceeded,
+        duration=time.monotonic() - started,
+        user_time=rusage.ru_utime,
+        sys_time=rusage.ru_stime,
+        max_rss_kb=rusage.ru_maxrss,
+        cancelled=stopped,
+        spawn_time=process.spawn_time,
+    )
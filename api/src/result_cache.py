@@ -0,0 +1,308 @@
+"""
+Content-addressed cache of /execute results
+
+Two tiers:
+- In-process LRU with TTL (fast path for warm containers)
+- SQLite file on disk that survives warm Lambda reuse and local_server restarts
+
+Only programs whose output is deterministic are cached; anything depending on
+time, randomness or goroutine scheduling bypasses the cache.
+
+In front of both, PRECOMPUTED holds the curriculum's samples, run ahead of
+time by curriculum.py and loaded at startup from CURRICULUM_INDEX.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import build_cache
+import go_scanner
+
+# Bump to invalidate every cached result (e.g. when the response format changes)
+# 2: map/select detection made conservative; drops results frozen from a random order
+CACHE_VERSION = 2
+
+RESULT_CACHE_TTL = int(os.environ.get('RESULT_CACHE_TTL', '3600'))  # seconds (memory tier)
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', '1024'))
+# Empty string disables the disk tier
+RESULT_CACHE_DB = os.environ.get('RESULT_CACHE_DB', '/tmp/go-guru-results.sqlite3')
+RESULT_CACHE_DB_TTL = int(os.environ.get('RESULT_CACHE_DB_TTL', '86400'))  # seconds (disk tier)
+RESULT_CACHE_DB_MAX_ROWS = int(os.environ.get('RESULT_CACHE_DB_MAX_ROWS', '20000'))
+# Results of the curriculum samples, written by curriculum.py (empty string disables it)
+CURRICULUM_INDEX = os.environ.get(
+    'CURRICULUM_INDEX', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'curriculum_index.json.gz')
+)
+
+# Imports whose behaviour changes between runs
+NONDETERMINISTIC_IMPORTS = [
+    'time',           # time.Now, time.Since, timers
+    'math/rand',      # Random numbers (also math/rand/v2)
+    'crypto/rand',
+    'hash/maphash',   # Random seed per process
+    'runtime',        # NumGoroutine, Gosched, GC stats...
+    'os',             # Environment, pid, hostname
+    'sync/atomic',    # Only useful with goroutines
+]
+
+# Packages that hand out maps (url.Values, reflect.MapKeys, maps.Keys...):
+# ranging over their results iterates in random order without `map[` in the code
+MAP_PRODUCING_IMPORTS = ['maps', 'reflect', 'net/url', 'net/textproto', 'mime', 'expvar', 'go/ast']
+
+_IMPORT_BLOCK_RE = re.compile(r'\bimport\s*\(([^)]*)\)', re.S)
+_IMPORT_LINE_RE = re.compile(r'\bimport\s+(?:[\w.]+\s+)?"([^"]+)"')
+_QUOTED_RE = re.compile(r'"([^"]+)"')
+# `go f()`, `go func() {...}()`, `go obj.Method()`
+_GO_STMT_RE = re.compile(r'(?:^|[;{}\n])\s*go\s+(?:func\b|[\w.]+\s*[(\[])', re.M)
+# On literal-stripped code: any map type, any range, any select
+_MAP_TYPE_RE = re.compile(r'\bmap\s*\[')
+_RANGE_RE = re.compile(r'\brange\b')
+_SELECT_RE = re.compile(r'\bselect\s*\{')
+
+
+def normalize_code(code: str) -> str:
+    """
+    Normalize source so formatting-only differences share a cache entry:
+    unify newlines, drop trailing whitespace and surrounding blank lines.
+    """
+    lines = code.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip('\n')
+
+
+def code_hash(code: str) -> str:
+    """SHA-256 of the normalized source"""
+    return hashlib.sha256(normalize_code(code).encode('utf-8')).hexdigest()
+
+
+def cache_key(code: str, expected_output: str, comparison: str = 'exact') -> str:
+    """Key for a result: normalized code + expected output (+ how it is compared) + engine version"""
+    parts = [
+        CACHE_VERSION,
+        build_cache.go_version(),
+        normalize_code(code),
+        (expected_output or '').strip(),
+    ]
+    if comparison != 'exact':
+        # Exact keys stay as they were, so existing entries remain valid
+        parts.append(comparison)
+    material = json.dumps(parts)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def check_key(code: str) -> str:
+    """Key for /check diagnostics: the exact source (positions depend on it) + engine version"""
+    material = json.dumps([CACHE_VERSION, 'check', build_cache.go_version(), code])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def _imports(code: str) -> set:
+    found = set(_IMPORT_LINE_RE.findall(code))
+    for block in _IMPORT_BLOCK_RE.findall(code):
+        found.update(_QUOTED_RE.findall(block))
+    return found
+
+
+def is_deterministic(code: str) -> Tuple[bool, str]:
+    """
+    Conservative check for programs whose output may change between runs
+
+    Returns:
+        Tuple of (is_deterministic, reason)
+    """
+    for pkg in _imports(code):
+        for nondeterministic in NONDETERMINISTIC_IMPORTS:
+            if pkg == nondeterministic or pkg.startswith(nondeterministic + '/'):
+                return False, f"import {pkg}"
+
+    if _GO_STMT_RE.search(code):
+        return False, "goroutines"
+
+    # Without types, which value a `range` walks is unknown (a parameter, a
+    # field, a call result, a literal): any map in the program is enough
+    stripped, _, _ = go_scanner.strip_literals(code)
+    if _RANGE_RE.search(stripped):
+        if _MAP_TYPE_RE.search(stripped):
+            return False, "range con maps en el programa"
+        for pkg in _imports(code):
+            if pkg in MAP_PRODUCING_IMPORTS:
+                return False, f"range con import {pkg}"
+
+    # With several ready cases, select picks one at random
+    if _SELECT_RE.search(stripped):
+        return False, "select"
+
+    return True, ""
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU with per-entry TTL"""
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES, ttl: int = RESULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SqliteStore:
+    """Disk tier: JSON values in a single SQLite table, pruned by last access"""
+
+    def __init__(self, path: str = RESULT_CACHE_DB, ttl: int = RESULT_CACHE_DB_TTL,
+                 max_rows: int = RESULT_CACHE_DB_MAX_ROWS):
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'created REAL NOT NULL, accessed REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT value FROM results WHERE key = ? AND created > ?',
+                (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE results SET accessed = ? WHERE key = ?', (now, key))
+            conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO results (key, value, created, accessed) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), now, now)
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._prune(conn, now)
+            conn.commit()
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute('DELETE FROM results WHERE created <= ?', (now - self.ttl,))
+        conn.execute(
+            'DELETE FROM results WHERE key IN ('
+            'SELECT key FROM results ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+            (self.max_rows,)
+        )
+
+
+class ResultCache:
+    """Memory tier in front of the optional disk tier"""
+
+    def __init__(self, memory: Optional[LRUCache] = None, disk: Optional[SqliteStore] = None):
+        self.memory = memory or LRUCache()
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        if self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except sqlite3.Error as e:
+                print(f"[WARN] Result cache (disco) no disponible: {str(e)}")
+                return None
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error as e:
+                print(f"[WARN] Result cache (disco) no disponible: {str(e)}")
+
+
+RESULT_CACHE = ResultCache(disk=SqliteStore() if RESULT_CACHE_DB else None)
+
+
+class PrecomputedResults:
+    """Read-only results keyed by cache_key, loaded once from a curriculum index"""
+
+    def __init__(self, results: Optional[Dict[str, Dict[str, Any]]] = None, go_version: str = ''):
+        self.results = results or {}
+        self.go_version = go_version
+
+    @classmethod
+    def load(cls, path: str = CURRICULUM_INDEX) -> 'PrecomputedResults':
+        if not path or not os.path.exists(path):
+            return cls()
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Índice del currículo no disponible: {str(e)}")
+            return cls()
+        if index.get('cacheVersion') != CACHE_VERSION:
+            print(f"[WARN] Índice del currículo ignorado: cacheVersion {index.get('cacheVersion')} != {CACHE_VERSION}")
+            return cls()
+        precomputed = cls(index.get('results', {}), index.get('goVersion', ''))
+        if precomputed.results and precomputed.go_version != build_cache.go_version():
+            # Keys include the Go version: none of them can match
+            print(f"[WARN] Índice del currículo generado con {precomputed.go_version}, "
+                  f"el toolchain es {build_cache.go_version()}: regenéralo con curriculum.py")
+        return precomputed
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.results.get(key)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'entries': len(self.results), 'goVersion': self.go_version}
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+
+PRECOMPUTED = PrecomputedResults.load()
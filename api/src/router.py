@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+Cache-affinity router in front of several local_server.py nodes
+
+Each node keeps its own result cache, binary cache and warm build cache, so
+sending the same program to the same node is what makes them pay off. Code
+routes (/execute, /execute/tests, /check) are placed by consistent hashing
+on the normalized code hash (result_cache.code_hash). Identical
+submissions land on the node that already has their result or binary.
+Everything else (/generate, CORS preflight...) goes to the least loaded node.
+
+- Ring: every node owns ROUTER_VNODES points on a hash ring. A key belongs to
+  the first point after it. When a node joins or leaves, only the keys
+  between its points and their predecessors move (about 1/N of them). A node
+  that fails its health checks is skipped, not removed: its keys go to the
+  next node on the ring and come back when it recovers.
+- Spill: a request goes to the next node on the ring when the owner is
+  saturated. That is the case when it already has slots × (1 + ROUTER_SPILL_QUEUE)
+  requests from this router, or when it answers 503 (its queue is full).
+- Health: GET /health of every node every ROUTER_HEALTH_INTERVAL seconds.
+  A node that is down, or still warming its build cache, gets no traffic.
+
+Ejecuta:
+    python3 router.py --nodes http://localhost:3001,http://localhost:3002
+    python3 router.py --spawn 3            # starts 3 local_server.py on ports 3001-3003
+"""
+
+import argparse
+import atexit
+import bisect
+import hashlib
+import http.client
+import itertools
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import binary_cache
+import flight_recorder
+import metrics
+import result_cache
+
+# Comma-separated node base URLs (overridden by --nodes)
+ROUTER_NODES = os.environ.get('ROUTER_NODES', '')
+ROUTER_VNODES = int(os.environ.get('ROUTER_VNODES', '160'))  # ring points per node
+# hash (cache affinity) | round_robin (for comparison)
+ROUTER_STRATEGY = os.environ.get('ROUTER_STRATEGY', 'hash')
+# Requests per slot a node may have waiting before new ones spill to the next node
+ROUTER_SPILL_QUEUE = float(os.environ.get('ROUTER_SPILL_QUEUE', '1'))
+ROUTER_HEALTH_INTERVAL = float(os.environ.get('ROUTER_HEALTH_INTERVAL', '2'))  # seconds
+ROUTER_HEALTH_FAILURES = int(os.environ.get('ROUTER_HEALTH_FAILURES', '2'))  # failed checks before a node is down
+HEALTH_TIMEOUT = 2.0
+PROXY_TIMEOUT = float(os.environ.get('ROUTER_PROXY_TIMEOUT', '120'))  # seconds per upstream request
+
+# Routes placed by code hash
+HASHED_ROUTES = ('/execute', '/execute/tests', '/check', '/compile/wasm')
+# Not forwarded in either direction
+HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-connection', 'te', 'trailer', 'transfer-encoding',
+    'upgrade', 'host', 'content-length', 'server', 'date',
+}
+READ_CHUNK_SIZE = 64 * 1024
+
+ROUTED = metrics.Counter(
+    'goguru_router_requests_total', 'Requests forwarded by node and placement', ('node', 'placement')
+)
+SPILLED = metrics.Counter(
+    'goguru_router_spills_total', 'Requests not sent to (or refused by) their owner node', ('node', 'reason')
+)
+UPSTREAM_SECONDS = metrics.Histogram(
+    'goguru_router_upstream_seconds', 'Time from forwarding a request until its response ended', ('node',)
+)
+for _metric in (ROUTED, SPILLED, UPSTREAM_SECONDS):
+    metrics.register(_metric)
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.sha256(value.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes"""
+
+    def __init__(self, vnodes: int = ROUTER_VNODES):
+        self.vnodes = max(1, vnodes)
+        self.nodes: List[str] = []
+        self._points: List[int] = []
+        self._owners: List[str] = []
+
+    def set_nodes(self, nodes: Iterable[str]) -> None:
+        self.nodes = sorted(set(nodes))
+        # Points depend only on the node's name: every router instance builds the same ring
+        points = sorted((_ring_hash(f'{node}#{i}'), node) for node in self.nodes for i in range(self.vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def preference(self, key: str) -> List[str]:
+        """Every node once, in ring order from the key: the owner, then where it spills"""
+        order: List[str] = []
+        if not self._points:
+            return order
+        start = bisect.bisect(self._points, _ring_hash(key))
+        for i in range(len(self._owners)):
+            node = self._owners[(start + i) % len(self._owners)]
+            if node not in order:
+                order.append(node)
+                if len(order) == len(self.nodes):
+                    break
+        return order
+
+    def owner(self, key: str) -> Optional[str]:
+        order = self.preference(key)
+        return order[0] if order else None
+
+
+class Node:
+    """One local_server.py behind the router"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        parsed = urllib.parse.urlsplit(self.url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 80
+        # Unknown until the first health check
+        self.up = False
+        self.ready = False
+        self.failures = 0
+        self.last_error = ''
+        self.inflight = 0  # requests this router has sent and not finished
+        self.slots = 1  # from the node's /health
+        self.waiting = 0
+        self.requests = 0
+
+    @property
+    def available(self) -> bool:
+        return self.up and self.ready
+
+    def capacity(self) -> int:
+        return max(1, int(self.slots * (1 + ROUTER_SPILL_QUEUE)))
+
+    def saturated(self) -> bool:
+        return self.inflight >= self.capacity()
+
+    def load(self) -> float:
+        return self.inflight / self.slots
+
+    def snapshot(self) -> dict:
+        return {
+            'url': self.url,
+            'up': self.up,
+            'ready': self.ready,
+            'inflight': self.inflight,
+            'capacity': self.capacity(),
+            'slots': self.slots,
+            'waiting': self.waiting,
+            'requests': self.requests,
+            'lastError': self.last_error or None,
+        }
+
+
+class Router:
+    """Node set, ring and per-node load; picks where each request goes"""
+
+    def __init__(self, urls: Iterable[str], vnodes: int = ROUTER_VNODES, strategy: str = ROUTER_STRATEGY):
+        self.strategy = strategy
+        self.ring = HashRing(vnodes)
+        self.nodes: Dict[str, Node] = {}
+        self._lock = threading.Lock()
+        self._round_robin = itertools.count()
+        self.set_nodes(urls)
+
+    def set_nodes(self, urls: Iterable[str]) -> List[str]:
+        """Replace the node set; nodes that stay keep their state (and their keys)"""
+        wanted = [url.strip().rstrip('/') for url in urls if url.strip()]
+        with self._lock:
+            self.nodes = {url: self.nodes.get(url) or Node(url) for url in wanted}
+            self.ring.set_nodes(self.nodes)
+            return list(self.nodes)
+
+    def change_nodes(self, add: Iterable[str] = (), remove: Iterable[str] = ()) -> List[str]:
+        removed = {url.rstrip('/') for url in remove}
+        with self._lock:
+            current = [url for url in self.nodes if url not in removed]
+        return self.set_nodes(current + [url for url in add if url.rstrip('/') not in current])
+
+    def candidates(self, key: Optional[str]) -> List[Tuple[Node, str]]:
+        """
+        Nodes to try, in order, with how each was chosen
+
+        Returns:
+            List of (node, placement): `owner` for the key's node on the ring,
+            `spill` for the ones after it, `least_loaded` / `round_robin` otherwise
+        """
+        with self._lock:
+            nodes = list(self.nodes.values())
+            if key is not None and self.strategy == 'hash':
+                preference = self.ring.preference(key)
+                owner = preference[0] if preference else None
+                ordered = [(self.nodes[url], 'owner' if url == owner else 'spill') for url in preference]
+            elif self.strategy == 'round_robin':
+                shift = next(self._round_robin) % max(1, len(nodes))
+                ordered = [(node, 'round_robin') for node in nodes[shift:] + nodes[:shift]]
+            else:
+                ordered = [(node, 'least_loaded') for node in sorted(nodes, key=lambda n: n.load())]
+
+            available = [c for c in ordered if c[0].available]
+            if not available:
+                # Nothing known to be healthy (e.g. right after start): try them all
+                return ordered
+            # Saturated nodes are still tried, after the others (least loaded first)
+            free = [c for c in available if not c[0].saturated()]
+            full = sorted((c for c in available if c[0].saturated()), key=lambda c: c[0].load())
+            return free + full
+
+    @contextmanager
+    def track(self, node: Node) -> Iterator[None]:
+        with self._lock:
+            node.inflight += 1
+            node.requests += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                node.inflight -= 1
+
+    def mark_down(self, node: Node, reason: str, immediately: bool = False) -> None:
+        with self._lock:
+            node.failures += 1
+            node.last_error = reason
+            was_up = node.up
+            if immediately or node.failures >= ROUTER_HEALTH_FAILURES:
+                node.up = False
+        if was_up and not node.up:
+            print(f"[router] {node.url} fuera de servicio: {reason}")
+
+    def check_health(self) -> None:
+        """GET /health of every node; updates availability and reported capacity"""
+        for node in list(self.nodes.values()):
+            conn = http.client.HTTPConnection(node.host, node.port, timeout=HEALTH_TIMEOUT)
+            try:
+                conn.request('GET', '/health')
+                response = conn.getresponse()
+                body = json.loads(response.read().decode('utf-8'))
+            except (OSError, ValueError, http.client.HTTPException) as e:
+                self.mark_down(node, str(e) or type(e).__name__)
+                continue
+            finally:
+                conn.close()
+
+            queue = body.get('queue') or {}
+            with self._lock:
+                was_available = node.available
+                node.up = True
+                node.failures = 0
+                node.last_error = ''
+                node.ready = bool(body.get('ready'))
+                node.slots = max(1, int(queue.get('slots') or node.slots))
+                node.waiting = int(queue.get('waiting') or 0)
+            if node.available and not was_available:
+                print(f"[router] {node.url} disponible ({node.slots} slots)")
+
+    def run_health_checks(self, interval: float = ROUTER_HEALTH_INTERVAL) -> threading.Thread:
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.check_health()
+                except Exception as e:  # the checker must never stop
+                    print(f"[router] error en el health check: {e}")
+
+        thread = threading.Thread(target=loop, name='router-health', daemon=True)
+        thread.start()
+        return thread
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            nodes = [node.snapshot() for node in self.nodes.values()]
+        return {
+            'ready': any(n['up'] and n['ready'] for n in nodes),
+            'strategy': self.strategy,
+            'vnodes': self.ring.vnodes,
+            'nodes': nodes,
+        }
+
+
+def routing_key(path: str, body: bytes) -> Optional[str]:
+    """Normalized code hash for code routes, None for everything else"""
+    if path not in HASHED_ROUTES:
+        return None
+    try:
+        data = json.loads(body.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    code = data.get('code') if isinstance(data, dict) else None
+    return result_cache.code_hash(code) if isinstance(code, str) else None
+
+
+ROUTER = Router(ROUTER_NODES.split(','))
+
+
+class RouterRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/health':
+            snapshot = ROUTER.snapshot()
+            self._send_json(200 if snapshot['ready'] else 503, snapshot)
+        elif self.path == '/metrics':
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._forward(None)
+
+    def do_OPTIONS(self):
+        self._forward(None)
+
+    def do_POST(self):
+        content_length = int(self.headers['Content-Length'] or 0)
+        body = self.rfile.read(content_length)
+        if self.path == '/router/nodes':
+            self._change_nodes(body)
+            return
+        self._forward(body, routing_key(self.path, body))
+
+    def _change_nodes(self, body: bytes):
+        """
+        Add or remove nodes at runtime: {"add": [url...], "remove": [url...]}
+        or {"nodes": [url...]}. Only from this machine.
+        """
+        if self.client_address[0] not in ('127.0.0.1', '::1'):
+            self._send_json(403, {'success': False, 'error': 'Solo disponible desde localhost'})
+            return
+        try:
+            change = json.loads(body.decode('utf-8'))
+            if 'nodes' in change:
+                nodes = ROUTER.set_nodes(change['nodes'])
+            else:
+                nodes = ROUTER.change_nodes(change.get('add', []), change.get('remove', []))
+        except (UnicodeDecodeError, ValueError, AttributeError, TypeError) as e:
+            self._send_json(400, {'success': False, 'error': f'Cambio de nodos inválido: {e}'})
+            return
+        print(f"[router] nodos: {', '.join(nodes) or '(ninguno)'}")
+        # New nodes get traffic after their first health check
+        threading.Thread(target=ROUTER.check_health, daemon=True).start()
+        self._send_json(200, {'success': True, 'nodes': nodes})
+
+    def _upstream_headers(self) -> Dict[str, str]:
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_HEADERS}
+        # The node's scheduler tells clients apart by the address appended here (TRUSTED_PROXIES)
+        forwarded = self.headers.get('X-Forwarded-For')
+        headers['X-Forwarded-For'] = f'{forwarded}, {self.client_address[0]}' if forwarded else self.client_address[0]
+        return headers
+
+    def _forward(self, body: Optional[bytes], key: Optional[str] = None):
+        """Send the request to the first node that takes it; relay its response"""
+        candidates = ROUTER.candidates(key)
+        last_error = 'no hay nodos configurados'
+        for attempt, (node, placement) in enumerate(candidates):
+            has_next = attempt + 1 < len(candidates)
+            if placement == 'spill' and attempt == 0:
+                owner = ROUTER.nodes.get(ROUTER.ring.owner(key))
+                if owner is not None:
+                    SPILLED.inc(owner.url, 'saturated' if owner.available else 'down')
+
+            started = time.monotonic()
+            with ROUTER.track(node):
+                conn = http.client.HTTPConnection(node.host, node.port, timeout=PROXY_TIMEOUT)
+                try:
+                    try:
+                        conn.request(self.command, self.path, body=body, headers=self._upstream_headers())
+                        response = conn.getresponse()
+                    except (OSError, http.client.HTTPException) as e:
+                        last_error = f'{node.url}: {e}'
+                        ROUTER.mark_down(node, str(e) or type(e).__name__, immediately=True)
+                        continue
+                    if response.status == 503 and has_next and body is not None:
+                        # Its queue is full: the next node on the ring takes it
+                        SPILLED.inc(node.url, 'busy')
+                        response.read()
+                        continue
+                    if response.status == 404 and has_next and self.path.startswith('/wasm/'):
+                        # Each node has its own module store: it was built on another one
+                        response.read()
+                        continue
+                    ROUTED.inc(node.url, placement)
+                    self._relay(response, node, placement)
+                finally:
+                    conn.close()
+            UPSTREAM_SECONDS.observe(time.monotonic() - started, node.url)
+            return
+
+        self._send_json(502, {'success': False, 'error': f'Ningún nodo disponible ({last_error})'})
+
+    def _relay(self, response: http.client.HTTPResponse, node: Node, placement: str):
+        """Copy status, headers and body as it arrives (SSE streams included)"""
+        self.send_response(response.status)
+        for key, value in response.getheaders():
+            if key.lower() not in HOP_HEADERS:
+                self.send_header(key, value)
+        length = response.getheader('Content-Length')
+        if length is not None:
+            self.send_header('Content-Length', length)
+        else:
+            # Body ends when the connection closes
+            self.close_connection = True
+        self.send_header('X-Routed-To', node.url)
+        self.send_header('X-Route-Placement', placement)
+        self.end_headers()
+        try:
+            while True:
+                chunk = response.read1(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente se fue: cerrar la conexión con el nodo detiene el programa
+            self.close_connection = True
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        print(f"[{self.log_date_time_string()}] [router] {format % args}")
+
+
+def _node_dir(path: str, port: int) -> str:
+    """Per-node copy of a cache path ('' stays disabled)"""
+    return f'{path}-{port}' if path else path
+
+
+def spawn_nodes(count: int, base_port: int) -> List[str]:
+    """
+    Start `count` local_server.py processes on this machine, each with its own
+    result/binary caches and flight recorder (the Go build cache is shared)
+
+    Returns:
+        Their base URLs
+    """
+    server = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'local_server.py')
+    processes = []
+    urls = []
+    for port in range(base_port, base_port + count):
+        env = {
+            **os.environ,
+            'BINARY_CACHE_DIR': _node_dir(binary_cache.BINARY_CACHE_DIR, port),
+            'WASM_CACHE_DIR': _node_dir(binary_cache.WASM_CACHE_DIR, port),
+            'RESULT_CACHE_DB': _node_dir(result_cache.RESULT_CACHE_DB, port),
+            'FLIGHT_RECORDER_DIR': _node_dir(flight_recorder.FLIGHT_RECORDER_DIR, port),
+            'TRUSTED_PROXIES': '127.0.0.1',
+        }
+        processes.append(subprocess.Popen([sys.executable, server, '--port', str(port)], env=env))
+        urls.append(f'http://localhost:{port}')
+
+    def stop():
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    atexit.register(stop)
+    return urls
+
+
+def run_router(port: int):
+    """Inicia el router"""
+    # SIGTERM exits like Ctrl+C, so nodes from --spawn are stopped too (atexit)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    ROUTER.check_health()
+    ROUTER.run_health_checks()
+    httpd = ThreadingHTTPServer(('', port), RouterRequestHandler)
+    httpd.daemon_threads = True
+
+    nodes = '\n'.join(f'   - {url}' for url in ROUTER.nodes) or '   (ninguno)'
+    print(f"""
+🔀 Router en http://localhost:{port} (estrategia: {ROUTER.strategy}, {ROUTER.ring.vnodes} puntos por nodo)
+📦 Nodos:
+{nodes}
+🩺 Estado:   http://localhost:{port}/health
+""")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n\n👋 Router detenido")
+        httpd.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Router con afinidad de caché para varios local_server.py')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', '8080')))
+    parser.add_argument('--nodes', help='URLs de los nodos separadas por comas (default: ROUTER_NODES)')
+    parser.add_argument('--spawn', type=int, default=0, help='iniciar N local_server.py en este equipo')
+    parser.add_argument('--base-port', type=int, default=3001, help='primer puerto de los nodos de --spawn')
+    parser.add_argument('--strategy', choices=('hash', 'round_robin'), default=ROUTER_STRATEGY)
+    args = parser.parse_args()
+
+    urls = args.nodes.split(',') if args.nodes else ROUTER_NODES.split(',')
+    if args.spawn:
+        urls = [u for u in urls if u.strip()] + spawn_nodes(args.spawn, args.base_port)
+    ROUTER.strategy = args.strategy
+    ROUTER.set_nodes(urls)
+    if not ROUTER.nodes:
+        parser.error('indica los nodos con --nodes, ROUTER_NODES o --spawn')
+    run_router(args.port)
@@ -0,0 +1,266 @@
+"""
+Filesystem confinement of user programs (the run step)
+
+User programs run with the server's uid and may import `os`, so unconfined
+they could rewrite anything the server can: the Go build cache, the binary
+and wasm stores, the result DB. Right before exec, the launcher confines
+the child with the best mechanism the kernel has; neither needs privileges:
+
+- landlock (Linux 5.13+): files can only be created, written, renamed or
+  removed under the program's working directory (its own workspace), plus
+  writes to /dev/null. Reading is unaffected.
+- seccomp: a BPF filter refuses with EPERM every syscall that creates,
+  modifies or removes a file by path, and open() for writing. The program
+  keeps its stdout/stderr pipes but cannot create files at all. Used where
+  Landlock is missing (e.g. Lambda's 5.10 kernel).
+
+A launch whose confinement cannot be applied fails instead of running
+unconfined. RUN_SANDBOX=off disables it (e.g. on a non-Linux dev box).
+
+Stdlib only: the forkserver helper imports it, and `python3 sandbox.py
+<writable_dir> <mechanism> <program> [args...]` confines and execs (the
+spawn launch path, which has no hook between fork and exec).
+"""
+
+import ctypes
+import errno
+import os
+import platform
+import sys
+from typing import Optional, Sequence
+
+# auto (landlock, else seccomp) | landlock | seccomp | off
+RUN_SANDBOX = os.environ.get('RUN_SANDBOX', 'auto')
+
+_PR_SET_NO_NEW_PRIVS = 38
+_PR_SET_SECCOMP = 22
+_SECCOMP_MODE_FILTER = 2
+
+# --- landlock -------------------------------------------------------------
+
+_SYS_LANDLOCK_CREATE_RULESET = 444  # same number on x86_64 and aarch64
+_SYS_LANDLOCK_ADD_RULE = 445
+_SYS_LANDLOCK_RESTRICT_SELF = 446
+_LANDLOCK_CREATE_RULESET_VERSION = 1
+_LANDLOCK_RULE_PATH_BENEATH = 1
+
+_ACCESS_FS_WRITE_FILE = 1 << 1
+_ACCESS_FS_REMOVE_DIR = 1 << 4
+_ACCESS_FS_REMOVE_FILE = 1 << 5
+_ACCESS_FS_MAKE_CHAR = 1 << 6
+_ACCESS_FS_MAKE_DIR = 1 << 7
+_ACCESS_FS_MAKE_REG = 1 << 8
+_ACCESS_FS_MAKE_SOCK = 1 << 9
+_ACCESS_FS_MAKE_FIFO = 1 << 10
+_ACCESS_FS_MAKE_BLOCK = 1 << 11
+_ACCESS_FS_MAKE_SYM = 1 << 12
+_ACCESS_FS_REFER = 1 << 13     # ABI 2
+_ACCESS_FS_TRUNCATE = 1 << 14  # ABI 3
+
+# Everything that changes the filesystem; read and execute stay unrestricted
+_WRITE_ACCESS = (
+    _ACCESS_FS_WRITE_FILE | _ACCESS_FS_REMOVE_DIR | _ACCESS_FS_REMOVE_FILE | _ACCESS_FS_MAKE_CHAR
+    | _ACCESS_FS_MAKE_DIR | _ACCESS_FS_MAKE_REG | _ACCESS_FS_MAKE_SOCK | _ACCESS_FS_MAKE_FIFO
+    | _ACCESS_FS_MAKE_BLOCK | _ACCESS_FS_MAKE_SYM
+)
+
+
+class _RulesetAttr(ctypes.Structure):
+    _fields_ = [('handled_access_fs', ctypes.c_uint64)]
+
+
+class _PathBeneathAttr(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [('allowed_access', ctypes.c_uint64), ('parent_fd', ctypes.c_int32)]
+
+
+# --- seccomp --------------------------------------------------------------
+
+class _SockFilter(ctypes.Structure):
+    _fields_ = [('code', ctypes.c_uint16), ('jt', ctypes.c_uint8), ('jf', ctypes.c_uint8), ('k', ctypes.c_uint32)]
+
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [('len', ctypes.c_ushort), ('filter', ctypes.POINTER(_SockFilter))]
+
+
+_BPF_LD_W_ABS = 0x20
+_BPF_JEQ_K = 0x15
+_BPF_JGE_K = 0x35
+_BPF_JSET_K = 0x45
+_BPF_RET_K = 0x06
+_SECCOMP_RET_ALLOW = 0x7fff0000
+_SECCOMP_RET_ERRNO = 0x00050000
+_SECCOMP_RET_KILL_PROCESS = 0x80000000
+# struct seccomp_data offsets (little-endian: the low half of args[i] comes first)
+_DATA_NR = 0
+_DATA_ARCH = 4
+
+
+def _data_arg(index: int) -> int:
+    return 16 + 8 * index
+
+
+_OPEN_WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_TRUNC | os.O_APPEND
+
+# machine -> (AUDIT_ARCH_*, {syscall: flags argument index}, refused syscalls)
+_SECCOMP_ARCHES = {
+    'x86_64': (0xc000003e, {2: 1, 257: 2}, (  # open, openat
+        85, 82, 264, 316,       # creat, rename, renameat, renameat2
+        87, 263, 86, 265,       # unlink, unlinkat, link, linkat
+        88, 266, 83, 258, 84,   # symlink, symlinkat, mkdir, mkdirat, rmdir
+        76, 77, 90, 91, 268,    # truncate, ftruncate, chmod, fchmod, fchmodat
+        92, 93, 94, 260,        # chown, fchown, lchown, fchownat
+        133, 259,               # mknod, mknodat
+        188, 189, 197, 198,     # setxattr, lsetxattr, removexattr, lremovexattr
+        304, 425, 437, 452,     # open_by_handle_at, io_uring_setup, openat2, fchmodat2
+    )),
+    'aarch64': (0xc00000b7, {56: 2}, (  # openat
+        38, 276, 35, 37, 36,    # renameat, renameat2, unlinkat, linkat, symlinkat
+        34, 45, 46, 52, 53,     # mkdirat, truncate, ftruncate, fchmod, fchmodat
+        54, 55, 33,             # fchownat, fchown, mknodat
+        5, 6, 14, 15,           # setxattr, lsetxattr, removexattr, lremovexattr
+        265, 425, 437, 452,     # open_by_handle_at, io_uring_setup, openat2, fchmodat2
+    )),
+}
+
+_libc = None
+_mechanism: Optional[str] = None
+
+
+def _libc_call(name: str, arg_type, *args) -> int:
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(None, use_errno=True)
+        _libc.syscall.restype = ctypes.c_long
+    result = getattr(_libc, name)(*[arg_type(a) if isinstance(a, int) else a for a in args])
+    if result < 0:
+        code = ctypes.get_errno()
+        raise OSError(code, os.strerror(code))
+    return result
+
+
+def _syscall(*args) -> int:
+    return _libc_call('syscall', ctypes.c_long, *args)
+
+
+def _prctl(*args) -> None:
+    _libc_call('prctl', ctypes.c_ulong, *args)
+
+
+def landlock_abi() -> int:
+    """Landlock ABI version of the running kernel, 0 if unavailable"""
+    if platform.system() != 'Linux':
+        return 0
+    try:
+        return _syscall(_SYS_LANDLOCK_CREATE_RULESET, None, 0, _LANDLOCK_CREATE_RULESET_VERSION)
+    except OSError:
+        return 0
+
+
+def mechanism() -> str:
+    """The confinement launches get: landlock, seccomp or off (RUN_SANDBOX, detected once)"""
+    global _mechanism
+    if _mechanism is None:
+        if RUN_SANDBOX == 'auto':
+            if landlock_abi() > 0:
+                _mechanism = 'landlock'
+            elif platform.machine() in _SECCOMP_ARCHES:
+                _mechanism = 'seccomp'
+            else:
+                _mechanism = 'off'
+                print(f"[WARN] Sin Landlock ni seccomp en {platform.machine()}: los programas corren sin confinar")
+        else:
+            _mechanism = RUN_SANDBOX
+    return _mechanism
+
+
+def _landlock(writable: Sequence[str]) -> None:
+    abi = landlock_abi()
+    if abi <= 0:
+        raise OSError(errno.ENOSYS, 'Landlock no disponible')
+    handled = _WRITE_ACCESS
+    if abi >= 2:
+        handled |= _ACCESS_FS_REFER
+    file_access = _ACCESS_FS_WRITE_FILE
+    if abi >= 3:
+        handled |= _ACCESS_FS_TRUNCATE
+        file_access |= _ACCESS_FS_TRUNCATE
+
+    attr = _RulesetAttr(handled)
+    ruleset = _syscall(_SYS_LANDLOCK_CREATE_RULESET, ctypes.byref(attr), ctypes.sizeof(attr), 0)
+    try:
+        rules = [(path, handled) for path in writable] + [(os.devnull, file_access)]
+        for path, allowed in rules:
+            fd = os.open(path, os.O_PATH | os.O_CLOEXEC)
+            try:
+                rule = _PathBeneathAttr(allowed, fd)
+                _syscall(_SYS_LANDLOCK_ADD_RULE, ruleset, _LANDLOCK_RULE_PATH_BENEATH, ctypes.byref(rule), 0)
+            finally:
+                os.close(fd)
+        _prctl(_PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0)
+        _syscall(_SYS_LANDLOCK_RESTRICT_SELF, ruleset, 0)
+    finally:
+        os.close(ruleset)
+
+
+def _seccomp_program() -> list:
+    arch, flag_checked, refused = _SECCOMP_ARCHES[platform.machine()]
+    deny = _SECCOMP_RET_ERRNO | errno.EPERM
+    program = [
+        (_BPF_LD_W_ABS, 0, 0, _DATA_ARCH),
+        (_BPF_JEQ_K, 1, 0, arch),
+        (_BPF_RET_K, 0, 0, _SECCOMP_RET_KILL_PROCESS),
+        (_BPF_LD_W_ABS, 0, 0, _DATA_NR),
+        # x32 syscalls (bit 30) would bypass the x86_64 numbers below
+        (_BPF_JGE_K, 0, 1, 0x40000000),
+        (_BPF_RET_K, 0, 0, _SECCOMP_RET_KILL_PROCESS),
+    ]
+    for nr in refused:
+        program += [(_BPF_JEQ_K, 0, 1, nr), (_BPF_RET_K, 0, 0, deny)]
+    for nr, flags_index in flag_checked.items():
+        program += [
+            (_BPF_JEQ_K, 0, 4, nr),
+            (_BPF_LD_W_ABS, 0, 0, _data_arg(flags_index)),
+            (_BPF_JSET_K, 0, 1, _OPEN_WRITE_FLAGS),
+            (_BPF_RET_K, 0, 0, deny),
+            (_BPF_RET_K, 0, 0, _SECCOMP_RET_ALLOW),
+        ]
+    program.append((_BPF_RET_K, 0, 0, _SECCOMP_RET_ALLOW))
+    return program
+
+
+def _seccomp() -> None:
+    if platform.machine() not in _SECCOMP_ARCHES:
+        raise OSError(errno.ENOSYS, f'seccomp no soportado en {platform.machine()}')
+    program = _seccomp_program()
+    filters = (_SockFilter * len(program))(*[_SockFilter(*op) for op in program])
+    fprog = _SockFprog(len(program), filters)
+    _prctl(_PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0)
+    _prctl(_PR_SET_SECCOMP, _SECCOMP_MODE_FILTER, ctypes.byref(fprog))
+
+
+def confine(writable: Sequence[str], how: str) -> None:
+    """
+    Confine the calling process (and what it execs) to writing under `writable`
+
+    Raises:
+        OSError: the mechanism is not available; the caller must not exec
+    """
+    if how == 'landlock':
+        _landlock(writable)
+    elif how == 'seccomp':
+        _seccomp()
+    elif how != 'off':
+        raise OSError(errno.EINVAL, f'RUN_SANDBOX desconocido: {how}')
+
+
+def wrap(argv: Sequence[str], writable: str, how: str) -> list:
+    """argv that confines and then execs `argv` (for launchers without a pre-exec hook)"""
+    return [sys.executable, '-S', os.path.abspath(__file__), writable, how, *argv]
+
+
+if __name__ == '__main__':
+    _writable, _how, *_argv = sys.argv[1:]
+    confine([_writable], _how)
+    os.execvp(_argv[0], _argv)
@@ -0,0 +1,224 @@
+"""
+Priority-aware, per-client fair admission to the execution slots
+
+At most `slots` requests compile/run at once. When one finishes, the next
+request is chosen by:
+1. Priority class: battle (graded battle submissions race for a point),
+   then lesson (playground/lesson runs), then background (/check, challenge
+   validation). A waiter of a lower class that has waited longer than
+   `starvation_seconds` is served before higher classes, so they still
+   make progress under sustained battle load.
+2. Within a class, the client with the fewest running executions, then
+   the one served least recently: a user spamming Run gets a slot in
+   turn with everyone else, not all of them.
+
+Each client may have at most `max_queued_per_client` requests waiting and
+the queue as a whole `max_queue`; beyond that requests are rejected so
+latency stays bounded. Queue wait is recorded per class.
+
+A request that can use more than one process (the test-case fan-out) may
+borrow idle slots with extra_slots(); it gets none while anyone is waiting.
+"""
+
+import collections
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Tuple
+
+import metrics
+
+# Highest priority first
+PRIORITY_CLASSES = ('battle', 'lesson', 'background')
+
+QUEUE_WAIT_SECONDS = metrics.Histogram(
+    'goguru_queue_wait_seconds', 'Time spent waiting for an execution slot', ('class',)
+)
+QUEUE_REJECTED = metrics.Counter(
+    'goguru_queue_rejected_total', 'Requests rejected by the scheduler', ('class', 'reason')
+)
+metrics.register(QUEUE_WAIT_SECONDS)
+metrics.register(QUEUE_REJECTED)
+
+
+class _Waiter:
+    __slots__ = ('client', 'priority', 'enqueued', 'event', 'granted')
+
+    def __init__(self, client: str, priority: str):
+        self.client = client
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.event = threading.Event()
+        self.granted = False
+
+
+class Scheduler:
+    """Bounded execution slots, handed out by priority class and per-client fairness"""
+
+    def __init__(self, slots: int, max_queue: int, queue_timeout: float,
+                 max_queued_per_client: int = 4, starvation_seconds: float = 10.0):
+        self.slots = max(1, slots)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.max_queued_per_client = max(1, max_queued_per_client)
+        self.starvation_seconds = starvation_seconds
+        self.active = 0
+        self.waiting = 0
+        # Exponentially weighted average execution time, for Retry-After
+        self.avg_seconds = 1.0
+        # class -> client -> waiters in arrival order
+        self._queues: Dict[str, Dict[str, Deque[_Waiter]]] = {p: {} for p in PRIORITY_CLASSES}
+        self._active_by_client: Dict[str, int] = collections.Counter()
+        self._queued_by_client: Dict[str, int] = collections.Counter()
+        # Last time each client with queued or running work got a slot
+        self._last_grant: Dict[str, float] = {}
+        self._admitted: Dict[str, int] = collections.Counter()
+        self._wait_total: Dict[str, float] = collections.Counter()
+        self._lock = threading.Lock()
+
+    def acquire(self, priority: str = 'lesson', client: str = '') -> Tuple[bool, int, float]:
+        """
+        Wait for a slot
+
+        Returns:
+            Tuple of (acquired, queue_depth_on_arrival, wait_seconds)
+        """
+        if priority not in self._queues:
+            priority = 'lesson'
+        with self._lock:
+            depth = self.waiting
+            if self.active < self.slots and self.waiting == 0:
+                self._grant(client, priority, 0.0)
+                return True, depth, 0.0
+            if self.waiting >= self.max_queue:
+                QUEUE_REJECTED.inc(priority, 'queue_full')
+                return False, depth, 0.0
+            if self._queued_by_client[client] >= self.max_queued_per_client:
+                QUEUE_REJECTED.inc(priority, 'client_limit')
+                return False, depth, 0.0
+
+            waiter = _Waiter(client, priority)
+            self._queues[priority].setdefault(client, collections.deque()).append(waiter)
+            self._queued_by_client[client] += 1
+            self.waiting += 1
+
+        waiter.event.wait(self.queue_timeout)
+        with self._lock:
+            waited = time.monotonic() - waiter.enqueued
+            if waiter.granted:
+                return True, depth, waited
+            # Timed out: leave the queue
+            queue = self._queues[priority][client]
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[priority][client]
+            self._dequeued(client)
+            QUEUE_REJECTED.inc(priority, 'timeout')
+            return False, depth, waited
+
+    def release(self, duration: float, client: str = '') -> None:
+        with self._lock:
+            self.active -= 1
+            self._active_by_client[client] -= 1
+            if self._active_by_client[client] <= 0:
+                del self._active_by_client[client]
+                if not self._queued_by_client.get(client):
+                    self._last_grant.pop(client, None)
+            self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * duration
+            self._dispatch()
+
+    @contextmanager
+    def extra_slots(self, wanted: int) -> Iterator[int]:
+        """
+        Borrow up to `wanted` idle slots for the duration of the block, on top
+        of the slot the caller already holds
+
+        Yields:
+            How many were borrowed (0 while any request is waiting)
+        """
+        with self._lock:
+            borrowed = 0 if self.waiting else max(0, min(wanted, self.slots - self.active))
+            self.active += borrowed
+        try:
+            yield borrowed
+        finally:
+            if borrowed:
+                with self._lock:
+                    self.active -= borrowed
+                    self._dispatch()
+
+    def _dequeued(self, client: str) -> None:
+        """A waiter of `client` left the queue (called with the lock held)"""
+        self.waiting -= 1
+        self._queued_by_client[client] -= 1
+        # Clients come and go (one per address): keep no state for idle ones
+        if self._queued_by_client[client] <= 0:
+            del self._queued_by_client[client]
+            if client not in self._active_by_client:
+                self._last_grant.pop(client, None)
+
+    def _grant(self, client: str, priority: str, waited: float) -> None:
+        self.active += 1
+        self._last_grant[client] = time.monotonic()
+        self._active_by_client[client] += 1
+        self._admitted[priority] += 1
+        self._wait_total[priority] += waited
+        QUEUE_WAIT_SECONDS.observe(waited, priority)
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiters (called with the lock held)"""
+        while self.active < self.slots and self.waiting:
+            waiter = self._next_waiter()
+            queue = self._queues[waiter.priority][waiter.client]
+            queue.popleft()
+            if not queue:
+                del self._queues[waiter.priority][waiter.client]
+            self._dequeued(waiter.client)
+            waiter.granted = True
+            self._grant(waiter.client, waiter.priority, time.monotonic() - waiter.enqueued)
+            waiter.event.set()
+
+    def _next_waiter(self) -> _Waiter:
+        now = time.monotonic()
+        # A starving lower-priority waiter goes first (oldest one wins)
+        starving = [
+            queue[0] for priority in PRIORITY_CLASSES[1:] for queue in self._queues[priority].values()
+            if now - queue[0].enqueued >= self.starvation_seconds
+        ]
+        if starving:
+            return min(starving, key=lambda w: w.enqueued)
+        for priority in PRIORITY_CLASSES:
+            clients = self._queues[priority]
+            if clients:
+                # Fewest running executions first, then the client served longest ago
+                return min((queue[0] for queue in clients.values()),
+                           key=lambda w: (self._active_by_client.get(w.client, 0),
+                                          self._last_grant.get(w.client, 0.0), w.enqueued))
+        raise RuntimeError('waiting > 0 with empty queues')
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from queue length and average run time"""
+        with self._lock:
+            pending = self.waiting + 1
+            return max(1, math.ceil(self.avg_seconds * pending / self.slots))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            classes = {}
+            for priority in PRIORITY_CLASSES:
+                admitted = self._admitted[priority]
+                classes[priority] = {
+                    'waiting': sum(len(q) for q in self._queues[priority].values()),
+                    'admitted': admitted,
+                    'avgWaitMs': round(self._wait_total[priority] / admitted * 1000, 1) if admitted else 0.0,
+                }
+            return {
+                'slots': self.slots,
+                'active': self.active,
+                'waiting': self.waiting,
+                'maxQueue': self.max_queue,
+                'avgExecutionMs': round(self.avg_seconds * 1000, 1),
+                'clients': len(self._active_by_client),
+                'classes': classes,
+            }
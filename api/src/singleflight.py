@@ -0,0 +1,81 @@
+"""
+In-flight deduplication of identical work
+
+When many requests need the same result at the same time (every player of a
+battle room pressing Run on the same initialCode), only the first one does
+the work; the others wait for it and receive the same result or exception.
+Nothing is kept once the call finishes: caching is the job of binary_cache
+and result_cache.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """At most one call of `fn` per key at a time; concurrent callers share it"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any],
+           shareable: Optional[Callable[[Any], bool]] = None,
+           wait_timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Run `fn`, or wait for the identical call already in flight
+
+        Args:
+            shareable: tells whether the leader's result is valid for the
+                others (e.g. not when the leader's client cancelled); if not,
+                each follower runs `fn` itself
+            wait_timeout: seconds a follower waits before giving up on the
+                leader and running `fn` itself
+
+        Returns:
+            Tuple of (result, shared) where shared is True for followers
+
+        Raises:
+            Whatever `fn` raised, in the leader and in every follower
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+
+        if leader:
+            try:
+                call.result = fn()
+                return call.result, False
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if not call.done.wait(wait_timeout):
+            return fn(), False
+        if call.error is not None:
+            raise call.error
+        if shareable is not None and not shareable(call.result):
+            return self.do(key, fn, shareable, wait_timeout)
+        return call.result, True
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,381 @@
+"""
+Server-side Go test harness for challenge grading
+
+Turns user code plus the structured `testCases` produced by generator.py into
+two files of package main: the user code with its `main` renamed, and a
+harness whose `main` runs one test case (selected by argv[1]) and prints the
+result of `Solution(...)` after a marker line.
+"""
+
+import json
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import go_scanner
+
+HARNESS_FILE = 'zz_goguru_harness.go'
+SOLUTION_FILE = 'main.go'
+# Printed before the value returned by Solution; anything before it is user output
+RESULT_MARKER = '<<<GOGURU_RESULT>>>'
+MAX_TEST_CASES = 50
+
+_MAIN_FUNC_RE = re.compile(r'func\s+main\s*\(\s*\)')
+# Up to the `(` of the parameter list (type parameters skipped)
+_SOLUTION_RE = re.compile(r'func\s+Solution\s*(?:\[([^\]]*)\]\s*)?\(')
+_NAMED_PARAM_RE = re.compile(r'^(\w+)\s+(\S.*)$', re.DOTALL)
+_TYPE_KEYWORDS = {'chan', 'func', 'map', 'struct', 'interface'}
+
+_INT_TYPES = {
+    'int', 'int8', 'int16', 'int32', 'int64',
+    'uint', 'uint8', 'uint16', 'uint32', 'uint64', 'uintptr', 'byte', 'rune',
+}
+_FLOAT_TYPES = {'float32', 'float64'}
+# Types whose zero value is nil: JSON null becomes `nil`
+_NILABLE_PREFIXES = ('[]', 'map[', '*', 'func', 'chan', 'interface')
+
+
+def go_type(value: Any) -> str:
+    """Go type for a JSON value (lists/objects must be homogeneous)"""
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float64'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, list):
+        return '[]' + _common_type(value)
+    if isinstance(value, dict):
+        return 'map[string]' + _common_type(list(value.values()))
+    raise ValueError(f"Tipo de input no soportado: {type(value).__name__}")
+
+
+def _common_type(values: List[Any]) -> str:
+    if not values:
+        return 'int'
+    types = {go_type(v) for v in values}
+    if types == {'int', 'float64'}:
+        return 'float64'
+    if len(types) != 1:
+        raise ValueError("Los inputs con listas u objetos deben tener elementos del mismo tipo")
+    return types.pop()
+
+
+def go_literal(value: Any, type_name: str = '') -> str:
+    """Go source literal for a JSON value"""
+    type_name = type_name or go_type(value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        if not _is_finite(value):
+            raise ValueError("NaN e Infinity no tienen literal en Go")
+        if type_name == 'float64' and isinstance(value, int):
+            return f"{value}.0"
+        return repr(value)
+    if isinstance(value, str):
+        # JSON string escapes are valid Go escapes; keep non-ASCII as UTF-8
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, list):
+        elem = type_name[2:]
+        return type_name + '{' + ', '.join(go_literal(v, elem) for v in value) + '}'
+    if isinstance(value, dict):
+        elem = type_name[len('map[string]'):]
+        items = ', '.join(f"{json.dumps(k, ensure_ascii=False)}: {go_literal(v, elem)}" for k, v in value.items())
+        return type_name + '{' + items + '}'
+    raise ValueError(f"Tipo de input no soportado: {type(value).__name__}")
+
+
+def _is_finite(value: Any) -> bool:
+    return not isinstance(value, float) or math.isfinite(value)
+
+
+def has_non_finite(value: Any) -> bool:
+    """Whether a JSON value contains NaN or ±Infinity (accepted by json.loads, not valid JSON)"""
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, list):
+        return any(has_non_finite(v) for v in value)
+    if isinstance(value, dict):
+        return any(has_non_finite(v) for v in value.values())
+    return False
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split on commas outside (), [] and {}"""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _declared_fields(text: str) -> Optional[List[Tuple[str, str]]]:
+    """
+    (name, type) per parameter of a parameter or type-parameter list, with
+    `a, b int` expanded; names are '' when the list is unnamed. None if the
+    list is malformed
+    """
+    parts = _split_top_level(text)
+
+    def named(part: str) -> Optional['re.Match']:
+        found = _NAMED_PARAM_RE.match(part)
+        return found if found and found.group(1) not in _TYPE_KEYWORDS else None
+
+    # Go parameters are either all named or all unnamed
+    if not any(named(part) for part in parts):
+        return [('', ' '.join(part.split())) for part in parts]
+    fields, pending = [], []
+    for part in parts:
+        found = named(part)
+        if found is None:
+            # `a` in `a, b int`: takes the type of the next typed parameter
+            pending.append(part)
+            continue
+        type_name = ' '.join(found.group(2).split())
+        fields.extend((name, type_name) for name in pending + [found.group(1)])
+        pending = []
+    return fields if not pending else None
+
+
+def solution_parameter_types(code: str) -> Optional[List[str]]:
+    """
+    Declared parameter types of `func Solution`, in order (a variadic last
+    parameter keeps its `...`; a type that uses a type parameter is '' so its
+    literal is inferred), or None if the signature cannot be found
+    """
+    blanked = go_scanner.blank_literals(code)
+    match = next(go_scanner.finditer_words(_SOLUTION_RE, blanked), None)
+    if match is None:
+        return None
+    depth, end = 1, match.end()
+    while end < len(blanked) and depth:
+        if blanked[end] == '(':
+            depth += 1
+        elif blanked[end] == ')':
+            depth -= 1
+        end += 1
+    if depth:
+        return None
+    # Types come from the original code (struct tags and array sizes may be literals)
+    fields = _declared_fields(code[match.end():end - 1])
+    type_params = _declared_fields(match.group(1) or '')
+    if fields is None or type_params is None:
+        return None
+    type_param_names = {name for name, _ in type_params}
+
+    def spelled(type_name: str) -> str:
+        if type_param_names & set(re.findall(r'\w+', type_name)):
+            return '...' if type_name.startswith('...') else ''
+        return type_name
+
+    return [spelled(type_name) for _, type_name in fields]
+
+
+def _mismatch(value: Any, type_name: str) -> ValueError:
+    return ValueError(f"El valor {json.dumps(value, ensure_ascii=False)} no es válido para el tipo {type_name}")
+
+
+def _map_key(key: str, type_name: str) -> Any:
+    """JSON object keys are always strings: convert to the declared key type"""
+    if type_name in _INT_TYPES:
+        try:
+            return int(key)
+        except ValueError:
+            raise _mismatch(key, type_name) from None
+    if type_name in _FLOAT_TYPES:
+        try:
+            return float(key)
+        except ValueError:
+            raise _mismatch(key, type_name) from None
+    if type_name == 'bool' and key in ('true', 'false'):
+        return key == 'true'
+    return key
+
+
+def typed_literal(value: Any, type_name: str) -> str:
+    """
+    Go source literal for a JSON value as the declared type `type_name`;
+    named and other types not spelled out structurally fall back to the
+    literal inferred from the value (assignable when the underlying type matches)
+    """
+    if not type_name:
+        return go_literal(value)
+    if value is None and (type_name == 'any' or type_name.startswith(_NILABLE_PREFIXES)):
+        return 'nil'
+    if type_name in _INT_TYPES:
+        if type_name in ('rune', 'byte') and isinstance(value, str) and len(value) == 1:
+            return str(ord(value))
+        if isinstance(value, float) and _is_finite(value) and value.is_integer():
+            value = int(value)
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise _mismatch(value, type_name)
+        return str(value)
+    if type_name in _FLOAT_TYPES:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise _mismatch(value, type_name)
+        if not _is_finite(value):
+            raise ValueError("NaN e Infinity no tienen literal en Go")
+        return repr(value)
+    if type_name == 'string':
+        if not isinstance(value, str):
+            raise _mismatch(value, type_name)
+        return json.dumps(value, ensure_ascii=False)
+    if type_name == 'bool':
+        if not isinstance(value, bool):
+            raise _mismatch(value, type_name)
+        return 'true' if value else 'false'
+    # `[]T` or `[N]T` (N may be a constant name: no length check then)
+    array = re.match(r'^\[([^\]]*)\](.+)$', type_name)
+    if array:
+        if not isinstance(value, list):
+            raise _mismatch(value, type_name)
+        size, elem = array.group(1).strip(), array.group(2)
+        if size.isdigit() and len(value) > int(size):
+            raise ValueError(f"La lista tiene {len(value)} elementos; el tipo {type_name} admite {size}")
+        return type_name + '{' + ', '.join(typed_literal(v, elem.strip()) for v in value) + '}'
+    if type_name.startswith('map['):
+        key_end = _closing_bracket(type_name, 3)
+        if not isinstance(value, dict) or key_end is None:
+            raise _mismatch(value, type_name)
+        key_type, elem = type_name[4:key_end].strip(), type_name[key_end + 1:].strip()
+        items = ', '.join(
+            f"{typed_literal(_map_key(k, key_type), key_type)}: {typed_literal(v, elem)}" for k, v in value.items()
+        )
+        return type_name + '{' + items + '}'
+    return go_literal(value)
+
+
+def _closing_bracket(text: str, start: int) -> Optional[int]:
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == '[':
+            depth += 1
+        elif text[i] == ']':
+            depth -= 1
+            if depth == 0:
+                return i
+    return None
+
+
+def solution_arguments(args: List[Any], parameter_types: Optional[List[str]]) -> str:
+    """Go argument list for Solution, typed from its signature when it is known"""
+    if parameter_types is None:
+        return ', '.join(go_literal(arg) for arg in args)
+    variadic = bool(parameter_types) and parameter_types[-1].startswith('...')
+    fixed = parameter_types[:-1] if variadic else parameter_types
+    if len(args) < len(fixed) or (len(args) > len(fixed) and not variadic):
+        raise ValueError(f"Solution recibe {len(parameter_types)} parámetro(s) y el test case tiene {len(args)}")
+    literals = [typed_literal(arg, type_name) for arg, type_name in zip(args, fixed)]
+    if variadic:
+        elem = parameter_types[-1][3:].strip()
+        literals.extend(typed_literal(arg, elem) for arg in args[len(fixed):])
+    return ', '.join(literals)
+
+
+def format_expected(value: Any) -> str:
+    """Render an expected value the way fmt.Sprint prints the Go equivalent"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float):
+        if math.isfinite(value) and value.is_integer() and abs(value) < 1e21:
+            return str(int(value))
+        return repr(value)
+    if isinstance(value, list):
+        return '[' + ' '.join(format_expected(v) for v in value) + ']'
+    if isinstance(value, dict):
+        return 'map[' + ' '.join(f"{k}:{format_expected(value[k])}" for k in sorted(value)) + ']'
+    return str(value).strip()
+
+
+def case_arguments(test_case: Dict[str, Any]) -> List[Any]:
+    """Arguments for Solution: `args` (list) for several parameters, else `input`"""
+    if 'args' in test_case:
+        if not isinstance(test_case['args'], list):
+            raise ValueError("'args' debe ser una lista")
+        return test_case['args']
+    if 'input' not in test_case:
+        raise ValueError("Cada test case necesita 'input' o 'args'")
+    return [test_case['input']]
+
+
+def rename_main(code: str) -> str:
+    """
+    Rename the user's `func main()` so it stays compilable but is never
+    called; matches inside comments and literals are left alone
+    """
+    blanked = go_scanner.blank_literals(code)
+    pieces, last = [], 0
+    for match in go_scanner.finditer_words(_MAIN_FUNC_RE, blanked):
+        pieces.extend([code[last:match.start()], 'func goguruUserMain()'])
+        last = match.end()
+    pieces.append(code[last:])
+    return ''.join(pieces)
+
+
+def build_harness(code: str, test_cases: List[Dict[str, Any]]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Build the Go sources that run every test case
+
+    Returns:
+        Tuple of (sources, errors) where sources maps file name -> code and
+        errors[i] is a non-empty message if test case i cannot be expressed in Go
+    """
+    user_code = rename_main(code)
+    parameter_types = solution_parameter_types(code)
+
+    switch_cases = []
+    errors = []
+    for i, test_case in enumerate(test_cases):
+        try:
+            args = solution_arguments(case_arguments(test_case), parameter_types)
+        except ValueError as e:
+            errors.append(str(e))
+            continue
+        errors.append('')
+        switch_cases.append(f"\tcase {i}:\n\t\tgoguruReport(Solution({args}))\n")
+
+    harness = (
+        'package main\n\n'
+        'import (\n'
+        '\tgoguruFmt "fmt"\n'
+        '\tgoguruOs "os"\n'
+        '\tgoguruStrconv "strconv"\n'
+        ')\n\n'
+        'func goguruReport(results ...interface{}) {\n'
+        f'\tgoguruFmt.Print("\\n{RESULT_MARKER}\\n")\n'
+        '\tif len(results) == 1 {\n'
+        '\t\tgoguruFmt.Print(results[0])\n'
+        '\t} else {\n'
+        '\t\tgoguruFmt.Print(goguruFmt.Sprintln(results...))\n'
+        '\t}\n'
+        '}\n\n'
+        'func main() {\n'
+        '\tgoguruCase, _ := goguruStrconv.Atoi(goguruOs.Args[1])\n'
+        '\tswitch goguruCase {\n'
+        + ''.join(switch_cases) +
+        '\t}\n'
+        '}\n'
+    )
+    return {SOLUTION_FILE: user_code, HARNESS_FILE: harness}, errors
+
+
+def parse_case_output(stdout: str) -> Tuple[str, str, bool]:
+    """
+    Split the harness output of one case
+
+    Returns:
+        Tuple of (user_output, result, found_marker)
+    """
+    marker = f"\n{RESULT_MARKER}\n"
+    index = stdout.rfind(marker)
+    if index == -1:
+        return stdout, '', False
+    return stdout[:index], stdout[index + len(marker):], True
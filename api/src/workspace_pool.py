@@ -0,0 +1,172 @@
+"""
+Pool of reusable scratch directories for builds and runs
+
+Creating and recursively deleting a TemporaryDirectory per request costs
+several syscalls per file on a disk-backed /tmp. Instead, a fixed set of
+workspaces (each with a go.mod already written) lives on a memory-backed
+filesystem (/dev/shm when available): a request checks one out, and on
+release it is scrubbed (everything but go.mod removed) and put back.
+
+When every pooled workspace is in use, an extra one is created and deleted
+after the request (fallback), so the pool never blocks. A workspace that
+cannot be scrubbed (e.g. the program changed its permissions) is discarded.
+"""
+
+import atexit
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import build_cache
+
+WORKSPACE_POOL_SIZE = int(os.environ.get('WORKSPACE_POOL_SIZE', str(max(4, 2 * (os.cpu_count() or 1)))))
+# Empty = /dev/shm if writable, else the system temp dir (e.g. /tmp on Lambda)
+WORKSPACE_ROOT = os.environ.get('WORKSPACE_ROOT', '')
+
+_GO_VERSION_RE = re.compile(r'^go(\d+\.\d+(?:\.\d+)?)')
+
+
+def default_root() -> str:
+    if WORKSPACE_ROOT:
+        return WORKSPACE_ROOT
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK | os.X_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def go_mod_content() -> Optional[str]:
+    """
+    go.mod declaring the installed toolchain's version, so the language
+    version is the same as building without one; None if it is unknown
+    (a go.mod without `go` line would mean go1.16 semantics)
+    """
+    match = _GO_VERSION_RE.match(build_cache.go_version())
+    if match is None:
+        return None
+    return f"module goguru\n\ngo {match.group(1)}\n"
+
+
+class WorkspacePool:
+    """Checked-out, scrubbed and returned scratch directories"""
+
+    def __init__(self, size: int = WORKSPACE_POOL_SIZE, root: Optional[str] = None):
+        self.size = max(0, size)
+        self._parent = root
+        self.root: Optional[str] = None  # created on first use
+        self._idle: List[str] = []
+        self._in_use = 0
+        self._go_mod: Optional[str] = None
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {'checkouts': 0, 'fallbacks': 0, 'discarded': 0}
+
+    def _prepare(self) -> None:
+        """Create the pool directory and its workspaces (once, under _lock)"""
+        if self.root is not None:
+            return
+        self._go_mod = go_mod_content()
+        self.root = tempfile.mkdtemp(prefix=f'goguru-ws-{os.getpid()}-', dir=self._parent or default_root())
+        atexit.register(shutil.rmtree, self.root, True)
+        self._idle = [self._create() for _ in range(self.size)]
+
+    def _create(self) -> str:
+        path = tempfile.mkdtemp(prefix='ws-', dir=self.root)
+        if self._go_mod is not None:
+            with open(os.path.join(path, 'go.mod'), 'w') as f:
+                f.write(self._go_mod)
+        return path
+
+    def checkout(self) -> str:
+        with self._lock:
+            self._prepare()
+            self.counters['checkouts'] += 1
+            self._in_use += 1
+            if self._idle:
+                return self._idle.pop()
+            self.counters['fallbacks'] += 1
+        return self._create()
+
+    def release(self, path: str) -> None:
+        """Scrub `path` and return it to the pool (or delete it if the pool is full)"""
+        with self._lock:
+            self._in_use -= 1
+            keep = len(self._idle) < self.size
+        if keep and self._scrub(path):
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(path)
+                    return
+        elif keep:
+            self.counters['discarded'] += 1
+        self._remove(path)
+
+    def _scrub(self, path: str) -> bool:
+        """Remove everything but go.mod, restoring it if it was modified"""
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.name == 'go.mod' and entry.is_file(follow_symlinks=False):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path)
+                    else:
+                        os.unlink(entry.path)
+            if self._go_mod is not None:
+                go_mod = os.path.join(path, 'go.mod')
+                try:
+                    with open(go_mod) as f:
+                        intact = f.read() == self._go_mod
+                except OSError:
+                    intact = False
+                if not intact:
+                    with open(go_mod, 'w') as f:
+                        f.write(self._go_mod)
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.chmod(path, 0o700)
+        except OSError:
+            pass
+        shutil.rmtree(path, ignore_errors=True)
+
+    @contextmanager
+    def workspace(self, stats: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Check out a workspace for the duration of the block; checkout and
+        scrub time are added to stats['phases']['workspace']
+        """
+        started = time.monotonic()
+        path = self.checkout()
+        setup = time.monotonic() - started
+        try:
+            yield path
+        finally:
+            started = time.monotonic()
+            self.release(path)
+            if stats is not None:
+                phases = stats.setdefault('phases', {})
+                phases['workspace'] = phases.get('workspace', 0.0) + setup + time.monotonic() - started
+
+    def tmpdir(self) -> Optional[str]:
+        """Directory for the go tool's own temporary files (GOTMPDIR), on the same filesystem"""
+        with self._lock:
+            self._prepare()
+        return self.root
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'root': self.root,
+                'size': self.size,
+                'idle': len(self._idle),
+                'inUse': self._in_use,
+                **self.counters,
+            }
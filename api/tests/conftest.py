@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The API modules are flat files in src/ (the Lambda task root)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
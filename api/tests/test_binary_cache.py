@@ -0,0 +1,53 @@
+import binary_cache
+
+
+def make_store(tmp_path):
+    return binary_cache.BinaryStore(str(tmp_path / 'store'), 1 << 20, 1 << 20)
+
+
+def build(tmp_path, content: bytes):
+    path = tmp_path / 'main'
+    path.write_bytes(content)
+    return path
+
+
+def test_admitted_binary_is_returned(tmp_path):
+    store = make_store(tmp_path)
+    stored = store.put('k', build(tmp_path, b'\x7fELF hola'))
+    assert store.get('k') == stored
+    assert stored.read_bytes() == b'\x7fELF hola'
+
+
+def test_tampered_binary_is_dropped(tmp_path):
+    store = make_store(tmp_path)
+    stored = store.put('k', build(tmp_path, b'\x7fELF hola'))
+    stored.write_bytes(b'#!/bin/sh\necho pwned\n')
+    assert store.get('k') is None
+    assert not stored.exists()
+    assert store.digest('k') is None
+
+
+def test_entries_this_process_did_not_admit_are_misses(tmp_path):
+    store = make_store(tmp_path)
+    store.root.mkdir()
+    (store.root / 'k').write_bytes(b'#!/bin/sh\necho pwned\n')
+    assert store.get('k') is None
+
+
+def test_evicted_entries_are_forgotten(tmp_path):
+    store = binary_cache.BinaryStore(str(tmp_path / 'store'), 10, 10)
+    store.put('a', build(tmp_path, b'12345678'))
+    store.put('b', build(tmp_path, b'12345678'))
+    assert store.digest('a') is None or store.digest('b') is None
+
+
+def test_read_returns_content_matching_its_digest(tmp_path):
+    store = binary_cache.BinaryStore(str(tmp_path / 'store'), 1 << 20, 1 << 20, suffix='.wasm')
+    stored = store.put('k', build(tmp_path, b'\0asm module'))
+    digest = store.digest('k')
+    assert store.read(digest) == b'\0asm module'
+    assert store.read('0' * 64) is None
+
+    stored.write_bytes(b'\0asm pwned!')
+    assert store.read(digest) is None
+    assert not stored.exists()
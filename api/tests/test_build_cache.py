@@ -0,0 +1,96 @@
+import os
+import subprocess
+import threading
+import time
+
+import build_cache
+
+
+def fill(cache_dir: str, entries: int, size: int) -> None:
+    for i in range(entries):
+        path = os.path.join(cache_dir, f'{i:02x}', f'{i:02x}-d')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'0' * size)
+        # Oldest first
+        os.utime(path, (i, i))
+
+
+def test_trim_is_not_starved_by_overlapping_builds(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_cache, 'GO_BUILD_CACHE_DIR', str(tmp_path))
+    fill(str(tmp_path), 20, 10_000)
+    stop = threading.Event()
+
+    def builds() -> None:
+        while not stop.is_set():
+            with build_cache.build_lock():
+                time.sleep(0.1)
+
+    # Staggered, so at any moment some build holds the shared lock
+    threads = [threading.Thread(target=builds) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.03)
+    try:
+        freed = build_cache.trim(max_bytes=100_000, lock_timeout=5)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert freed == 120_000
+    assert not os.path.exists(tmp_path / '00' / '00-d')
+    assert os.path.exists(tmp_path / '13' / '13-d')
+
+
+def test_trim_under_cap_takes_no_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_cache, 'GO_BUILD_CACHE_DIR', str(tmp_path))
+    fill(str(tmp_path), 2, 1_000)
+    with build_cache._file_lock(build_cache.TRIM_INTENT_FILE, exclusive=True):
+        assert build_cache.trim(max_bytes=10_000, lock_timeout=0) == 0
+
+
+def test_maybe_trim_runs_once_per_interval_in_background(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_cache, 'GO_BUILD_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(build_cache, '_last_trim_check', 0.0)
+    calls = []
+    release = threading.Event()
+    monkeypatch.setattr(build_cache, 'trim', lambda: (calls.append(1), release.wait(5)))
+
+    threads = [threading.Thread(target=build_cache.maybe_trim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release.set()
+    build_cache._trim_thread.join()
+
+    assert calls == [1]
+
+
+def test_background_warm_up_waits_for_request_builds(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_cache, 'GO_BUILD_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(build_cache, 'GO_BUILD_CACHE_SEED_DIR', str(tmp_path / 'no-seed'))
+    monkeypatch.setattr(build_cache, 'go_version', lambda: 'go1.21.6')
+    monkeypatch.setattr(build_cache, '_warm_vet', lambda: None)
+    monkeypatch.setattr(build_cache, 'GOCACHE_WARM_WASM', False)
+    monkeypatch.setattr(build_cache, '_ready', threading.Event())
+    builds = []
+
+    def fake_run(argv, **kwargs):
+        builds.append(argv)
+        return subprocess.CompletedProcess(argv, 0, '', '')
+
+    monkeypatch.setattr(build_cache.subprocess, 'run', fake_run)
+    packages = [f'pkg{i}' for i in range(build_cache.WARM_UP_BATCH + 1)]
+
+    with build_cache.build_lock():
+        warm = threading.Thread(target=build_cache.warm_up, args=(packages, True))
+        warm.start()
+        time.sleep(0.2)
+        assert builds == []
+    warm.join(5)
+
+    assert not warm.is_alive() and build_cache.is_ready()
+    assert [argv[:3] for argv in builds] == [['go', 'build', '-p=1']] * 2
+    assert [pkg for argv in builds for pkg in argv[4:]] == packages
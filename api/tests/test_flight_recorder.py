@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+import flight_recorder
+
+CODE = (
+    'package main\n\nimport "fmt"\n\n'
+    '// contraseña: hunter2\n'
+    'func main() {\n\tfmt.Println("ana@example.com")\n}\n'
+)
+
+
+def record(tmp_path, **kwargs):
+    recorder = flight_recorder.FlightRecorder(str(tmp_path), slots=4, slow_ms=0, log=False, **kwargs)
+    recorder.maybe_record('/execute', {'code': CODE}, 'success', {'run': 0.1}, 0.1)
+    (path,) = tmp_path.iterdir()
+    return json.loads(path.read_text())['request']
+
+
+def test_code_is_redacted_by_default(tmp_path):
+    request = record(tmp_path)
+    assert request['codeRedacted']
+    assert 'ana@example.com' not in request['code'] and 'hunter2' not in request['code']
+    assert '"fmt"' in request['code']
+
+
+@pytest.mark.parametrize('setting', ['redact', 'Full', 'bogus'])
+def test_anything_but_full_or_none_is_redacted(tmp_path, setting):
+    request = record(tmp_path, record_code=setting)
+    assert request['codeRedacted'] and 'hunter2' not in request['code']
+
+
+def test_full_and_none_are_opt_in(tmp_path):
+    assert record(tmp_path / 'full', record_code='full')['code'] == CODE
+    assert record(tmp_path / 'none', record_code='none')['code'] is None
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import json_stream
+
+CHALLENGE = {
+    'title': 'Suma {de} [dos], números',
+    'description': 'Usa "comillas", barras \\ y escapes \\" \n y unicode: ñ é 🐹',
+    'initialCode': 'package main\n\nfunc main() {\n\tfmt.Println("}")\n}\n',
+    'testCases': [{'input': '1 2', 'expectedOutput': '3'}, {'input': '', 'expectedOutput': '{}'}],
+    'points': 100,
+    'hints': [],
+    'meta': {'nested': {'deep': [1, [2, {'x': None}]]}, 'ok': True},
+}
+TEXT = json.dumps(CHALLENGE, ensure_ascii=False, indent=2)
+
+
+def feed_all(chunks):
+    parser = json_stream.ObjectStreamParser()
+    members = []
+    for chunk in chunks:
+        members.extend(parser.feed(chunk))
+    parser.close()
+    return members
+
+
+def test_every_two_way_split_gives_the_same_members():
+    expected = list(CHALLENGE.items())
+    for i in range(len(TEXT) + 1):
+        assert feed_all([TEXT[:i], TEXT[i:]]) == expected, i
+
+
+def test_character_by_character():
+    assert feed_all(TEXT) == list(CHALLENGE.items())
+
+
+def test_escapes_split_at_the_backslash():
+    text = '{"a": "x\\\\", "b": "y\\"z"}'
+    for i in range(len(text) + 1):
+        assert dict(feed_all([text[:i], text[i:]])) == json.loads(text), i
+
+
+def test_members_are_handed_out_as_soon_as_they_are_complete():
+    parser = json_stream.ObjectStreamParser()
+    assert parser.feed('{"title": "Su') == []
+    assert parser.feed('ma", "testCases": [{"input": "1"},') == [('title', 'Suma')]
+    assert parser.feed(' {"input": "2"}]') == []
+    assert parser.feed(', "points": 10') == [('testCases', [{'input': '1'}, {'input': '2'}])]
+    assert parser.feed('}') == [('points', 10)]
+    assert parser.done
+
+
+def test_text_around_the_object_is_ignored():
+    chunks = ['Aquí está:\n```js', 'on\n', '{"a": 1}', '\n```\n{"b": 2}']
+    assert feed_all(chunks) == [('a', 1)]
+
+
+def test_empty_object_and_trailing_comma():
+    assert feed_all(['{', '}']) == []
+    assert feed_all(['{"a": 1,', '}']) == [('a', 1)]
+
+
+def test_unterminated_object_raises_on_close():
+    parser = json_stream.ObjectStreamParser()
+    parser.feed('{"a": 1, "b": [1, 2')
+    with pytest.raises(json.JSONDecodeError):
+        parser.close()
+
+
+def test_invalid_member_raises():
+    parser = json_stream.ObjectStreamParser()
+    with pytest.raises(json.JSONDecodeError):
+        parser.feed('{"a": nope,')
+
+
+def test_loads():
+    assert json_stream.loads([TEXT[:100], TEXT[100:]]) == CHALLENGE
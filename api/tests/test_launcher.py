@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import time
+
+import pytest
+
+import launcher
+
+
+def start(server: launcher.ForkServer, argv):
+    read_fd, write_fd = os.pipe()
+    try:
+        return server.spawn(argv, '/', None, [], write_fd, write_fd)
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+def test_kill_stops_a_running_child():
+    server = launcher.ForkServer()
+    process = start(server, ['sleep', '30'])
+    process.kill()
+    returncode, _ = process.wait(5)
+    assert returncode == -9
+
+
+def test_helper_only_kills_its_unreaped_children():
+    server = launcher.ForkServer()
+    process = start(server, ['true'])
+    assert process.wait(5)[0] == 0
+    process.kill()  # already reaped: nothing is sent
+
+    # A pid that is not (or no longer) the helper's child, as after pid reuse
+    stranger = subprocess.Popen(['sleep', '30'], start_new_session=True)
+    try:
+        with server._lock:
+            server._sock.send(json.dumps({'kill': stranger.pid}).encode())
+        # The helper handles messages in order: once this launch answers, the kill was processed
+        assert start(server, ['true']).wait(5)[0] == 0
+        time.sleep(0.05)
+        assert stranger.poll() is None
+    finally:
+        stranger.kill()
+        stranger.wait()
+
+
+def test_launched_process_requires_wait():
+    class NoWait(launcher.LaunchedProcess):
+        pass
+
+    with pytest.raises(TypeError):
+        NoWait(1, 0.0)
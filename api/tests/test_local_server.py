@@ -0,0 +1,172 @@
+import gzip
+import http.client
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+os.environ.setdefault('GOCACHE_PREPARE', '0')  # importing app must not warm the build cache
+import local_server  # noqa: E402
+
+
+def handler_for(path: str, headers: dict, peer: str = '203.0.113.7') -> local_server.LocalRequestHandler:
+    """A request handler as the server builds it, without a socket"""
+    handler = local_server.LocalRequestHandler.__new__(local_server.LocalRequestHandler)
+    handler.path = path
+    handler.headers = http.client.HTTPMessage()
+    for name, value in headers.items():
+        handler.headers[name] = value
+    handler.client_address = (peer, 40000)
+    return handler
+
+
+@pytest.mark.parametrize('path, expected', [
+    ('/execute/tests', 'battle'), ('/execute', 'lesson'), ('/check', 'background'),
+])
+def test_priority_comes_from_the_route(path, expected, monkeypatch):
+    monkeypatch.setattr(local_server, 'PRIORITY_TOKEN', '')
+    assert handler_for(path, {'X-Priority': 'battle'})._priority() == expected
+    assert handler_for(path, {'X-Priority': 'battle', 'X-Service-Token': ''})._priority() == expected
+
+
+def test_priority_header_needs_the_service_token(monkeypatch):
+    monkeypatch.setattr(local_server, 'PRIORITY_TOKEN', 's3cret')
+    assert handler_for('/execute', {'X-Priority': 'battle', 'X-Service-Token': 'guess'})._priority() == 'lesson'
+    trusted = {'X-Priority': 'background', 'X-Service-Token': 's3cret'}
+    assert handler_for('/execute/tests', trusted)._priority() == 'background'
+
+
+def test_client_is_the_peer_address(monkeypatch):
+    monkeypatch.setattr(local_server, 'TRUSTED_PROXIES', set())
+    spoofed = {'X-Client-Id': 'fresh-id', 'X-Forwarded-For': '198.51.100.1'}
+    assert handler_for('/execute', spoofed)._client_id() == '203.0.113.7'
+
+
+def test_client_behind_a_trusted_proxy_is_the_address_it_appended(monkeypatch):
+    monkeypatch.setattr(local_server, 'TRUSTED_PROXIES', {'127.0.0.1'})
+    # The client sent its own X-Forwarded-For; the router appended the real peer
+    forwarded = {'X-Forwarded-For': '198.51.100.1, 203.0.113.7'}
+    assert handler_for('/execute', forwarded, peer='127.0.0.1')._client_id() == '203.0.113.7'
+    assert handler_for('/execute', {}, peer='127.0.0.1')._client_id() == '127.0.0.1'
+
+
+@pytest.fixture
+def server():
+    httpd = local_server.ThreadingHTTPServer(('127.0.0.1', 0), local_server.LocalRequestHandler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def fake_execute(monkeypatch):
+    """handle_execute that streams two chunks (one splitting a UTF-8 character)"""
+    def handle_execute(body, on_output=None):
+        for chunk in (b'hola ', 'ñandú\n'.encode('utf-8')[:1], 'ñandú\n'.encode('utf-8')[1:]):
+            on_output(chunk)
+        return {'statusCode': 200, 'body': json.dumps({'success': True, 'output': 'hola ñandú\n'})}
+
+    monkeypatch.setattr(local_server, 'handle_execute', handle_execute)
+
+
+def events(text: str):
+    return [(block.split('\n')[0][len('event: '):], json.loads(block.split('\n')[1][len('data: '):]))
+            for block in text.strip().split('\n\n')]
+
+
+def test_connection_is_reused_across_responses(server, monkeypatch):
+    monkeypatch.setattr(local_server, 'COMPRESS_MIN_BYTES', 1 << 30)
+    conn = http.client.HTTPConnection('127.0.0.1', server, timeout=10)
+    conn.request('OPTIONS', '/execute')
+    response = conn.getresponse()
+    assert response.status == 204 and response.read() == b''
+    sock = conn.sock
+
+    conn.request('GET', '/metrics')
+    response = conn.getresponse()
+    body = response.read()
+    assert response.status == 200 and int(response.getheader('Content-Length')) == len(body)
+    conn.request('OPTIONS', '/execute')
+    response = conn.getresponse()
+    assert response.status == 204 and response.read() == b''
+    assert conn.sock is sock
+    conn.close()
+
+
+def test_large_responses_are_compressed_when_accepted(server, monkeypatch):
+    monkeypatch.setattr(local_server, 'COMPRESS_MIN_BYTES', 1)
+    conn = http.client.HTTPConnection('127.0.0.1', server, timeout=10)
+    conn.request('GET', '/metrics', headers={'Accept-Encoding': 'gzip'})
+    response = conn.getresponse()
+    body = response.read()
+    assert response.getheader('Content-Encoding') == 'gzip'
+    assert response.getheader('Vary') == 'Accept-Encoding'
+    assert int(response.getheader('Content-Length')) == len(body)
+    assert b'goguru_executions_active' in gzip.decompress(body)
+
+    conn.request('GET', '/metrics')
+    response = conn.getresponse()
+    assert response.getheader('Content-Encoding') is None
+    assert b'goguru_executions_active' in response.read()
+    conn.close()
+
+
+def test_event_stream_is_chunked_and_keeps_the_connection(server, fake_execute):
+    conn = http.client.HTTPConnection('127.0.0.1', server, timeout=10)
+    conn.request('POST', '/execute', body=json.dumps({'code': 'x', 'stream': True}),
+                 headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    assert response.getheader('Transfer-Encoding') == 'chunked'
+    assert response.getheader('Content-Length') is None
+    streamed = events(response.read().decode('utf-8'))
+    assert streamed == [
+        ('output', {'chunk': 'hola '}),
+        ('output', {'chunk': 'ñandú\n'}),
+        ('result', {'success': True, 'output': 'hola ñandú\n', 'statusCode': 200}),
+    ]
+    sock = conn.sock
+
+    conn.request('OPTIONS', '/execute')
+    response = conn.getresponse()
+    assert response.status == 204 and response.read() == b''
+    assert conn.sock is sock
+    conn.close()
+
+
+def test_event_stream_to_http_1_0_ends_by_closing(server, fake_execute):
+    body = json.dumps({'code': 'x', 'stream': True}).encode()
+    with socket.create_connection(('127.0.0.1', server), timeout=10) as sock:
+        sock.sendall(b'POST /execute HTTP/1.0\r\nContent-Length: %d\r\n\r\n%s' % (len(body), body))
+        received = b''
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                break
+            received += data
+    head, _, payload = received.partition(b'\r\n\r\n')
+    assert b'Transfer-Encoding' not in head and b'Content-Length' not in head
+    assert events(payload.decode('utf-8'))[-1][0] == 'result'
+
+
+def test_post_without_content_length_is_refused(server):
+    with socket.create_connection(('127.0.0.1', server), timeout=10) as sock:
+        sock.sendall(b'POST /execute HTTP/1.1\r\nHost: x\r\n\r\n')
+        assert sock.recv(65536).startswith(b'HTTP/1.1 411')
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('', None),
+    ('gzip', 'gzip'),
+    ('deflate', 'deflate'),
+    ('gzip;q=0.5, deflate', 'deflate'),
+    ('gzip;q=0, deflate;q=0', None),
+    ('*', 'gzip'),
+    ('br, identity', None),
+])
+def test_negotiate_encoding(header, expected):
+    assert local_server.negotiate_encoding(header) == expected
@@ -0,0 +1,89 @@
+import pytest
+
+import output_compare
+
+# (expected, mode, outputs): every output is fed byte by byte and in every two-way split
+CASES = [
+    ('8', 'exact', ['8', '8\n', '\n  8  \n', '80', '9', '8 8', '']),
+    ('Hola, ñandú 🐹', 'exact', ['Hola, ñandú 🐹\n', 'Hola, ñandu 🐹', 'Hola']),
+    ('a\nb\n', 'lines', ['a\nb', '\n\na  \nb\n\n', 'a\nc\n', 'a\nb\nc', 'a\n\nb', 'a']),
+    ('1 2 3', 'whitespace', ['1\n2\n3\n', '  1  2 3', '1 2', '1 2 3 4', '1 22 3', '12 3']),
+    ('0.1 0.2 0.3', 'numeric', ['0.1000000001 0.2 0.3', '0.1 0.2 0.30001', '0.1 0.2', '.1 .2 .3\n']),
+    ('/^res: \\d+$/', 'exact', ['res: 42', 'nada', 'x\nres: 1']),
+]
+
+
+def splits(data: bytes):
+    yield [data[i:i + 1] for i in range(len(data))]
+    for i in range(len(data) + 1):
+        yield [data[:i], data[i:]]
+
+
+def stream(expected, mode, chunks):
+    comparator = output_compare.StreamComparator(expected, mode)
+    for chunk in chunks:
+        if not comparator.feed(chunk):
+            break
+    return comparator
+
+
+@pytest.mark.parametrize('expected,mode,outputs', CASES)
+def test_stream_never_stops_a_matching_output(expected, mode, outputs):
+    for output in outputs:
+        matches, _ = output_compare.compare(output, expected, mode)
+        for chunks in splits(output.encode('utf-8')):
+            diverged = stream(expected, mode, chunks).diverged
+            assert not (matches and diverged), (output, chunks)
+
+
+@pytest.mark.parametrize('expected,mode,output,chunks_before_stop', [
+    ('8', 'exact', '9' + 'x' * 100, 1),
+    ('a\nb', 'lines', 'a\nc\n' + 'más\n' * 100, 4),
+    ('a\nb', 'lines', 'a\nb\nc\n' + 'más\n' * 100, 6),
+    # A partial word that cannot become the expected one is enough
+    ('1 2', 'whitespace', '1 3 ' + '4 ' * 100, 3),
+    ('1 2', 'whitespace', '1 2 3 ' + '4 ' * 100, 5),
+    ('1 2', 'whitespace', '1 2222', 4),
+])
+def test_stream_stops_as_soon_as_output_diverges(expected, mode, output, chunks_before_stop):
+    comparator = output_compare.StreamComparator(expected, mode)
+    fed = 0
+    for byte in output.encode('utf-8'):
+        fed += 1
+        if not comparator.feed(bytes([byte])):
+            break
+    assert comparator.diverged
+    assert fed == chunks_before_stop
+    assert not output_compare.compare(output, expected, mode)[0]
+
+
+def test_regex_expected_output_is_only_judged_at_the_end():
+    comparator = output_compare.StreamComparator('/fin$/', 'exact')
+    assert comparator.feed(b'cualquier cosa\n' * 10)
+    assert not comparator.diverged
+
+
+def test_stream_stays_diverged():
+    comparator = output_compare.StreamComparator('8', 'exact')
+    assert not comparator.feed(b'9')
+    assert not comparator.feed(b'')
+
+
+@pytest.mark.parametrize('actual,expected,mode,matches', [
+    ('hola\n', 'hola', 'exact', True),
+    ('hola mundo', 'hola  mundo', 'exact', False),
+    ('hola  mundo\n', 'hola mundo', 'whitespace', True),
+    ('a  \n\nb\n', 'a\n\nb', 'lines', True),
+    ('a\nb', 'a b', 'lines', False),
+    ('3.14159', '3.1416', 'numeric', False),
+    ('1e3', '1000', 'numeric', True),
+    ('abc', '/b+/', 'exact', True),
+    ('abc', '/(/', 'exact', False),
+])
+def test_compare(actual, expected, mode, matches):
+    assert output_compare.compare(actual, expected, mode)[0] == matches
+
+
+def test_numeric_tolerance_is_relative_for_large_values():
+    assert output_compare.compare('1000001', '1000000', 'numeric', tolerance=1e-5)[0]
+    assert not output_compare.compare('11', '10', 'numeric', tolerance=1e-5)[0]
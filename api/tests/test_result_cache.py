@@ -0,0 +1,67 @@
+import pytest
+
+import result_cache
+
+
+def program(body: str, imports: str = '"fmt"') -> str:
+    return f'package main\n\nimport {imports}\n\n{body}\n'
+
+
+NONDETERMINISTIC = {
+    'map_parameter': program(
+        'func first(m map[string]int) {\n'
+        '\tfor k := range m {\n\t\tfmt.Println(k)\n\t\tbreak\n\t}\n}\n\n'
+        'func main() {\n\tfirst(map[string]int{"a": 1, "b": 2, "c": 3})\n}'
+    ),
+    'map_returned_by_function': program(
+        'func scores() map[string]int {\n\treturn map[string]int{"a": 1, "b": 2}\n}\n\n'
+        'func main() {\n\tfor k := range scores() {\n\t\tfmt.Println(k)\n\t}\n}'
+    ),
+    'map_literal': program(
+        'func main() {\n\tfor k, v := range map[string]int{"a": 1, "b": 2} {\n\t\tfmt.Println(k, v)\n\t}\n}'
+    ),
+    'map_struct_field': program(
+        'type Inventory struct {\n\titems map[string]int\n}\n\n'
+        'func main() {\n\tinv := Inventory{items: map[string]int{"a": 1, "b": 2}}\n'
+        '\tfor k := range inv.items {\n\t\tfmt.Println(k)\n\t}\n}'
+    ),
+    'named_map_type': program(
+        'type Counts map [string]int\n\n'
+        'func main() {\n\tc := Counts{"a": 1, "b": 2}\n\tfor k := range c {\n\t\tfmt.Println(k)\n\t}\n}'
+    ),
+    'map_from_stdlib': program(
+        'func main() {\n\tv, _ := url.ParseQuery("a=1&b=2&c=3")\n'
+        '\tfor k := range v {\n\t\tfmt.Println(k)\n\t}\n}',
+        imports='(\n\t"fmt"\n\t"net/url"\n)'
+    ),
+    'select_several_ready': program(
+        'func main() {\n\ta, b := make(chan int, 1), make(chan int, 1)\n\ta <- 1\n\tb <- 2\n'
+        '\tselect {\n\tcase v := <-a:\n\t\tfmt.Println(v)\n\tcase v := <-b:\n\t\tfmt.Println(v)\n\t}\n}'
+    ),
+    'goroutine': program('func main() {\n\tgo fmt.Println("a")\n\tfmt.Println("b")\n}'),
+    'time_import': program('func main() {\n\tfmt.Println(time.Now())\n}', imports='(\n\t"fmt"\n\t"time"\n)'),
+}
+
+DETERMINISTIC = {
+    'range_over_slice': program(
+        'func main() {\n\tfor i, v := range []int{3, 1, 2} {\n\t\tfmt.Println(i, v)\n\t}\n}'
+    ),
+    # fmt prints maps with sorted keys
+    'print_map_without_range': program('func main() {\n\tfmt.Println(map[string]int{"b": 2, "a": 1})\n}'),
+    'words_inside_literals': program(
+        '// for k := range m over a map[string]int, or a select {}\n'
+        'func main() {\n\tfmt.Println("map[string]int, range, select {")\n}'
+    ),
+}
+
+
+@pytest.mark.parametrize('name', sorted(NONDETERMINISTIC))
+def test_nondeterministic_programs_bypass_the_cache(name):
+    deterministic, reason = result_cache.is_deterministic(NONDETERMINISTIC[name])
+    assert not deterministic
+    assert reason
+
+
+@pytest.mark.parametrize('name', sorted(DETERMINISTIC))
+def test_deterministic_programs_are_cacheable(name):
+    assert result_cache.is_deterministic(DETERMINISTIC[name]) == (True, '')
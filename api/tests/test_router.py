@@ -0,0 +1,127 @@
+import json
+
+import router
+
+NODES = [f'http://localhost:{port}' for port in range(3001, 3005)]
+KEYS = [f'clave-{i}' for i in range(2000)]
+
+
+def owners(ring):
+    return {key: ring.owner(key) for key in KEYS}
+
+
+def make_ring(nodes):
+    ring = router.HashRing(vnodes=64)
+    ring.set_nodes(nodes)
+    return ring
+
+
+def make_router(nodes=NODES):
+    balancer = router.Router(nodes, vnodes=64, strategy='hash')
+    for node in balancer.nodes.values():
+        node.up = node.ready = True
+        node.slots = 2
+    return balancer
+
+
+def test_ring_does_not_depend_on_node_order():
+    assert owners(make_ring(NODES)) == owners(make_ring(reversed(NODES)))
+
+
+def test_keys_are_spread_over_every_node():
+    counts = {node: 0 for node in NODES}
+    for owner in owners(make_ring(NODES)).values():
+        counts[owner] += 1
+    assert all(count > len(KEYS) / len(NODES) / 2 for count in counts.values())
+
+
+def test_join_only_moves_keys_to_the_new_node():
+    before = owners(make_ring(NODES[:3]))
+    after = owners(make_ring(NODES))
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert all(after[key] == NODES[3] for key in moved)
+    assert len(KEYS) / 8 < len(moved) < len(KEYS) / 2
+
+
+def test_leave_only_moves_the_leaving_nodes_keys():
+    before = owners(make_ring(NODES))
+    after = owners(make_ring(NODES[1:]))
+    for key in KEYS:
+        if before[key] != NODES[0]:
+            assert after[key] == before[key]
+
+
+def test_preference_lists_every_node_once_starting_with_the_owner():
+    ring = make_ring(NODES)
+    for key in KEYS[:50]:
+        order = ring.preference(key)
+        assert sorted(order) == sorted(NODES)
+        assert order[0] == ring.owner(key)
+    assert make_ring([]).preference('x') == []
+
+
+def test_owner_comes_first():
+    balancer = make_router()
+    candidates = balancer.candidates('k')
+    assert candidates[0] == (balancer.nodes[balancer.ring.owner('k')], 'owner')
+    assert [placement for _, placement in candidates[1:]] == ['spill'] * (len(NODES) - 1)
+
+
+def test_down_owner_is_skipped_and_gets_its_keys_back():
+    balancer = make_router()
+    preference = balancer.ring.preference('k')
+    balancer.nodes[preference[0]].up = False
+    assert balancer.candidates('k')[0] == (balancer.nodes[preference[1]], 'spill')
+    balancer.nodes[preference[0]].up = True
+    assert balancer.candidates('k')[0][0].url == preference[0]
+
+
+def test_saturated_owner_spills_to_the_next_node():
+    balancer = make_router()
+    preference = balancer.ring.preference('k')
+    owner = balancer.nodes[preference[0]]
+    owner.inflight = owner.capacity()
+    candidates = balancer.candidates('k')
+    assert candidates[0] == (balancer.nodes[preference[1]], 'spill')
+    assert candidates[-1] == (owner, 'owner')
+
+
+def test_when_all_are_saturated_the_least_loaded_goes_first():
+    balancer = make_router()
+    for i, node in enumerate(balancer.nodes.values()):
+        node.inflight = node.capacity() + i
+    loads = [node.load() for node, _ in balancer.candidates('k')]
+    assert loads == sorted(loads)
+
+
+def test_with_no_healthy_node_every_node_is_tried():
+    balancer = router.Router(NODES, vnodes=64, strategy='hash')
+    assert [node.url for node, _ in balancer.candidates('k')] == balancer.ring.preference('k')
+
+
+def test_nodes_that_stay_keep_their_state():
+    balancer = make_router()
+    kept = balancer.nodes[NODES[1]]
+    kept.inflight = 3
+    assert balancer.change_nodes(add=['http://localhost:3009/'], remove=[NODES[0]]) == \
+        NODES[1:] + ['http://localhost:3009']
+    assert balancer.nodes[NODES[1]] is kept and kept.inflight == 3
+    assert not balancer.nodes['http://localhost:3009'].available
+
+
+def test_track_counts_inflight_requests():
+    balancer = make_router()
+    node = balancer.nodes[NODES[0]]
+    with balancer.track(node):
+        assert node.inflight == 1
+    assert node.inflight == 0 and node.requests == 1
+
+
+def test_routing_key_is_the_code_hash_for_code_routes_only():
+    body = json.dumps({'code': 'package main'}).encode()
+    key = router.routing_key('/execute', body)
+    assert key == router.result_cache.code_hash('package main')
+    assert router.routing_key('/check', body) == key
+    assert router.routing_key('/generate', body) is None
+    assert router.routing_key('/execute', b'no es json') is None
+    assert router.routing_key('/execute', b'{"code": 1}') is None
@@ -0,0 +1,126 @@
+import os
+import platform
+import shutil
+import sys
+
+import pytest
+
+import build_cache
+import launcher
+import process_runner
+import result_cache
+import sandbox
+
+MECHANISMS = [
+    pytest.param('landlock', marks=pytest.mark.skipif(sandbox.landlock_abi() <= 0, reason='sin Landlock')),
+    pytest.param('seccomp', marks=pytest.mark.skipif(
+        platform.machine() not in sandbox._SECCOMP_ARCHES, reason='arquitectura sin filtro seccomp')),
+]
+
+
+@pytest.fixture(params=['forkserver', 'spawn'])
+def launch_path(request, monkeypatch):
+    monkeypatch.setattr(launcher, 'PROCESS_LAUNCHER', request.param)
+    return request.param
+
+
+def run(script: str, cwd: str) -> process_runner.ProcessResult:
+    return process_runner.run_process(['/bin/sh', '-c', script], cwd, 10, 4096, confine=True)
+
+
+@pytest.mark.parametrize('how', MECHANISMS)
+def test_program_cannot_write_outside_its_workspace(how, launch_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(sandbox, '_mechanism', how)
+    workspace = tmp_path / 'ws'
+    workspace.mkdir()
+    # Stand-ins for the binary store, GOCACHE and the result DB
+    store = tmp_path / 'store'
+    store.mkdir()
+    entry = store / 'entry'
+    entry.write_text('original')
+
+    result = run(f'echo pwned > {entry}; echo x > {store}/new; rm -f {entry}; '
+                 f'mv {entry} {store}/moved; echo done', str(workspace))
+
+    assert result.stdout.strip() == 'done'
+    assert entry.read_text() == 'original'
+    assert sorted(os.listdir(store)) == ['entry']
+
+
+@pytest.mark.skipif(sandbox.landlock_abi() <= 0, reason='sin Landlock')
+def test_landlock_keeps_the_workspace_writable(launch_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(sandbox, '_mechanism', 'landlock')
+    result = run('echo hola > out.txt && cat out.txt && rm out.txt', str(tmp_path))
+    assert result.returncode == 0 and result.stdout.strip() == 'hola'
+    assert os.listdir(tmp_path) == []
+
+
+def test_unconfined_launches_are_unaffected(launch_path, tmp_path):
+    result = process_runner.run_process(['/bin/sh', '-c', f'echo x > {tmp_path}/out'], '/', 10, 4096)
+    assert result.returncode == 0 and (tmp_path / 'out').exists()
+
+
+def test_unavailable_confinement_fails_the_launch(launch_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(sandbox, '_mechanism', 'desconocido')
+    if launch_path == 'forkserver':
+        with pytest.raises(OSError):
+            run('echo no', str(tmp_path))
+    else:
+        # The wrapper fails before exec'ing the program
+        result = run('echo no', str(tmp_path))
+        assert result.returncode != 0 and 'no' not in result.stdout
+
+
+@pytest.mark.skipif(shutil.which('go') is None, reason='sin Go')
+def test_go_program_cannot_touch_the_build_cache(tmp_path, monkeypatch):
+    cache = tmp_path / 'go-build'
+    monkeypatch.setattr(build_cache, 'GO_BUILD_CACHE_DIR', str(cache))
+    workspace = tmp_path / 'ws'
+    workspace.mkdir()
+    (workspace / 'go.mod').write_text('module goguru\n\ngo 1.21\n')
+    (workspace / 'main.go').write_text(
+        'package main\n\n'
+        'import (\n\t"io/fs"\n\t"os"\n\t"path/filepath"\n\t"strconv"\n)\n\n'
+        'func main() {\n'
+        '\twritten := 0\n'
+        '\tfilepath.WalkDir(os.Args[1], func(path string, d fs.DirEntry, err error) error {\n'
+        '\t\tif err == nil && !d.IsDir() && os.WriteFile(path, []byte("pwned"), 0644) == nil {\n'
+        '\t\t\twritten++\n'
+        '\t\t}\n'
+        '\t\treturn nil\n'
+        '\t})\n'
+        '\tos.Stdout.WriteString(strconv.Itoa(written))\n'
+        '}\n'
+    )
+    build = process_runner.run_process(['go', 'build', '-o', 'main', '.'], str(workspace), 120, 65536,
+                                       env=build_cache.go_env())
+    assert build.returncode == 0, build.stderr
+    entries = {path: path.read_bytes() for path in cache.rglob('*-d')}
+    assert entries
+
+    run = process_runner.run_process([str(workspace / 'main'), str(cache)], str(workspace), 30, 4096, confine=True)
+
+    assert run.stdout.strip() == '0'
+    assert all(path.read_bytes() == content for path, content in entries.items())
+
+
+@pytest.mark.parametrize('how', MECHANISMS)
+def test_program_cannot_forge_result_rows(how, tmp_path, monkeypatch):
+    monkeypatch.setattr(sandbox, '_mechanism', how)
+    store = result_cache.SqliteStore(str(tmp_path / 'results.sqlite3'))
+    store.set('k', {'success': True, 'output': 'hola\n'})
+    workspace = tmp_path / 'ws'
+    workspace.mkdir()
+    forge = (
+        'import sqlite3, sys\n'
+        'conn = sqlite3.connect(sys.argv[1])\n'
+        'conn.execute("UPDATE results SET value = \'{}\'")\n'
+        'conn.execute("DELETE FROM results")\n'
+        'conn.commit()\n'
+    )
+
+    result = process_runner.run_process([sys.executable, '-B', '-c', forge, store.path], str(workspace),
+                                        30, 4096, confine=True)
+
+    assert result.returncode != 0
+    assert store.get('k') == {'success': True, 'output': 'hola\n'}
@@ -0,0 +1,58 @@
+import threading
+
+import scheduler
+
+
+def test_no_state_kept_for_clients_that_left_the_queue():
+    slots = scheduler.Scheduler(slots=1, max_queue=100, queue_timeout=0.05)
+    assert slots.acquire(client='holder')[0]
+
+    # Every request from a new client times out in the queue
+    threads = [threading.Thread(target=slots.acquire, kwargs={'client': f'client-{i}'}) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # One more is queued and then served
+    waiter = threading.Thread(target=slots.acquire, kwargs={'client': 'served'})
+    waiter.start()
+    while not slots.waiting:
+        pass
+    slots.release(0.1, client='holder')
+    waiter.join()
+    slots.release(0.1, client='served')
+
+    assert slots.waiting == 0 and slots.active == 0
+    assert dict(slots._queued_by_client) == {}
+    assert dict(slots._active_by_client) == {}
+    assert slots._last_grant == {}
+
+
+def test_extra_slots_are_only_idle_ones():
+    slots = scheduler.Scheduler(slots=4, max_queue=10, queue_timeout=5)
+    assert slots.acquire(client='tests')[0]
+    with slots.extra_slots(8) as extra:
+        assert extra == 3 and slots.active == 4
+        # Borrowed slots are taken: the next request has to wait
+        waiter = threading.Thread(target=slots.acquire, kwargs={'client': 'other'})
+        waiter.start()
+        while not slots.waiting:
+            pass
+    # Given back at the end of the block, straight to the waiter
+    waiter.join()
+    assert slots.active == 2 and slots.waiting == 0
+
+
+def test_no_extra_slots_while_requests_wait():
+    slots = scheduler.Scheduler(slots=2, max_queue=10, queue_timeout=5)
+    assert slots.acquire(client='tests')[0] and slots.acquire(client='b')[0]
+    waiter = threading.Thread(target=slots.acquire, kwargs={'client': 'c'})
+    waiter.start()
+    while not slots.waiting:
+        pass
+    with slots.extra_slots(4) as extra:
+        assert extra == 0
+    slots.release(0.1, client='b')
+    waiter.join()
+    assert slots.active == 2 and slots.waiting == 0
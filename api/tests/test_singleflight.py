@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+import singleflight
+
+
+class Leader:
+    """A call that blocks until released, so followers can join it"""
+
+    def __init__(self, result='listo', error=None):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.result = result
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def run_in_thread(flights, key, fn, **kwargs):
+    outcome = {}
+
+    def target():
+        try:
+            outcome['value'] = flights.do(key, fn, **kwargs)
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread, outcome
+
+
+def wait_for_followers(flights, key, count):
+    deadline = time.monotonic() + 5
+    while flights._calls[key].followers < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_concurrent_callers_share_one_call():
+    flights = singleflight.SingleFlight()
+    leader = Leader()
+    lead, lead_outcome = run_in_thread(flights, 'k', leader)
+    leader.started.wait(5)
+    followers = [run_in_thread(flights, 'k', leader) for _ in range(3)]
+    wait_for_followers(flights, 'k', 3)
+    leader.release.set()
+    for thread, _ in [(lead, lead_outcome)] + followers:
+        thread.join()
+
+    assert leader.calls == 1
+    assert lead_outcome['value'] == ('listo', False)
+    assert all(outcome['value'] == ('listo', True) for _, outcome in followers)
+    assert flights.in_flight() == 0
+
+
+def test_different_keys_do_not_wait_for_each_other():
+    flights = singleflight.SingleFlight()
+    leader = Leader()
+    thread, _ = run_in_thread(flights, 'a', leader)
+    leader.started.wait(5)
+    assert flights.do('b', lambda: 'otro') == ('otro', False)
+    leader.release.set()
+    thread.join()
+
+
+def test_errors_reach_the_leader_and_every_follower():
+    flights = singleflight.SingleFlight()
+    leader = Leader(error=ValueError('falló'))
+    lead, lead_outcome = run_in_thread(flights, 'k', leader)
+    leader.started.wait(5)
+    follower, follower_outcome = run_in_thread(flights, 'k', leader)
+    wait_for_followers(flights, 'k', 1)
+    leader.release.set()
+    lead.join()
+    follower.join()
+
+    assert leader.calls == 1
+    assert isinstance(lead_outcome['error'], ValueError)
+    assert follower_outcome['error'] is lead_outcome['error']
+    assert flights.in_flight() == 0
+
+
+def test_unshareable_result_makes_followers_run_their_own():
+    flights = singleflight.SingleFlight()
+    leader = Leader(result='cancelado')
+    lead, _ = run_in_thread(flights, 'k', leader, shareable=lambda r: r != 'cancelado')
+    leader.started.wait(5)
+    follower, outcome = run_in_thread(flights, 'k', lambda: 'propio', shareable=lambda r: r != 'cancelado')
+    wait_for_followers(flights, 'k', 1)
+    leader.release.set()
+    lead.join()
+    follower.join()
+
+    assert outcome['value'] == ('propio', False)
+
+
+def test_follower_gives_up_after_wait_timeout():
+    flights = singleflight.SingleFlight()
+    leader = Leader()
+    lead, _ = run_in_thread(flights, 'k', leader)
+    leader.started.wait(5)
+    try:
+        assert flights.do('k', lambda: 'propio', wait_timeout=0.01) == ('propio', False)
+    finally:
+        leader.release.set()
+        lead.join()
+
+
+def test_nothing_is_kept_after_the_call():
+    flights = singleflight.SingleFlight()
+    assert flights.do('k', lambda: 1) == (1, False)
+    assert flights.do('k', lambda: 2) == (2, False)
+    with pytest.raises(KeyError):
+        flights.do('k', lambda: {}['x'])
+    assert flights.in_flight() == 0
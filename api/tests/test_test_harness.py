@@ -0,0 +1,68 @@
+import pytest
+
+import test_harness
+
+
+def solution(signature: str) -> str:
+    return f'package main\n\nfunc Solution{signature} {{\n\tpanic("")\n}}\n'
+
+
+@pytest.mark.parametrize('signature, args, expected', [
+    ('(xs []float64) float64', [[1, 2]], '[]float64{1, 2}'),
+    ('(xs []string) int', [[]], '[]string{}'),
+    ('(m map[string]float64) int', [{'a': 1}], 'map[string]float64{"a": 1}'),
+    ('(m map[int][]string) int', [{'1': ['x']}], 'map[int][]string{1: []string{"x"}}'),
+    ('(a, b int, s string) int', [1, 2.0, 'x'], '1, 2, "x"'),
+    ('([]int, bool) int', [[3], True], '[]int{3}, true'),
+    ('(prefix string, nums ...int) int', ['p', 1, 2], '"p", 1, 2'),
+    ('(prefix string, nums ...int) int', ['p'], '"p"'),
+    ('(a [3]int) int', [[1, 2]], '[3]int{1, 2}'),
+    ('(xs []int) int', [None], 'nil'),
+    ('[T any](xs []T) int', [[1, 2]], '[]int{1, 2}'),
+    ('(v interface{}) int', [['a']], '[]string{"a"}'),
+])
+def test_arguments_follow_declared_types(signature, args, expected):
+    types = test_harness.solution_parameter_types(solution(signature))
+    assert test_harness.solution_arguments(args, types) == expected
+
+
+@pytest.mark.parametrize('signature, args', [
+    ('(n int) int', [2.5]),
+    ('(s string) int', [3]),
+    ('(xs []float64) int', [['a']]),
+    ('(a [2]int) int', [[1, 2, 3]]),
+    ('(a, b int) int', [1]),
+    ('(x float64) int', [float('nan')]),
+])
+def test_mismatched_case_is_a_case_error(signature, args):
+    types = test_harness.solution_parameter_types(solution(signature))
+    with pytest.raises(ValueError):
+        test_harness.solution_arguments(args, types)
+
+
+def test_one_mismatched_case_keeps_the_others():
+    sources, errors = test_harness.build_harness(
+        solution('(xs []float64) float64'),
+        [{'input': [1, 2]}, {'input': 'texto'}, {'input': []}],
+    )
+    assert errors[0] == '' and errors[1] and errors[2] == ''
+    harness = sources[test_harness.HARNESS_FILE]
+    assert 'Solution([]float64{1, 2})' in harness and 'Solution([]float64{})' in harness
+
+
+def test_has_non_finite():
+    assert test_harness.has_non_finite({'args': [1, [float('inf')]]})
+    assert test_harness.has_non_finite({'input': 1, 'output': float('nan')})
+    assert not test_harness.has_non_finite({'input': [1.5, {'a': 2}], 'output': 'x'})
+
+
+def test_main_in_comments_and_strings_is_not_renamed():
+    code = (
+        'package main\n\n'
+        '// func main() is replaced by the harness\n'
+        'var s = "func main()"\n\n'
+        'func main() {\n}\n\n'
+        'func mainly() {}\n'
+    )
+    renamed = test_harness.rename_main(code)
+    assert renamed == code.replace('func main() {', 'func goguruUserMain() {')
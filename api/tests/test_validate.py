@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+import go_scanner
+
+os.environ.setdefault('GOCACHE_PREPARE', '0')  # importing app must not warm the build cache
+import app  # noqa: E402
+
+
+def program(body: str, imports: str = '"fmt"') -> str:
+    return f'package main\n\nimport {imports}\n\n{body}\n'
+
+
+HELLO = program('func main() {\n\tfmt.Println("Hola")\n}')
+
+
+def test_imports_are_collected_from_both_forms():
+    facts = go_scanner.scan(program('func main() {}', '(\n\t"fmt"\n\tstr "strings"\n)\nimport "os"'))
+    assert facts.imports == ['fmt', 'strings', 'os']
+
+
+def test_nothing_inside_literals_or_comments_is_code():
+    code = program(
+        '// import "os/exec"\n'
+        '/* for {} */\n'
+        'func main() {\n'
+        '\ts := "goto x; for {} import \\"syscall\\""\n'
+        '\tr := `func main() { for ;; { } }`\n'
+        "\tc := '\"'\n"
+        '\tfmt.Println(s, r, c)\n'
+        '}'
+    )
+    facts = go_scanner.scan(code)
+    assert facts.imports == ['fmt']
+    assert not facts.infinite_loop and not facts.has_goto
+    assert facts.functions == ['main']
+    assert app.validate_code(code) == (True, '')
+
+
+def test_identifiers_containing_keywords_do_not_match():
+    facts = go_scanner.scan(program('func main() {\n\tnofor {}\n\tx.goto y\n}'))
+    assert not facts.infinite_loop and not facts.has_goto
+
+
+def test_linkname_directive_is_found_in_comments():
+    assert go_scanner.scan(program('//go:linkname now runtime.nanotime\nfunc main() {}')).has_linkname
+
+
+def test_calls_are_counted_per_declared_function():
+    code = program('func f(x int) int { return x }\n\nfunc main() {\n\tfmt.Println(f(f(1)), f (2))\n}')
+    facts = go_scanner.scan(code)
+    assert facts.calls['f'] == 4  # declaration included
+    assert facts.calls['main'] == 1
+
+
+def test_unterminated_literals_run_to_the_end():
+    facts = go_scanner.scan('package main\n\nfunc main() {}\n/* for {}\nimport "os/exec"')
+    assert facts.has_main_func and facts.imports == [] and not facts.infinite_loop
+
+
+def test_blank_literals_keeps_positions():
+    code = 'x := "ab\\"c" // d\ny := `e\nf`'
+    blanked = go_scanner.blank_literals(code)
+    assert len(blanked) == len(code)
+    assert blanked.count('\n') == code.count('\n')
+    assert blanked.split('\n')[0].rstrip() == 'x := "     "'
+
+
+def test_redact_masks_strings_but_keeps_imports_and_lines():
+    code = program('// secreto\nfunc main() {\n\tfmt.Println("ana@example.com")\n}')
+    redacted = go_scanner.redact(code)
+    assert '"fmt"' in redacted and 'ana@example.com' not in redacted and 'secreto' not in redacted
+    assert redacted.count('\n') == code.count('\n')
+
+
+def test_valid_program_passes():
+    assert app.validate_code(HELLO) == (True, '')
+
+
+@pytest.mark.parametrize('code,message', [
+    ('', 'vacío'),
+    ('   \n', 'vacío'),
+    (HELLO + '//' + 'x' * app.MAX_CODE_SIZE, 'tamaño'),
+    (HELLO + '\n' * app.MAX_LINES, 'líneas'),
+    (program('func main() {}', '"os/exec"'), "'os/exec'"),
+    (program('func main() {}', '"net/http/httptest"'), "'net/http'"),
+    (program('func main() {}', '(\n\t"fmt"\n\tu "unsafe"\n)'), "'unsafe'"),
+    (program('func main() {}', '"crypto/rand"'), 'sospechoso'),
+    (program('func main() {\n\tfor {}\n}'), 'sospechoso'),
+    (program('func main() {\n\tfor ; ; {\n\t}\n}'), 'sospechoso'),
+    (program('func main() {\nL:\n\tgoto L\n}'), 'sospechoso'),
+    (program('func f() {}\n\nfunc main() {\n' + '\tf()\n' * app.MAX_SELF_CALLS + '}'), "'f'"),
+    ('package lib\n\nfunc main() {}\n', 'package main'),
+    ('package main\n\nfunc helper() {}\n', 'func main()'),
+])
+def test_invalid_programs_are_rejected(code, message):
+    valid, error = app.validate_code(code)
+    assert not valid and message in error
+
+
+def test_graded_code_does_not_need_main():
+    assert app.validate_code('package main\n\nfunc Add(a, b int) int { return a + b }\n', require_main=False) == (True, '')
+
+
+def test_import_path_prefixes_are_not_forbidden():
+    # "syscall" is forbidden; an unrelated path that starts with the same letters is not
+    assert app.validate_code(program('func main() {}', '"syscallx"'))[0]
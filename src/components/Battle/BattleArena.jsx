@@ -1,7 +1,7 @@
 import { useState, useRef, useEffect } from 'react';
 import Editor from '@monaco-editor/react';
 import { battleService } from '../../services/battleService';
-import { executeCode } from '../../services/goExecutorService';
+import { runTests } from '../../services/goExecutorService';
 import { useTheme } from '../../context/ThemeContext';
 
 export default function BattleArena({ roomId, playerId, player, roomState, isHost }) {
@@ -36,73 +36,30 @@ export default function BattleArena({ roomId, playerId, player, roomState, isHos
                 return;
             }
 
-            // Build a test runner that executes Solution() for each test case
-            // We need to remove the existing main() and replace it with our test runner
-            let testCode = code;
-
-            // Find and remove the main() function more carefully
-            // Look for "func main()" and remove everything until we find the matching closing brace
-            const mainFuncStart = testCode.indexOf('func main()');
-            if (mainFuncStart !== -1) {
-                // Find the opening brace
-                const openBraceIndex = testCode.indexOf('{', mainFuncStart);
-                if (openBraceIndex !== -1) {
-                    // Count braces to find the matching closing brace
-                    let braceCount = 1;
-                    let i = openBraceIndex + 1;
-                    while (i < testCode.length && braceCount > 0) {
-                        if (testCode[i] === '{') braceCount++;
-                        if (testCode[i] === '}') braceCount--;
-                        i++;
-                    }
-                    // Remove from "func main()" to the closing brace (inclusive)
-                    testCode = testCode.substring(0, mainFuncStart) + testCode.substring(i);
-                }
-            }
-
-            // Build test runner with all test cases
-            let testRunner = '\n\nfunc main() {\n';
-            testRunner += '\tpassed := 0\n';
-            testRunner += '\tfailed := 0\n\n';
-
-            challenge.testCases.forEach((tc, i) => {
-                const input = JSON.stringify(tc.input);
-                const expectedOutput = String(tc.output);
-
-                testRunner += `\t// Test Case ${i + 1}\n`;
-                testRunner += `\tresult${i} := Solution(${input})\n`;
-                testRunner += `\tif fmt.Sprint(result${i}) == "${expectedOutput}" {\n`;
-                testRunner += `\t\tfmt.Printf("✓ Test ${i + 1}: PASS\\n")\n`;
-                testRunner += `\t\tpassed++\n`;
-                testRunner += `\t} else {\n`;
-                testRunner += `\t\tfmt.Printf("✗ Test ${i + 1}: FAIL (expected ${expectedOutput}, got %v)\\n", result${i})\n`;
-                testRunner += `\t\tfailed++\n`;
-                testRunner += `\t}\n\n`;
-            });
-
-            testRunner += '\tfmt.Printf("\\n=== Results: %d/%d tests passed ===\\n", passed, passed+failed)\n';
-            testRunner += '\tif failed > 0 {\n';
-            testRunner += '\t\tfmt.Println("FAILED")\n';
-            testRunner += '\t} else {\n';
-            testRunner += '\t\tfmt.Println("SUCCESS")\n';
-            testRunner += '\t}\n';
-            testRunner += '}\n';
-
-            const finalCode = testCode + testRunner;
-
-            // Execute the modified code
-            const result = await executeCode(finalCode);
+            // The API compiles once and runs every test case server-side
+            const result = await runTests(code, challenge.testCases);
 
             if (!result.success) {
                 setStatus('failed');
-                setOutput(result.error || result.stderr || 'Compilation failed');
+                setOutput([result.error || 'Compilation failed', result.stderr].filter(Boolean).join('\n'));
                 return;
             }
 
-            setOutput(result.output);
+            const lines = result.results.map((r) => {
+                const prefix = r.output ? r.output : '';
+                if (r.status === 'passed') {
+                    return `${prefix}✓ Test ${r.index + 1}: PASS`;
+                }
+                if (r.status === 'failed') {
+                    return `${prefix}✗ Test ${r.index + 1}: FAIL (expected ${r.expected}, got ${r.actual})`;
+                }
+                return `${prefix}✗ Test ${r.index + 1}: ${r.status.toUpperCase()} (${r.error})`;
+            });
+            lines.push(`\n=== Results: ${result.passed}/${result.total} tests passed ===`);
+            lines.push(result.allPassed ? 'SUCCESS' : 'FAILED');
+            setOutput(lines.join('\n'));
 
-            // Check if all tests passed by looking for "SUCCESS" in output
-            const allPassed = result.output.includes('SUCCESS');
+            const allPassed = result.allPassed;
 
             if (allPassed) {
                 setStatus('success');
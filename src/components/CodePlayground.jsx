@@ -1,6 +1,6 @@
 import React, { useState } from 'react';
 import Editor from '@monaco-editor/react';
-import { executeCode, validateCode } from '../services/goExecutorService';
+import { runInBrowser, validateCode } from '../services/goExecutorService';
 import { useTheme } from '../context/ThemeContext';
 
 export default function CodePlayground({ initialCode, expectedOutput }) {
@@ -36,7 +36,8 @@ export default function CodePlayground({ initialCode, expectedOutput }) {
         const startTime = performance.now();
 
         try {
-            const result = await executeCode(code, expectedOutput);
+            // Runs in this browser as WebAssembly when possible; the server compiles and grades
+            const result = await runInBrowser(code, expectedOutput);
 
             const endTime = performance.now();
             const duration = (endTime - startTime).toFixed(2);
@@ -3,6 +3,8 @@
  * Handles code execution and validation against expected output
  */
 
+import { isWasmSupported, runWasm, OUTPUT_LIMIT, RUN_TIMEOUT_SECONDS } from './wasmRunner';
+
 // Get API URL from environment variable
 // Expected format: Base URL (e.g., https://...cloudfront.net or http://localhost:3000)
 // If users append /execute, we strip it to avoid duplication.
@@ -10,14 +12,21 @@ let baseApiUrl = import.meta.env.VITE_GO_EXECUTOR_API_URL || 'http://localhost:3
 baseApiUrl = baseApiUrl.replace(/\/execute\/?$/, '').replace(/\/$/, '');
 
 const url = `${baseApiUrl}/execute`;
+const testsUrl = `${baseApiUrl}/execute/tests`;
+const checkUrl = `${baseApiUrl}/check`;
+const compileWasmUrl = `${baseApiUrl}/compile/wasm`;
+const validateUrl = `${baseApiUrl}/validate`;
 /**
  * Execute Go code and validate against expected output
  *
  * @param {string} code - Go source code to execute
  * @param {string} expectedOutput - Expected output (supports regex: /pattern/)
+ * @param {Object} [options] - Optional comparison settings
+ * @param {string} [options.compareMode] - 'exact' (default), 'lines', 'whitespace' or 'numeric'
+ * @param {number} [options.tolerance] - Numeric tolerance for 'numeric' mode
  * @returns {Promise<Object>} Result object with execution details
  */
-export const executeCode = async (code, expectedOutput = '') => {
+export const executeCode = async (code, expectedOutput = '', options = {}) => {
     try {
         const response = await fetch(url, {
             method: 'POST',
@@ -27,6 +36,7 @@ export const executeCode = async (code, expectedOutput = '') => {
             body: JSON.stringify({
                 code,
                 expectedOutput,
+                ...options,
             }),
         });
 
@@ -58,6 +68,195 @@ export const runCode = async (code) => {
     return executeCode(code, '');
 };
 
+/**
+ * Grade code against structured test cases on the server.
+ * The API compiles once and runs every case in parallel.
+ *
+ * @param {string} code - Go source code defining Solution(...)
+ * @param {Array<Object>} testCases - [{ input, output }] as produced by the generator
+ * @returns {Promise<Object>} { success, allPassed, passed, total, results: [...] }
+ */
+export const runTests = async (code, testCases) => {
+    try {
+        const response = await fetch(testsUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                code,
+                testCases,
+            }),
+        });
+
+        const data = await response.json();
+        if (!response.ok && data?.error === undefined) {
+            throw new Error(`API request failed with status ${response.status}`);
+        }
+        return data;
+
+    } catch (error) {
+        console.error('Error running tests:', error);
+
+        return {
+            success: false,
+            error: error.message || 'No se pudo conectar con el servidor. Verifica tu conexión.',
+        };
+    }
+};
+
+/**
+ * Type-check and vet code without running it (cheap, cached per source).
+ * Meant for editor diagnostics on a debounce.
+ *
+ * @param {string} code - Go source code
+ * @returns {Promise<Object>} { success, ok, diagnostics: [{ line, column, message, severity, source }] }
+ */
+export const checkCode = async (code) => {
+    try {
+        const response = await fetch(checkUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ code }),
+        });
+
+        const data = await response.json();
+        if (!response.ok && data?.error === undefined) {
+            throw new Error(`API request failed with status ${response.status}`);
+        }
+        return data;
+
+    } catch (error) {
+        console.error('Error checking code:', error);
+
+        return {
+            success: false,
+            error: error.message || 'No se pudo conectar con el servidor. Verifica tu conexión.',
+        };
+    }
+};
+
+/**
+ * Compile Go code to WebAssembly (GOOS=js GOARCH=wasm) for runInBrowser.
+ * The module and wasm_exec.js URLs are content-addressed and cached by the browser.
+ *
+ * @param {string} code - Go source code
+ * @param {string} [expectedOutput] - Lets the server answer curriculum samples it already ran
+ * @param {Object} [options] - { compareMode, tolerance }, as for executeCode
+ * @returns {Promise<Object>} { success, module, wasmExec, sizeBytes } with absolute URLs,
+ *   { success: true, result } with the /execute response of a precomputed sample,
+ *   or { success: false, stderr, runOnServer? }
+ */
+export const compileWasm = async (code, expectedOutput = '', options = {}) => {
+    const response = await fetch(compileWasmUrl, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ code, expectedOutput, ...options }),
+    });
+
+    const data = await response.json();
+    if (!response.ok && data?.error === undefined) {
+        throw new Error(`API request failed with status ${response.status}`);
+    }
+    if (data.success && !data.result) {
+        data.module = `${baseApiUrl}${data.module}`;
+        data.wasmExec = `${baseApiUrl}${data.wasmExec}`;
+    }
+    return data;
+};
+
+/**
+ * Grade output produced in the browser with the server's comparison rules
+ *
+ * @param {string} output - Program output
+ * @param {string} expectedOutput - Expected output (supports regex: /pattern/)
+ * @param {Object} [options] - { compareMode, tolerance }, as for executeCode
+ * @returns {Promise<Object>} { success, correct, message, output, expectedOutput }
+ */
+export const validateOutput = async (output, expectedOutput, options = {}) => {
+    const response = await fetch(validateUrl, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            output,
+            expectedOutput,
+            ...options,
+        }),
+    });
+
+    const data = await response.json();
+    if (!response.ok && data?.error === undefined) {
+        throw new Error(`API request failed with status ${response.status}`);
+    }
+    return data;
+};
+
+/**
+ * Same as executeCode, but the program runs in this browser: the server only
+ * compiles it (usually a cache hit) and grades the output. Falls back to
+ * executeCode when WebAssembly is unavailable or the module cannot be used.
+ *
+ * @param {string} code - Go source code to execute
+ * @param {string} expectedOutput - Expected output (supports regex: /pattern/)
+ * @param {Object} [options] - Optional comparison settings, as for executeCode
+ * @returns {Promise<Object>} Result object shaped like the /execute response
+ */
+export const runInBrowser = async (code, expectedOutput = '', options = {}) => {
+    if (!isWasmSupported()) {
+        return executeCode(code, expectedOutput, options);
+    }
+
+    try {
+        const build = await compileWasm(code, expectedOutput, options);
+        if (build.result) {
+            // A curriculum sample: the server already knows what /execute answers
+            return build.result;
+        }
+        if (!build.success) {
+            if (build.runOnServer) {
+                return executeCode(code, expectedOutput, options);
+            }
+            return build.stderr === undefined
+                ? build
+                : { success: false, error: 'Error de compilación o ejecución', stderr: build.stderr, stdout: '' };
+        }
+
+        const run = await runWasm(build);
+        if (run.error) {
+            // Module evicted or blocked (CSP, network): run it on the server instead
+            console.warn('WebAssembly run failed, using the server:', run.error);
+            return executeCode(code, expectedOutput, options);
+        }
+
+        let { stdout, stderr } = run;
+        if (run.timedOut) {
+            stderr = `La ejecución excedió el tiempo límite de ${RUN_TIMEOUT_SECONDS} segundos`;
+        } else if (run.outputExceeded) {
+            stdout += `\n... (output truncado, límite: ${OUTPUT_LIMIT} bytes)`;
+            stderr = (stderr ? `${stderr}\n` : '') + `Ejecución detenida: el output excedió el límite de ${OUTPUT_LIMIT} bytes`;
+        }
+        if (run.exitCode !== 0) {
+            return { success: false, error: 'Error de compilación o ejecución', stderr, stdout, runtime: 'wasm' };
+        }
+
+        if (!expectedOutput) {
+            return { success: true, output: stdout, runtime: 'wasm' };
+        }
+        const graded = await validateOutput(stdout, expectedOutput, options);
+        return { ...graded, runtime: 'wasm' };
+
+    } catch (error) {
+        console.warn('WebAssembly path unavailable, using the server:', error);
+        return executeCode(code, expectedOutput, options);
+    }
+};
+
 /**
  * Validate if the code is valid before sending to API
  * This provides instant feedback before making API calls
@@ -0,0 +1,115 @@
+/**
+ * Runs a Go program compiled to WebAssembly (GOOS=js GOARCH=wasm) in a Web Worker.
+ * The module and wasm_exec.js come from /compile/wasm; the worker is terminated
+ * on timeout or when the output limit is reached, as the server kills its process.
+ */
+
+// Same limits as the API (MAX_OUTPUT_SIZE, MAX_EXECUTION_TIME)
+export const OUTPUT_LIMIT = 5000;
+export const RUN_TIMEOUT_SECONDS = 30;
+
+// Classic worker: wasm_exec.js is a script that defines globalThis.Go
+const workerSource = `
+self.onmessage = async (event) => {
+    const { module, wasmExec, outputLimit } = event.data;
+    try {
+        importScripts(wasmExec);
+    } catch (error) {
+        self.postMessage({ type: 'error', message: 'No se pudo cargar wasm_exec.js: ' + error.message });
+        return;
+    }
+
+    // wasm_exec.js writes stdout/stderr through fs.writeSync: forward them instead of console.log
+    const decoders = { 1: new TextDecoder('utf-8'), 2: new TextDecoder('utf-8') };
+    const written = { 1: 0, 2: 0 };
+    let limited = false;
+    globalThis.fs.writeSync = (fd, buf) => {
+        if (limited || !decoders[fd]) {
+            return buf.length;
+        }
+        const room = outputLimit - written[fd];
+        const chunk = buf.length > room ? buf.subarray(0, room) : buf;
+        written[fd] += chunk.length;
+        self.postMessage({ type: 'output', fd, text: decoders[fd].decode(chunk, { stream: true }) });
+        if (chunk.length < buf.length) {
+            limited = true;
+            self.postMessage({ type: 'limit' });
+        }
+        return buf.length;
+    };
+
+    const go = new Go();
+    let exitCode = 0;
+    go.exit = (code) => { exitCode = code; };
+    try {
+        const source = await WebAssembly.instantiateStreaming(fetch(module), go.importObject);
+        // Resolves when the program exits (os.Exit, end of main or a panic)
+        await go.run(source.instance);
+    } catch (error) {
+        self.postMessage({ type: 'error', message: error.message });
+        return;
+    }
+    for (const fd of [1, 2]) {
+        self.postMessage({ type: 'output', fd, text: decoders[fd].decode() });
+    }
+    self.postMessage({ type: 'exit', code: exitCode });
+};
+`;
+
+let workerUrl = null;
+
+/**
+ * Whether this browser can run /compile/wasm modules
+ *
+ * @returns {boolean}
+ */
+export const isWasmSupported = () =>
+    typeof Worker !== 'undefined'
+    && typeof WebAssembly === 'object'
+    && typeof WebAssembly.instantiateStreaming === 'function'
+    && typeof URL?.createObjectURL === 'function';
+
+/**
+ * Run a compiled module in a fresh worker
+ *
+ * @param {Object} build - { module, wasmExec } as absolute URLs
+ * @param {Object} [options] - { timeoutSeconds, outputLimit }
+ * @returns {Promise<Object>} { stdout, stderr, exitCode, timedOut?, outputExceeded?, error? }
+ */
+export const runWasm = (build, options = {}) => new Promise((resolve) => {
+    const timeoutSeconds = options.timeoutSeconds || RUN_TIMEOUT_SECONDS;
+    if (!workerUrl) {
+        workerUrl = URL.createObjectURL(new Blob([workerSource], { type: 'text/javascript' }));
+    }
+    const worker = new Worker(workerUrl);
+    const streams = { 1: '', 2: '' };
+    let done = false;
+
+    const finish = (result) => {
+        if (done) {
+            return;
+        }
+        done = true;
+        clearTimeout(timer);
+        worker.terminate();
+        resolve({ stdout: streams[1], stderr: streams[2], exitCode: null, ...result });
+    };
+    const timer = setTimeout(() => finish({ timedOut: true }), timeoutSeconds * 1000);
+
+    worker.onmessage = ({ data }) => {
+        if (data.type === 'output') {
+            streams[data.fd] += data.text;
+        } else if (data.type === 'limit') {
+            finish({ outputExceeded: true });
+        } else if (data.type === 'exit') {
+            finish({ exitCode: data.code });
+        } else if (data.type === 'error') {
+            finish({ error: data.message });
+        }
+    };
+    worker.onerror = (event) => {
+        event.preventDefault();
+        finish({ error: event.message || 'Error en el worker' });
+    };
+    worker.postMessage({ module: build.module, wasmExec: build.wasmExec, outputLimit: options.outputLimit || OUTPUT_LIMIT });
+});